@@ -0,0 +1,170 @@
+"""
+Controle de admissão do endpoint HTTP.
+
+Sem controle, cada upload é aceito independentemente da carga: sob
+sobrecarga todos os documentos disputam o mesmo limitador e estouram o
+orçamento de tempo juntos. Aqui cada documento tem seu trabalho estimado
+(chamadas ao modelo a partir de parágrafos, tabelas, imagens e tokens) e só é
+aceito se o trabalho já admitido mais o novo couber na capacidade do worker
+dentro do horizonte; caso contrário a resposta é 429 com um Retry-After
+calculado a partir do que precisa ser drenado.
+
+A unidade de trabalho é "segundos de vaga": chamadas estimadas x latência
+média observada por chamada. A capacidade é vagas x horizonte.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from document_ir import DocumentIR
+from text_chunking import estimate_tokens
+
+
+class WorkEstimate:
+    """Trabalho estimado de um documento."""
+
+    __slots__ = ("calls", "tokens", "paragraphs", "images")
+
+    def __init__(self, calls: int, tokens: int, paragraphs: int = 0, images: int = 0):
+        self.calls = calls
+        self.tokens = tokens
+        self.paragraphs = paragraphs
+        self.images = images
+
+    def to_dict(self) -> Dict:
+        return {"calls": self.calls, "tokens": self.tokens, "paragraphs": self.paragraphs, "images": self.images}
+
+
+def estimate_document_work(ir: DocumentIR, revise_text: bool, images: int,
+                           chunk_tokens: int, table_tokens: int) -> WorkEstimate:
+    """
+    Estima as chamadas ao modelo de um documento a partir da IR.
+
+    Args:
+        ir: IR do documento
+        revise_text: Se o modo revisa texto
+        images: Imagens que serão descritas
+        chunk_tokens: Tokens por bloco de parágrafo longo (PARAGRAPH_CHUNK_TOKENS)
+        table_tokens: Tokens por requisição de tabela (TABLE_REQUEST_TOKENS)
+    """
+    calls = images
+    tokens = 0
+    paragraphs = 0
+    if revise_text:
+        for _, _, text, _ in ir.paragraph_segments():
+            if not text.strip():
+                continue
+            paragraph_tokens = estimate_tokens(text)
+            tokens += paragraph_tokens
+            paragraphs += 1
+            calls += max(1, math.ceil(paragraph_tokens / chunk_tokens))
+        for _, cells in ir.table_cells():
+            table_tokens_total = sum(estimate_tokens(text) for cell in cells for text in cell.texts)
+            tokens += table_tokens_total
+            calls += max(1, math.ceil(table_tokens_total / table_tokens))
+    return WorkEstimate(calls, tokens, paragraphs, images)
+
+
+class AdmissionTicket:
+    """Documento admitido; devolvido a AdmissionController.release ao terminar."""
+
+    __slots__ = ("cost", "admitted_at")
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.admitted_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Admite documentos enquanto o trabalho pendente couber na capacidade.
+
+    Um documento é sempre admitido quando não há nada em andamento, mesmo que
+    sozinho exceda a capacidade (o orçamento de tempo do documento cuida dele).
+    """
+
+    def __init__(self, slots: int, horizon_seconds: float, default_call_seconds: float = 3.0,
+                 max_retry_after: float = 120.0, enabled: bool = True):
+        """
+        Args:
+            slots: Chamadas simultâneas disponíveis para o HTTP
+            horizon_seconds: Tempo em que o trabalho admitido deve caber
+            default_call_seconds: Latência por chamada antes de haver observações
+            max_retry_after: Limite do Retry-After informado
+            enabled: False para admitir tudo (apenas contabiliza)
+        """
+        self.slots = max(1, slots)
+        self.horizon_seconds = horizon_seconds
+        self.call_seconds = default_call_seconds
+        self.max_retry_after = max_retry_after
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.outstanding = 0.0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> float:
+        return self.slots * self.horizon_seconds
+
+    def observe_call(self, latency: float):
+        """Atualiza a latência média por chamada (média móvel exponencial)."""
+        self.call_seconds = 0.9 * self.call_seconds + 0.1 * latency
+
+    def cost(self, estimate: WorkEstimate) -> float:
+        return estimate.calls * self.call_seconds
+
+    def _retry_after(self, excess: float) -> int:
+        # Tempo para drenar o excesso com todas as vagas ocupadas
+        return int(min(self.max_retry_after, max(1.0, math.ceil(excess / self.slots))))
+
+    def check_load(self) -> Optional[int]:
+        """
+        Verificação barata antes de ler o documento.
+
+        Returns:
+            Retry-After (segundos) se o trabalho admitido já ocupa toda a capacidade, senão None
+        """
+        with self._lock:
+            if not self.enabled or self.in_flight == 0 or self.outstanding < self.capacity:
+                return None
+            self.rejected += 1
+            return self._retry_after(self.outstanding - self.capacity + self.call_seconds)
+
+    def try_admit(self, estimate: WorkEstimate):
+        """
+        Tenta admitir um documento.
+
+        Returns:
+            Tupla (ticket ou None, Retry-After em segundos quando rejeitado)
+        """
+        cost = self.cost(estimate)
+        with self._lock:
+            excess = self.outstanding + cost - self.capacity
+            if self.enabled and self.in_flight > 0 and excess > 0:
+                self.rejected += 1
+                return None, self._retry_after(excess)
+            self.outstanding += cost
+            self.in_flight += 1
+            self.admitted += 1
+            return AdmissionTicket(cost), 0
+
+    def release(self, ticket: AdmissionTicket):
+        with self._lock:
+            self.outstanding = max(0.0, self.outstanding - ticket.cost)
+            self.in_flight -= 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": self.in_flight,
+                "outstanding_call_seconds": round(self.outstanding, 1),
+                "capacity_call_seconds": round(self.capacity, 1),
+                "avg_call_seconds": round(self.call_seconds, 3),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
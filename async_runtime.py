@@ -0,0 +1,303 @@
+"""
+Event loop e limitador compartilhados pelo pipeline de revisão.
+
+Com handlers síncronos e o cliente AzureOpenAI bloqueante, cada worker
+processa um documento por vez e passa a maior parte do tempo esperando a
+rede. O pipeline assíncrono roda em um único event loop por worker:
+
+- todos os documentos (HTTP, Blob Trigger e chamadas síncronas como
+  process_word_document) são executados no mesmo loop, em uma thread de fundo
+- o AsyncAzureOpenAI é criado uma vez e reaproveita o pool de conexões
+- AsyncLimiter limita as chamadas simultâneas ao Azure OpenAI de todos os
+  documentos juntos, em vez de um limite por documento, e separa o tráfego
+  interativo (HTTP) do processamento em lote (Blob Trigger) em faixas
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, Tuple
+
+
+class AsyncRuntime:
+    """Event loop dedicado, iniciado sob demanda em uma thread de fundo."""
+
+    def __init__(self, name: str = "revision-loop"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def in_loop(self) -> bool:
+        """True quando chamado de dentro do loop compartilhado."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Agenda a corrotina no loop compartilhado (thread-safe)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None):
+        """
+        Executa a corrotina no loop compartilhado e bloqueia até o resultado.
+
+        Raises:
+            RuntimeError: Se chamado de dentro do próprio loop (causaria deadlock)
+        """
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run() chamado dentro do loop compartilhado; use await")
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro: Awaitable):
+        """Aguarda, a partir de outro event loop (ex.: o do worker), a corrotina no loop compartilhado."""
+        if self.in_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+# Faixa e documento do trabalho em execução (herdados pelas tarefas filhas)
+_current_lane: ContextVar[Tuple[str, Optional[str]]] = ContextVar("revision_lane", default=(LANE_INTERACTIVE, None))
+
+
+async def in_lane(lane: str, coro: Awaitable, key: Optional[str] = None):
+    """
+    Executa a corrotina na faixa informada.
+
+    Todas as chamadas feitas pela corrotina (e pelas tarefas que ela criar)
+    disputam o limitador nessa faixa; `key` identifica o documento para o
+    rodízio entre documentos da faixa bulk. A corrotina ainda não pode ter
+    sido iniciada (ex.: revise_document(...), não um gather já criado).
+    """
+    if lane not in LANES:
+        raise ValueError(f"Faixa inválida: '{lane}'. Use: {', '.join(LANES)}")
+    token = _current_lane.set((lane, key))
+    try:
+        return await coro
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane() -> str:
+    """Faixa do trabalho em execução (interactive quando não definida)."""
+    return _current_lane.get()[0]
+
+
+class _LaneStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.acquired = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.recent_waits = deque(maxlen=200)
+
+    def record_wait(self, seconds: float):
+        self.acquired += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        self.recent_waits.append(seconds)
+
+    def snapshot(self, reserved: int, cap: int) -> Dict:
+        waits = sorted(self.recent_waits)
+        return {
+            "reserved": reserved,
+            "max_in_flight": cap,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "acquired": self.acquired,
+            "avg_wait_seconds": round(self.wait_seconds / self.acquired, 4) if self.acquired else 0.0,
+            "p95_wait_seconds": round(waits[int(len(waits) * 0.95)], 4) if waits else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 4),
+        }
+
+
+class AsyncLimiter:
+    """
+    Limite de chamadas simultâneas compartilhado pelas corrotinas do loop,
+    com faixas de prioridade.
+
+    O HTTP (faixa interactive) e o Blob Trigger (faixa bulk) usam a mesma cota
+    do deployment. Para que um backlog de blobs não faça as requisições
+    interativas estourarem o tempo:
+
+    - cada vaga liberada vai primeiro para a faixa interactive;
+    - `reserved[interactive]` vagas nunca são ocupadas pela faixa bulk, para
+      que uma requisição interativa comece sem esperar;
+    - `reserved[bulk]` vagas continuam disponíveis para a faixa bulk mesmo
+      com fila interativa, para que o backlog não pare de andar;
+    - na faixa bulk as vagas giram entre os documentos (rodízio), em vez de o
+      primeiro documento grande ocupar a faixa inteira.
+
+    Uso:
+        async with limiter:
+            await client.chat.completions.create(...)
+
+        await in_lane(LANE_BULK, revise_document(...), key=nome_do_blob)
+    """
+
+    def __init__(self, max_concurrency: int, reserved: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            max_concurrency: Chamadas simultâneas somando as faixas
+            reserved: Fração de max_concurrency reservada por faixa
+                      (padrão: interactive 0.25, bulk 0.1)
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        shares = {LANE_INTERACTIVE: 0.25, LANE_BULK: 0.1, **(reserved or {})}
+        self.reserved = {lane: min(self.max_concurrency, math.ceil(self.max_concurrency * max(0.0, shares[lane])))
+                         for lane in LANES}
+        # Limite da faixa bulk: o que sobra depois da reserva interativa (ao menos a própria reserva)
+        self.bulk_cap = max(self.reserved[LANE_BULK], self.max_concurrency - self.reserved[LANE_INTERACTIVE], 1)
+        self.lanes = {lane: _LaneStats() for lane in LANES}
+        self._interactive: deque = deque()
+        # Documento -> fila de espera, na ordem do rodízio
+        self._bulk: "OrderedDict[Optional[str], deque]" = OrderedDict()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.acquired = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(stats.waiting for stats in self.lanes.values())
+
+    def _bulk_allowed(self, interactive_waiting: bool) -> bool:
+        bulk = self.lanes[LANE_BULK]
+        if bulk.in_flight < self.reserved[LANE_BULK]:
+            return True
+        return not interactive_waiting and bulk.in_flight < self.bulk_cap
+
+    def _can_start(self, lane: str) -> bool:
+        if self.in_flight >= self.max_concurrency:
+            return False
+        if lane == LANE_INTERACTIVE:
+            return not self._interactive
+        return not self._bulk and self._bulk_allowed(bool(self._interactive))
+
+    def _start(self, lane: str):
+        stats = self.lanes[lane]
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.acquired += 1
+
+    @staticmethod
+    def _pop_waiter(queue: deque):
+        while queue:
+            waiter = queue.popleft()
+            if not waiter.done():
+                return waiter
+        return None
+
+    def _next_bulk_waiter(self):
+        # Rodízio: atende o primeiro documento da fila e o manda para o fim
+        while self._bulk:
+            key, queue = next(iter(self._bulk.items()))
+            waiter = self._pop_waiter(queue)
+            if queue:
+                self._bulk.move_to_end(key)
+            else:
+                del self._bulk[key]
+            if waiter is not None:
+                return waiter
+        return None
+
+    def _dispatch(self):
+        """Entrega as vagas livres aos próximos da fila, por prioridade."""
+        while self.in_flight < self.max_concurrency:
+            bulk = self.lanes[LANE_BULK]
+            if self._bulk and bulk.in_flight < self.reserved[LANE_BULK]:
+                lane, waiter = LANE_BULK, self._next_bulk_waiter()
+            elif self._interactive:
+                lane, waiter = LANE_INTERACTIVE, self._pop_waiter(self._interactive)
+            elif self._bulk and bulk.in_flight < self.bulk_cap:
+                lane, waiter = LANE_BULK, self._next_bulk_waiter()
+            else:
+                return
+            if waiter is not None:
+                self._start(lane)
+                waiter.set_result(lane)
+
+    async def __aenter__(self):
+        lane, key = _current_lane.get()
+        stats = self.lanes[lane]
+        start = time.perf_counter()
+        if self._can_start(lane):
+            self._start(lane)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            if lane == LANE_INTERACTIVE:
+                self._interactive.append(waiter)
+            else:
+                self._bulk.setdefault(key, deque()).append(waiter)
+            # Descarta esperas canceladas na frente da fila e entrega a vaga, se houver
+            self._dispatch()
+            stats.waiting += 1
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Cancelado depois de receber a vaga: devolver
+                if waiter.done() and not waiter.cancelled():
+                    self._release(lane)
+                raise
+            finally:
+                stats.waiting -= 1
+        stats.record_wait(time.perf_counter() - start)
+        return self
+
+    def _release(self, lane: str):
+        self.lanes[lane].in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._release(_current_lane.get()[0])
+        return False
+
+    def pressure(self, lane: str) -> float:
+        """
+        Demanda da faixa em relação às vagas que ela pode usar.
+
+        1.0 = vagas ocupadas sem fila; acima disso, há fila. A faixa
+        interactive só enxerga a própria demanda (tem prioridade); a bulk
+        disputa o restante com tudo o que está em andamento.
+        """
+        if lane == LANE_INTERACTIVE:
+            stats = self.lanes[LANE_INTERACTIVE]
+            slots = self.max_concurrency - self.reserved[LANE_BULK]
+            return (stats.in_flight + stats.waiting) / max(slots, 1)
+        return (self.in_flight + self.waiting) / self.max_concurrency
+
+    def snapshot(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "acquired": self.acquired,
+            "lanes": {
+                LANE_INTERACTIVE: self.lanes[LANE_INTERACTIVE].snapshot(
+                    self.reserved[LANE_INTERACTIVE], self.max_concurrency),
+                LANE_BULK: dict(self.lanes[LANE_BULK].snapshot(self.reserved[LANE_BULK], self.bulk_cap),
+                                documents_waiting=len(self._bulk)),
+            },
+        }
@@ -0,0 +1,256 @@
+"""
+Cliente da Azure OpenAI Batch API.
+
+A Batch API recebe um arquivo JSONL com muitas requisições de chat, processa
+em até 24h com cota separada e custa cerca de metade do preço das chamadas
+diretas. Cada linha do arquivo tem um `custom_id`, usado para casar a
+resposta com o item de trabalho:
+
+    {"custom_id": "12", "method": "POST", "url": "/chat/completions",
+     "body": {"model": "gpt-4-batch", "messages": [...], "temperature": 0.3}}
+
+O backend expõe apenas submit/status/results/cancel, para que o mesmo fluxo
+rode contra o Azure ou contra um substituto local (LocalBatchBackend).
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+# Endpoint das requisições dentro do arquivo de batch (Azure OpenAI)
+BATCH_ENDPOINT = "/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+
+STATUS_COMPLETED = "completed"
+# Estados finais de um batch (os demais ainda podem mudar)
+TERMINAL_STATUSES = {STATUS_COMPLETED, "failed", "expired", "cancelled"}
+
+
+def build_batch_line(custom_id: str, body: Dict) -> str:
+    """Serializa uma requisição de chat como linha do arquivo JSONL."""
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body,
+    }, ensure_ascii=False)
+
+
+def parse_batch_output(content: str) -> Dict[str, Dict]:
+    """
+    Interpreta o arquivo de saída (ou de erros) de um batch.
+
+    Returns:
+        custom_id -> {"content": texto ou None, "error": mensagem ou None, "usage": dict}
+    """
+    results: Dict[str, Dict] = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            logging.warning(f"Linha inválida no resultado do batch: {line[:120]}")
+            continue
+        custom_id = record.get("custom_id")
+        if custom_id is None:
+            continue
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        error = record.get("error") or body.get("error")
+        content_text = None
+        choices = body.get("choices") or []
+        if choices and response.get("status_code", 200) == 200:
+            content_text = (choices[0].get("message") or {}).get("content")
+            # Resposta cortada pelo limite de tokens: não serve como revisão
+            if choices[0].get("finish_reason") == "length":
+                content_text = None
+                error = error or "truncated (finish_reason=length)"
+        if content_text is None and error is None:
+            error = f"status {response.get('status_code')}"
+        results[custom_id] = {
+            "content": content_text,
+            "error": (error.get("message") if isinstance(error, dict) else error),
+            "usage": body.get("usage") or {},
+        }
+    return results
+
+
+class AzureBatchBackend:
+    """Batch API de um recurso Azure OpenAI (requer deployment do tipo Global Batch)."""
+
+    def __init__(self, client):
+        """
+        Args:
+            client: AsyncAzureOpenAI configurado
+        """
+        self.client = client
+
+    async def submit(self, lines: List[str], metadata: Optional[Dict[str, str]] = None) -> str:
+        """Envia o arquivo JSONL e cria o batch. Retorna o id do batch."""
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        input_file = await self.client.files.create(file=("revisao.jsonl", payload), purpose="batch")
+        kwargs = {"metadata": metadata} if metadata else {}
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+            **kwargs
+        )
+        logging.info(f"Batch {batch.id} criado com {len(lines)} requisição(ões)")
+        return batch.id
+
+    async def status(self, batch_id: str) -> Dict:
+        batch = await self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            "id": batch.id,
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+            "total": counts.total if counts else 0,
+            "completed": counts.completed if counts else 0,
+            "failed": counts.failed if counts else 0,
+        }
+
+    async def results(self, batch_id: str) -> Dict[str, Dict]:
+        """Baixa e interpreta os arquivos de saída e de erros do batch."""
+        status = await self.status(batch_id)
+        results: Dict[str, Dict] = {}
+        for file_id in (status["error_file_id"], status["output_file_id"]):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                results.update(parse_batch_output(content.text))
+        return results
+
+    async def cancel(self, batch_id: str):
+        await self.client.batches.cancel(batch_id)
+
+
+class LocalBatchBackend:
+    """
+    Substituto local da Batch API, para testes e desenvolvimento.
+
+    Reproduz o fluxo de arquivos do Azure em um diretório: o JSONL enviado é
+    gravado como arquivo de entrada, o batch passa por "validating" e
+    "in_progress" a cada consulta de status e, ao terminar, grava os arquivos
+    de saída e de erros no mesmo formato do Azure. O estado fica em disco, então
+    o batch sobrevive a um reinício do processo (como no serviço real).
+
+    Cada requisição é respondida por `responder(body) -> str`; uma exceção vira
+    uma linha no arquivo de erros.
+    """
+
+    def __init__(self, root: str, responder: Callable[[Dict], str], polls_to_complete: int = 2):
+        """
+        Args:
+            root: Diretório onde ficam os arquivos e o estado dos batches
+            responder: Gera o conteúdo da resposta a partir do corpo da requisição
+            polls_to_complete: Consultas de status até o batch terminar
+        """
+        self.root = root
+        self.responder = responder
+        self.polls_to_complete = polls_to_complete
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load(self, batch_id: str) -> Dict:
+        with open(self._path(f"{batch_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, state: Dict):
+        with open(self._path(f"{state['id']}.json"), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    async def submit(self, lines: List[str], metadata: Optional[Dict[str, str]] = None) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        input_file_id = f"{batch_id}-input.jsonl"
+        with open(self._path(input_file_id), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self._save({
+            "id": batch_id,
+            "status": "validating",
+            "input_file_id": input_file_id,
+            "output_file_id": None,
+            "error_file_id": None,
+            "polls": 0,
+            "total": len(lines),
+            "completed": 0,
+            "failed": 0,
+            "metadata": metadata or {},
+            "created_at": time.time(),
+        })
+        logging.info(f"Batch local {batch_id} criado com {len(lines)} requisição(ões)")
+        return batch_id
+
+    def _complete(self, state: Dict):
+        outputs, errors = [], []
+        with open(self._path(state["input_file_id"]), encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                custom_id = request["custom_id"]
+                try:
+                    content = self.responder(request["body"])
+                except Exception as e:
+                    errors.append({
+                        "id": f"err-{custom_id}",
+                        "custom_id": custom_id,
+                        "response": {"status_code": 500, "body": {"error": {"message": str(e)}}},
+                        "error": None,
+                    })
+                    continue
+                outputs.append({
+                    "id": f"resp-{custom_id}",
+                    "custom_id": custom_id,
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                            "usage": {},
+                        },
+                    },
+                    "error": None,
+                })
+        for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+            if records:
+                file_id = f"{state['id']}-{key.split('_')[0]}.jsonl"
+                with open(self._path(file_id), "w", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+                state[key] = file_id
+        state["completed"] = len(outputs)
+        state["failed"] = len(errors)
+        state["status"] = "completed"
+
+    async def status(self, batch_id: str) -> Dict:
+        state = self._load(batch_id)
+        if state["status"] not in TERMINAL_STATUSES:
+            state["polls"] += 1
+            if state["polls"] >= self.polls_to_complete:
+                self._complete(state)
+            else:
+                state["status"] = "in_progress"
+            self._save(state)
+        return {key: state[key] for key in ("id", "status", "output_file_id", "error_file_id",
+                                            "total", "completed", "failed")}
+
+    async def results(self, batch_id: str) -> Dict[str, Dict]:
+        state = self._load(batch_id)
+        results: Dict[str, Dict] = {}
+        for file_id in (state["error_file_id"], state["output_file_id"]):
+            if file_id:
+                with open(self._path(file_id), encoding="utf-8") as f:
+                    results.update(parse_batch_output(f.read()))
+        return results
+
+    async def cancel(self, batch_id: str):
+        state = self._load(batch_id)
+        if state["status"] not in TERMINAL_STATUSES:
+            state["status"] = "cancelled"
+            self._save(state)
@@ -0,0 +1,425 @@
+"""
+Modo em massa (Azure OpenAI Batch API) para o backlog do Blob Trigger.
+
+No fim do semestre os departamentos depositam centenas de documentos em
+`documentos/input/` de uma vez. Nada ali é urgente, mas cada documento
+processado pelo Blob Trigger paga o preço cheio e disputa a cota com os
+usuários interativos. No modo em massa o documento só é registrado; um timer
+junta os itens de trabalho de vários documentos em arquivos JSONL da Batch API
+(metade do preço, cota separada) e monta as saídas quando o batch termina.
+
+Caminhos no container (relativos a `documentos/`):
+
+    input/{nome}                 documento original (deixado pelo usuário)
+    bulk/pending/{nome}.json     documento registrado, aguardando envio
+    bulk/jobs/{job_id}.json      manifesto do job: batch e, por documento, o localizador
+                                 e o texto de cada segmento enviado e o parágrafo de cada imagem
+    output/{nome}                documento revisado
+
+Ciclo (BulkBatchProcessor.run_cycle, chamado pelo timer):
+
+1. submit_pending: lê os documentos pendentes, extrai a IR e monta um
+   arquivo JSONL por job (um item por texto distinto e por imagem)
+2. poll_jobs: consulta os jobs abertos; com o batch concluído, aplica os
+   resultados a cada documento (como um patch, ver revision_patch) e grava a
+   saída. Batches que falharam ou expiraram voltam para a fila, até
+   BULK_MAX_ATTEMPTS tentativas.
+
+O timer do Azure Functions roda em uma única instância por vez, então os
+manifestos não precisam de trava.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from batch_api import STATUS_COMPLETED, TERMINAL_STATUSES, build_batch_line
+from docx_worker import extract_work_items
+from revision_patch import PATCH_FORMAT, PATCH_VERSION, apply_patch
+
+INPUT_PREFIX = "input/"
+OUTPUT_PREFIX = "output/"
+PENDING_PREFIX = "bulk/pending/"
+JOBS_PREFIX = "bulk/jobs/"
+
+JOB_SUBMITTED = "submitted"
+JOB_COMPLETED = "completed"
+JOB_REQUEUED = "requeued"
+JOB_FAILED = "failed"
+
+
+class LocalBulkStore:
+    """Armazenamento do modo em massa em um diretório local (testes)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, name: str, data: bytes):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def list(self, prefix: str) -> List[str]:
+        directory = self._path(prefix)
+        names = []
+        for current, _, files in os.walk(directory):
+            relative = os.path.relpath(current, directory).replace(os.sep, "/")
+            for entry in files:
+                names.append(prefix + (entry if relative == "." else f"{relative}/{entry}"))
+        return sorted(names)
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+class BlobBulkStore:
+    """Armazenamento do modo em massa no container `documentos` do Blob Storage."""
+
+    def __init__(self, container_client):
+        """
+        Args:
+            container_client: azure.storage.blob.ContainerClient do container de documentos
+        """
+        self.container = container_client
+
+    def read(self, name: str) -> Optional[bytes]:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            return self.container.download_blob(name).readall()
+        except ResourceNotFoundError:
+            return None
+
+    def write(self, name: str, data: bytes):
+        self.container.upload_blob(name, data, overwrite=True)
+
+    def list(self, prefix: str) -> List[str]:
+        return sorted(blob.name for blob in self.container.list_blobs(name_starts_with=prefix))
+
+    def delete(self, name: str):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            self.container.delete_blob(name)
+        except ResourceNotFoundError:
+            pass
+
+
+class BulkBatchProcessor:
+    """
+    Registra documentos, envia batches e monta as saídas do modo em massa.
+
+    As requisições são montadas pelo function_app por meio de `requests`:
+
+        mode(name) -> dict                          modo de revisão resolvido
+        text_request(text, mode) -> dict            corpo da revisão de um texto
+        image_request(image_bytes, context) -> dict corpo da descrição de uma imagem
+        parse_text(original, content) -> str        texto revisado a partir da resposta
+    """
+
+    def __init__(self, store, backend, requests, run_cpu: Optional[Callable[..., Awaitable]] = None,
+                 max_requests: int = 50000, max_bytes: int = 150 * 1024 * 1024, max_attempts: int = 3):
+        """
+        Args:
+            store: LocalBulkStore ou BlobBulkStore
+            backend: Backend da Batch API (ver batch_api)
+            requests: Montagem das requisições (ver acima)
+            run_cpu: Executa as etapas do .docx fora do loop (ex.: DocxWorkerPool.run)
+            max_requests: Requisições máximas por arquivo JSONL
+            max_bytes: Tamanho máximo (aprox.) do arquivo JSONL
+            max_attempts: Envios de um documento antes de desistir
+        """
+        self.store = store
+        self.backend = backend
+        self.requests = requests
+        self.run_cpu = run_cpu or (lambda fn, *args: asyncio.to_thread(fn, *args))
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_attempts = max_attempts
+        self.stats = {"enqueued": 0, "jobs_submitted": 0, "requests_submitted": 0,
+                      "documents_completed": 0, "documents_failed": 0, "requests_failed": 0}
+
+    async def _io(self, method: str, *args):
+        # O SDK do Blob Storage é síncrono
+        return await asyncio.to_thread(getattr(self.store, method), *args)
+
+    async def _read_json(self, name: str) -> Optional[Dict]:
+        data = await self._io("read", name)
+        return json.loads(data) if data is not None else None
+
+    async def _write_json(self, name: str, value: Dict):
+        await self._io("write", name, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    async def enqueue(self, name: str, mode: Optional[str] = None, attempts: int = 0):
+        """Registra um documento de `input/` para o próximo batch."""
+        await self._write_json(f"{PENDING_PREFIX}{name}.json", {
+            "name": name,
+            "mode": mode,
+            "attempts": attempts,
+            "enqueued_at": time.time(),
+        })
+        self.stats["enqueued"] += 1
+        logging.info(f"📥 Documento {name} registrado para o modo em massa")
+
+    async def _extract_document(self, pending: Dict):
+        """Modo, IR e imagens do documento pendente (None se ele saiu de `input/`)."""
+        name = pending["name"]
+        file_content = await self._io("read", INPUT_PREFIX + name)
+        if file_content is None:
+            logging.warning(f"Documento {name} não está mais em {INPUT_PREFIX}, ignorado")
+            return None
+        mode = self.requests.mode(pending["mode"])
+        ir, images = await self.run_cpu(extract_work_items, file_content, mode["describe_images"])
+        return mode, ir, images
+
+    def _build_document(self, pending: Dict, extracted, lines: List[str], request_ids: Dict[str, str]) -> Dict:
+        """Acrescenta as requisições do documento ao arquivo do job e devolve sua entrada no manifesto."""
+        mode, ir, images = extracted
+
+        # Textos idênticos (mesmo modo) são revisados uma vez por job
+        segments: List[Dict] = []
+        if mode["revise_text"]:
+            for segment, text in enumerate(ir.texts):
+                if not text.strip():
+                    continue
+                key = f"{mode['name']}\x00{text}"
+                custom_id = request_ids.get(key)
+                if custom_id is None:
+                    custom_id = request_ids[key] = f"t{len(request_ids)}"
+                    lines.append(build_batch_line(custom_id, self.requests.text_request(text, mode)))
+                segments.append({"locator": ir.locator(segment), "text": text, "request": custom_id})
+
+        image_entries: List[Dict] = []
+        body_texts = {para_idx: text for _, para_idx, text, _ in ir.paragraph_segments()}
+        for image_id, image_bytes in enumerate(images):
+            para_idx = ir.image_paragraphs[image_id]
+            context = " ".join(body_texts.get(i, "")[:150] for i in (para_idx - 1, para_idx, para_idx + 1))
+            custom_id = f"i{uuid.uuid4().hex[:10]}"
+            lines.append(build_batch_line(custom_id, self.requests.image_request(image_bytes, context.strip())))
+            image_entries.append({"image": image_id, "paragraph": para_idx, "request": custom_id})
+
+        return {
+            "name": pending["name"],
+            "mode": pending["mode"],
+            "attempts": pending.get("attempts", 0) + 1,
+            "segments": segments,
+            "images": image_entries,
+        }
+
+    async def _submit_job(self, documents: List[Dict], lines: List[str]) -> Dict:
+        job_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        batch_id = await self.backend.submit(lines, {"job_id": job_id})
+        job = {
+            "job_id": job_id,
+            "batch_id": batch_id,
+            "status": JOB_SUBMITTED,
+            "batch_status": None,
+            "submitted_at": time.time(),
+            "requests": len(lines),
+            "documents": documents,
+        }
+        await self._write_json(f"{JOBS_PREFIX}{job_id}.json", job)
+        for document in documents:
+            await self._io("delete", f"{PENDING_PREFIX}{document['name']}.json")
+        self.stats["jobs_submitted"] += 1
+        self.stats["requests_submitted"] += len(lines)
+        logging.info(f"📦 Job {job_id} enviado: {len(documents)} documento(s), {len(lines)} requisição(ões)")
+        return job
+
+    async def submit_pending(self) -> List[str]:
+        """
+        Envia os documentos pendentes em um ou mais batches.
+
+        Returns:
+            Ids dos jobs criados
+        """
+        pending_names = await self._io("list", PENDING_PREFIX)
+        job_ids: List[str] = []
+        documents: List[Dict] = []
+        lines: List[str] = []
+        request_ids: Dict[str, str] = {}
+        size = 0
+
+        async def flush():
+            nonlocal documents, lines, request_ids, size
+            if lines:
+                job_ids.append((await self._submit_job(documents, lines))["job_id"])
+            elif documents:
+                # Documentos sem nada a revisar: a saída é o próprio original
+                for document in documents:
+                    await self._finish_document(document, {}, [])
+                    await self._io("delete", f"{PENDING_PREFIX}{document['name']}.json")
+            documents, lines, request_ids, size = [], [], {}, 0
+
+        for pending_name in pending_names:
+            pending = await self._read_json(pending_name)
+            if pending is None:
+                continue
+            document_lines: List[str] = []
+            document_ids = dict(request_ids)
+            try:
+                extracted = await self._extract_document(pending)
+                if extracted is None:
+                    await self._io("delete", pending_name)
+                    continue
+                document = self._build_document(pending, extracted, document_lines, document_ids)
+            except Exception as e:
+                logging.error(f"Erro ao preparar {pending['name']} para o batch: {str(e)}")
+                continue
+
+            document_size = sum(len(line) for line in document_lines)
+            if documents and (len(lines) + len(document_lines) > self.max_requests
+                              or size + document_size > self.max_bytes):
+                await flush()
+                # Requisições compartilhadas com o job anterior precisam ser refeitas (a IR é reaproveitada)
+                document_lines, document_ids = [], {}
+                document = self._build_document(pending, extracted, document_lines, document_ids)
+                document_size = sum(len(line) for line in document_lines)
+
+            documents.append(document)
+            lines.extend(document_lines)
+            request_ids = document_ids
+            size += document_size
+
+        await flush()
+        return job_ids
+
+    async def _finish_document(self, document: Dict, results: Dict[str, Dict], failed: List[str]):
+        """Aplica os resultados ao documento e grava a saída."""
+        name = document["name"]
+        file_content = await self._io("read", INPUT_PREFIX + name)
+        if file_content is None:
+            logging.warning(f"Documento {name} não está mais em {INPUT_PREFIX}, saída não gerada")
+            return
+
+        patch = {"format": PATCH_FORMAT, "version": PATCH_VERSION, "segments": [], "images": []}
+        for entry in document["segments"]:
+            result = results.get(entry["request"])
+            if result and result.get("content"):
+                patch["segments"].append({
+                    "locator": entry["locator"],
+                    "original": entry["text"],
+                    "revised": self.requests.parse_text(entry["text"], result["content"]),
+                })
+            else:
+                failed.append(entry["locator"])
+
+        for entry in document["images"]:
+            result = results.get(entry["request"])
+            if result and result.get("content"):
+                patch["images"].append({
+                    "image": entry["image"],
+                    "paragraph": entry["paragraph"],
+                    "description": result["content"].strip(),
+                })
+            else:
+                failed.append(f"image:{entry['image']}")
+
+        corrected_content, applied = await self.run_cpu(apply_patch, file_content, patch, False)
+        if applied["skipped"]:
+            logging.warning(f"⚠️ {name}: {applied['skipped']} item(ns) não conferem com o documento em "
+                            f"{INPUT_PREFIX} (alterado depois do envio), mantidos sem revisão")
+        await self._io("write", OUTPUT_PREFIX + name, corrected_content)
+        self.stats["documents_completed"] += 1
+        logging.info(f"✅ Documento {name} montado pelo modo em massa ({OUTPUT_PREFIX}{name})")
+
+    async def _poll_job(self, job_name: str, job: Dict):
+        status = await self.backend.status(job["batch_id"])
+        job["batch_status"] = status["status"]
+        if status["status"] not in TERMINAL_STATUSES:
+            await self._write_json(job_name, job)
+            return
+
+        if status["status"] == STATUS_COMPLETED:
+            results = await self.backend.results(job["batch_id"])
+            for document in job["documents"]:
+                failed: List[str] = []
+                try:
+                    await self._finish_document(document, results, failed)
+                except Exception as e:
+                    logging.error(f"Erro ao montar {document['name']}: {str(e)}", exc_info=True)
+                    failed.append("document")
+                    self.stats["documents_failed"] += 1
+                document["failed"] = failed
+                if failed:
+                    self.stats["requests_failed"] += len(failed)
+                    logging.warning(f"⚠️ {document['name']}: {len(failed)} item(ns) sem resposta do batch, "
+                                    f"mantidos sem revisão")
+            job["status"] = JOB_COMPLETED
+        else:
+            logging.warning(f"Batch {job['batch_id']} do job {job['job_id']} terminou com status {status['status']}")
+            for document in job["documents"]:
+                if document["attempts"] < self.max_attempts:
+                    await self.enqueue(document["name"], document["mode"], document["attempts"])
+                else:
+                    logging.error(f"❌ {document['name']} desistido após {document['attempts']} tentativa(s)")
+                    self.stats["documents_failed"] += 1
+            job["status"] = JOB_REQUEUED if status["status"] in ("expired", "cancelled") else JOB_FAILED
+
+        job["finished_at"] = time.time()
+        await self._write_json(job_name, job)
+
+    async def poll_jobs(self) -> List[Dict]:
+        """
+        Consulta os jobs abertos e monta os documentos dos batches concluídos.
+
+        Returns:
+            Resumo dos jobs consultados
+        """
+        polled = []
+        for job_name in await self._io("list", JOBS_PREFIX):
+            job = await self._read_json(job_name)
+            if job is None or job["status"] != JOB_SUBMITTED:
+                continue
+            try:
+                await self._poll_job(job_name, job)
+            except Exception as e:
+                logging.error(f"Erro ao consultar o job {job['job_id']}: {str(e)}", exc_info=True)
+            polled.append(self.summarize(job))
+        return polled
+
+    async def run_cycle(self) -> Dict:
+        """Envia os pendentes e consulta os jobs abertos (uma execução do timer)."""
+        submitted = await self.submit_pending()
+        polled = await self.poll_jobs()
+        return {"submitted": submitted, "polled": polled}
+
+    @staticmethod
+    def summarize(job: Dict) -> Dict:
+        return {
+            "job_id": job["job_id"],
+            "batch_id": job["batch_id"],
+            "status": job["status"],
+            "batch_status": job.get("batch_status"),
+            "requests": job["requests"],
+            "documents": [
+                {"name": document["name"], "failed": len(document.get("failed", []))}
+                for document in job["documents"]
+            ],
+        }
+
+    async def list_jobs(self) -> Dict:
+        """Documentos pendentes e resumo de todos os jobs."""
+        pending = [name[len(PENDING_PREFIX):-len(".json")] for name in await self._io("list", PENDING_PREFIX)]
+        jobs = []
+        for job_name in await self._io("list", JOBS_PREFIX):
+            job = await self._read_json(job_name)
+            if job is not None:
+                jobs.append(self.summarize(job))
+        return {"pending": pending, "jobs": jobs, "stats": dict(self.stats)}
@@ -0,0 +1,172 @@
+"""
+Aquecimento do cache de parágrafos padronizados (boilerplate).
+
+Boa parte de cada documento do SENAC é texto de modelo: cabeçalhos,
+orientações de atividade, avisos de direitos. Este job percorre um acervo de
+documentos já existentes (diretório local ou prefixo do container de
+documentos), conta em quantos documentos cada parágrafo aparece (texto
+normalizado: datas e números não distinguem parágrafos) e revisa uma única
+vez, em lote, os que aparecem em pelo menos `--min-documents` documentos.
+
+As revisões entram no índice de quase duplicados (near_duplicates) e ficam
+guardadas no cache de documentos, de onde cada worker as carrega (e recarrega
+periodicamente) em segundo plano:
+documentos de primeira viagem no início do semestre já encontram os
+parágrafos padronizados revisados.
+
+O relatório de frequência mostra a taxa de acerto esperada: a fração dos
+parágrafos do acervo cobertos pelos parágrafos aquecidos.
+
+Uso:
+    python cache_warming.py --dir acervo/ --min-documents 3
+    python cache_warming.py --blob-prefix input/ --mode spelling --report-only
+"""
+
+import json
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from near_duplicates import normalize_text
+
+
+def iter_local_corpus(root: str) -> Iterator[Tuple[str, bytes]]:
+    """Documentos .docx de um diretório (recursivo): (caminho, conteúdo)."""
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".docx") and not filename.startswith("~$"):
+                path = os.path.join(directory, filename)
+                with open(path, "rb") as f:
+                    yield path, f.read()
+
+
+def iter_blob_corpus(container_client, prefix: str) -> Iterator[Tuple[str, bytes]]:
+    """Documentos .docx de um prefixo do container: (nome do blob, conteúdo)."""
+    for blob in container_client.list_blobs(name_starts_with=prefix):
+        if blob.name.lower().endswith(".docx"):
+            yield blob.name, container_client.download_blob(blob.name).readall()
+
+
+class BoilerplateScanner:
+    """Frequência dos parágrafos (por documento) em um acervo."""
+
+    def __init__(self, min_chars: int = 40):
+        """
+        Args:
+            min_chars: Tamanho mínimo de um parágrafo para entrar na contagem de
+                parágrafos padronizados (mesmo limite do índice de quase duplicados)
+        """
+        self.min_chars = min_chars
+        self.documents = 0
+        self.paragraphs = 0
+        # Texto normalizado -> documentos em que aparece / ocorrências / variantes originais
+        self._document_counts: Counter = Counter()
+        self._occurrences: Counter = Counter()
+        self._variants: Dict[str, Counter] = defaultdict(Counter)
+
+    def add_document(self, texts: Iterable[str]):
+        """Registra os textos dos parágrafos de um documento."""
+        self.documents += 1
+        seen = set()
+        for text in texts:
+            text = text.strip()
+            if not text:
+                continue
+            self.paragraphs += 1
+            if len(text) < self.min_chars:
+                continue
+            key = normalize_text(text)
+            self._occurrences[key] += 1
+            self._variants[key][text] += 1
+            if key not in seen:
+                seen.add(key)
+                self._document_counts[key] += 1
+
+    def frequent(self, min_documents: int) -> List[Tuple[str, int]]:
+        """
+        Parágrafos presentes em pelo menos `min_documents` documentos.
+
+        Returns:
+            Lista (variante mais comum do texto, documentos), do mais frequente ao menos
+        """
+        return [
+            (self._variants[key].most_common(1)[0][0], documents)
+            for key, documents in self._document_counts.most_common()
+            if documents >= min_documents
+        ]
+
+    def report(self, min_documents: int, top: int = 20) -> Dict:
+        """Relatório de frequência com a taxa de acerto esperada após o aquecimento."""
+        frequent = [key for key, documents in self._document_counts.items() if documents >= min_documents]
+        covered = sum(self._occurrences[key] for key in frequent)
+        return {
+            "documents": self.documents,
+            "paragraphs": self.paragraphs,
+            "distinct_paragraphs": len(self._document_counts),
+            "min_documents": min_documents,
+            "boilerplate_paragraphs": len(frequent),
+            "covered_occurrences": covered,
+            "expected_hit_rate": round(covered / self.paragraphs, 3) if self.paragraphs else 0.0,
+            "top": [
+                {"documents": documents, "text": text[:120]}
+                for text, documents in self.frequent(min_documents)[:top]
+            ],
+        }
+
+
+def main():
+    """Função principal para uso via linha de comando."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Aquecer o cache com os parágrafos padronizados de um acervo')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dir', help='Diretório local com documentos .docx (recursivo)')
+    source.add_argument('--blob-prefix', help='Prefixo no container "documentos" (ex.: input/)')
+    parser.add_argument('--mode', help='Modo de revisão (default: pedagogical)')
+    parser.add_argument('--min-documents', type=int, default=3,
+                        help='Documentos mínimos em que o parágrafo aparece (default: 3)')
+    parser.add_argument('--limit', type=int, default=2000,
+                        help='Máximo de parágrafos revisados (default: 2000)')
+    parser.add_argument('--top', type=int, default=20, help='Parágrafos listados no relatório (default: 20)')
+    parser.add_argument('--report-only', action='store_true', help='Apenas o relatório de frequência, sem revisar')
+    parser.add_argument('--output', help='Salvar o relatório em JSON neste arquivo')
+    args = parser.parse_args()
+
+    # function_app lê a configuração do ambiente (Azure OpenAI, cache de documentos)
+    import function_app
+    from docx_worker import extract_work_items
+
+    if args.dir:
+        corpus = iter_local_corpus(args.dir)
+    else:
+        from azure.storage.blob import BlobServiceClient
+        container = BlobServiceClient.from_connection_string(
+            os.environ["AzureWebJobsStorage"]).get_container_client(function_app.BLOB_CONTAINER)
+        corpus = iter_blob_corpus(container, args.blob_prefix)
+
+    scanner = BoilerplateScanner(function_app.NEAR_DUPLICATE_MIN_CHARS)
+    for name, content in corpus:
+        try:
+            ir, _ = extract_work_items(content, False)
+        except Exception as e:
+            print(f"⚠️ {name} ignorado: {str(e)}")
+            continue
+        scanner.add_document(text for _, _, text, _ in ir.paragraph_segments())
+    print(f"📚 {scanner.documents} documento(s), {scanner.paragraphs} parágrafo(s) analisados")
+
+    report = scanner.report(args.min_documents, args.top)
+    if not args.report_only:
+        texts = [text for text, _ in scanner.frequent(args.min_documents)[:args.limit]]
+        print(f"⏳ Revisando {len(texts)} parágrafo(s) padronizado(s)...")
+        report["warming"] = function_app.runtime.run(function_app.warm_boilerplate(texts, args.mode))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
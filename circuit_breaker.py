@@ -0,0 +1,241 @@
+"""
+Circuit breaker para a dependência Azure OpenAI.
+
+Quando o Azure OpenAI está degradado, cada chamada espera o timeout do SDK e
+as retentativas antes de desistir: um documento de 300 parágrafos passa horas
+produzindo uma cópia sem revisão. O breaker é compartilhado por todas as
+chamadas e documentos da instância:
+
+- CLOSED: chamadas normais; falhas são contadas
+- OPEN: aberto após N falhas consecutivas ou taxa de falha alta na janela
+  recente; chamadas falham imediatamente (CircuitOpenError) e os endpoints
+  rejeitam novos documentos com 503 + Retry-After
+- HALF_OPEN: passado o tempo de espera, poucas chamadas de teste são
+  liberadas; sucesso fecha o circuito, falha reabre. As demais chamadas
+  aguardam o resultado das chamadas de teste (acquire) em vez de falhar:
+  com o circuito fechado seguem normalmente, reaberto são rejeitadas
+
+O resultado das chamadas de teste fica em um concurrent.futures.Future, como
+em single_flight, para que a espera funcione entre threads e event loops.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Chamada rejeitada porque o circuito está aberto."""
+
+    def __init__(self, retry_after: float, probe: Optional[concurrent.futures.Future] = None):
+        """
+        Args:
+            retry_after: Segundos até o circuito liberar chamadas de teste
+            probe: No meio-aberto com as chamadas de teste ocupadas, o resultado
+                delas (ver CircuitBreaker.acquire); None com o circuito aberto
+        """
+        super().__init__(f"Azure OpenAI indisponível (circuito aberto), tente novamente em {retry_after:.0f}s")
+        self.retry_after = retry_after
+        self.probe = probe
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """
+    Indica se o erro aponta problema na dependência (e não na requisição).
+
+    Timeouts, falhas de conexão, 5xx e 429 contam como falha; erros 4xx de
+    requisição (ex.: filtro de conteúdo, parâmetros inválidos) não.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        return True
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitBreaker:
+    """Circuit breaker thread-safe com abertura por falhas consecutivas ou taxa de falha."""
+
+    def __init__(self, consecutive_failures: int = 5, failure_rate: float = 0.5,
+                 window_size: int = 20, min_calls: int = 10, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            consecutive_failures: Falhas seguidas que abrem o circuito
+            failure_rate: Taxa de falha (0-1) na janela recente que abre o circuito
+            window_size: Tamanho da janela de resultados recentes
+            min_calls: Chamadas mínimas na janela antes de avaliar a taxa
+            open_seconds: Tempo aberto antes de liberar chamadas de teste
+            half_open_max_calls: Chamadas de teste simultâneas no estado HALF_OPEN
+            clock: Relógio monotônico (injetável)
+        """
+        self.consecutive_failures = consecutive_failures
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._results = deque(maxlen=window_size)
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        # Resultado das chamadas de teste em andamento (estado após o teste)
+        self._probe: Optional[concurrent.futures.Future] = None
+        self.stats = {"opened": 0, "rejected": 0, "probe_waits": 0, "failures": 0, "successes": 0}
+
+    def _refresh(self):
+        if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open(self):
+        self._state = STATE_OPEN
+        self._opened_at = self._clock()
+        self._half_open_calls = 0
+        self.stats["opened"] += 1
+
+    def _take_probe(self) -> Optional[concurrent.futures.Future]:
+        # Resolvido fora do lock, depois de o estado mudar
+        probe, self._probe = self._probe, None
+        return probe
+
+    def _settle(self, probe: Optional[concurrent.futures.Future], state: str):
+        if probe is not None and not probe.done():
+            probe.set_result(state)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def is_open(self) -> bool:
+        """True enquanto o circuito rejeita chamadas (não consome chamada de teste)."""
+        return self.state == STATE_OPEN
+
+    def retry_after(self) -> float:
+        """Segundos até o circuito liberar chamadas de teste."""
+        with self._lock:
+            self._refresh()
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def before_call(self):
+        """
+        Autoriza uma chamada sem esperar.
+
+        Raises:
+            CircuitOpenError: Se o circuito está aberto ou as chamadas de teste já
+                estão em uso (nesse caso com `probe` para aguardar o resultado delas)
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == STATE_CLOSED:
+                return
+            if self._state == STATE_HALF_OPEN:
+                if self._half_open_calls < self.half_open_max_calls:
+                    self._half_open_calls += 1
+                    if self._probe is None:
+                        self._probe = concurrent.futures.Future()
+                    return
+                self.stats["probe_waits"] += 1
+                raise CircuitOpenError(0.0, self._probe)
+            self.stats["rejected"] += 1
+            retry_after = max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+        raise CircuitOpenError(retry_after)
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """
+        Autoriza uma chamada; no meio-aberto, aguarda o resultado das chamadas de teste.
+
+        Sem a espera, todas as chamadas concorrentes à de teste seriam
+        rejeitadas e o documento, admitido porque o circuito não estava aberto,
+        voltaria quase todo sem revisão.
+
+        Args:
+            timeout: Espera máxima pelas chamadas de teste (None = sem limite)
+
+        Raises:
+            CircuitOpenError: Se o circuito está (ou foi re)aberto, ou se as
+                chamadas de teste não terminaram dentro de `timeout`
+        """
+        wait_until = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self.before_call()
+                return
+            except CircuitOpenError as e:
+                if e.probe is None:
+                    raise
+                remaining = None if wait_until is None else wait_until - time.monotonic()
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    # shield: desistir da espera não resolve o resultado compartilhado
+                    await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(e.probe)), remaining)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self.stats["rejected"] += 1
+                    raise CircuitOpenError(e.retry_after) from None
+
+    def record_success(self):
+        probe = None
+        with self._lock:
+            self.stats["successes"] += 1
+            self._consecutive = 0
+            self._results.append(True)
+            if self._state == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._results.clear()
+                probe = self._take_probe()
+        self._settle(probe, STATE_CLOSED)
+
+    def record_failure(self):
+        probe = None
+        with self._lock:
+            self.stats["failures"] += 1
+            self._consecutive += 1
+            self._results.append(False)
+            if self._state == STATE_HALF_OPEN:
+                self._open()
+                probe = self._take_probe()
+            elif self._state == STATE_CLOSED:
+                failures = self._results.count(False)
+                if self._consecutive >= self.consecutive_failures or (
+                        len(self._results) >= self.min_calls and failures / len(self._results) >= self.failure_rate):
+                    self._open()
+        self._settle(probe, STATE_OPEN)
+
+    def record_cancelled(self):
+        """Chamada abandonada sem resultado (ex.: tarefa cancelada): libera a vaga de teste."""
+        probe = None
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+                if self._half_open_calls == 0:
+                    # Quem aguardava tenta de novo; o primeiro vira a nova chamada de teste
+                    probe = self._take_probe()
+        self._settle(probe, STATE_HALF_OPEN)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            retry_after = 0.0
+            if self._state == STATE_OPEN:
+                retry_after = max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+            return {
+                "state": self._state,
+                "retry_after_seconds": round(retry_after, 1),
+                "consecutive_failures": self._consecutive,
+                "recent_failure_rate": round(self._results.count(False) / max(len(self._results), 1), 2),
+                **self.stats,
+            }
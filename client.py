@@ -16,6 +16,12 @@ Uso:
     # Processar múltiplos documentos
     python client.py *.docx --output-dir corrigidos
     
+    # Baixar só o patch da revisão e montar o .docx localmente
+    python client.py documento.docx --patch
+    
+    # Acompanhar a revisão parágrafo a parágrafo (NDJSON)
+    python client.py documento.docx --stream
+    
     # Via Blob Storage
     python client.py --blob-upload documento.docx
     
@@ -25,28 +31,55 @@ Uso:
 
 import requests
 import argparse
+import base64
+import hashlib
 import os
 import json
 import time
 import sys
 from pathlib import Path
-from typing import Optional, List, Dict
-from datetime import datetime
+from typing import Callable, Optional, List, Dict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def retry_after_seconds(response, default: float) -> float:
+    """
+    Espera indicada pelo header Retry-After (segundos ou data HTTP).
+    
+    A função responde 429 (sem capacidade) e 503 (Azure OpenAI indisponível)
+    com Retry-After; sem o header, usa `default`.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
 
 
 class WordCorrectionClient:
     """Cliente para interagir com Azure Function de correção de documentos."""
     
-    def __init__(self, endpoint: str = "http://localhost:7071", max_retries: int = 3):
+    def __init__(self, endpoint: str = "http://localhost:7071", max_retries: int = 3,
+                 max_retry_wait: float = 300):
         """
         Inicializa o cliente.
         
         Args:
             endpoint: URL base da Azure Function
             max_retries: Número máximo de tentativas em caso de falha
+            max_retry_wait: Espera máxima (segundos) aceita de um Retry-After
         """
         self.endpoint = endpoint.rstrip('/')
         self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
         self.stats = {
             "total": 0,
             "success": 0,
@@ -75,14 +108,28 @@ class WordCorrectionClient:
     def correct_document(self, 
                         input_path: str, 
                         output_path: Optional[str] = None,
-                        verbose: bool = True) -> bool:
+                        verbose: bool = True,
+                        mode: Optional[str] = None,
+                        use_cache: bool = True,
+                        document_id: Optional[str] = None,
+                        patch: bool = False) -> bool:
         """
         Envia documento para correção via HTTP.
         
+        Antes do upload, envia apenas o SHA-256 do arquivo (/api/precheck): se o
+        mesmo arquivo já foi revisado no mesmo modo, o resultado é baixado sem
+        reenviar o documento.
+        
         Args:
             input_path: Caminho do documento a ser corrigido
             output_path: Caminho para salvar documento corrigido (opcional)
             verbose: Mostrar mensagens de progresso
+            mode: Modo de revisão (pedagogical, spelling, text-only, images-only)
+            use_cache: Consultar o cache de resultados antes do upload
+            document_id: Identificação do documento entre versões: só os parágrafos
+                alterados desde a última revisão completa são revisados
+            patch: Baixar apenas o patch da revisão (JSON com os parágrafos alterados e
+                as descrições de imagem) e montar o .docx localmente a partir do original
             
         Returns:
             True se sucesso, False caso contrário
@@ -107,6 +154,11 @@ class WordCorrectionClient:
             print(f"📤 Enviando: {input_path}")
             print(f"📥 Salvando em: {output_path}")
         
+        # Resultado já disponível para o mesmo arquivo
+        if use_cache and self.fetch_cached(input_path, output_path, verbose=verbose, mode=mode, patch=patch):
+            self.stats["success"] += 1
+            return True
+        
         # Tentar com retry
         for attempt in range(1, self.max_retries + 1):
             try:
@@ -126,19 +178,28 @@ class WordCorrectionClient:
                     response = requests.post(
                         f"{self.endpoint}/api/correct-document",
                         files=files,
+                        data={key: value for key, value in (('mode', mode), ('document_id', document_id),
+                                                            ('format', 'patch' if patch else None))
+                              if value} or None,
                         timeout=600  # 10 minutos
                     )
                 
                 # Verificar resposta
                 if response.status_code == 200:
-                    # Salvar documento corrigido
-                    with open(output_path, 'wb') as f:
-                        f.write(response.content)
-                    
                     file_size_kb = len(response.content) / 1024
-                    if verbose:
-                        print(f"✅ Sucesso! Documento corrigido ({file_size_kb:.2f} KB)")
-                        print(f"📂 Arquivo: {output_path}")
+                    if patch:
+                        # Montar o documento corrigido a partir do original
+                        self.apply_revision_patch(input_path, response.content, output_path, verbose=verbose)
+                        if verbose:
+                            print(f"✅ Sucesso! Patch aplicado ({file_size_kb:.2f} KB baixados)")
+                            print(f"📂 Arquivo: {output_path}")
+                    else:
+                        # Salvar documento corrigido
+                        with open(output_path, 'wb') as f:
+                            f.write(response.content)
+                        if verbose:
+                            print(f"✅ Sucesso! Documento corrigido ({file_size_kb:.2f} KB)")
+                            print(f"📂 Arquivo: {output_path}")
                     
                     self.stats["success"] += 1
                     return True
@@ -152,9 +213,10 @@ class WordCorrectionClient:
                             print(f"   Resposta: {response.text[:200]}")
                     
                     if attempt < self.max_retries:
-                        wait_time = 2 ** attempt
+                        # 429/503: o servidor informa quando tentar de novo
+                        wait_time = min(retry_after_seconds(response, 2 ** attempt), self.max_retry_wait)
                         if verbose:
-                            print(f"   Aguardando {wait_time}s antes de tentar novamente...")
+                            print(f"   Aguardando {wait_time:.0f}s antes de tentar novamente...")
                         time.sleep(wait_time)
                     
             except requests.exceptions.Timeout:
@@ -182,10 +244,197 @@ class WordCorrectionClient:
             print("❌ Falha após todas as tentativas")
         return False
     
+    def fetch_cached(self,
+                     input_path: str,
+                     output_path: str,
+                     verbose: bool = True,
+                     mode: Optional[str] = None,
+                     patch: bool = False) -> bool:
+        """
+        Baixa o resultado em cache do documento, enviando apenas o hash.
+        
+        Returns:
+            True se o resultado estava em cache e foi salvo em output_path
+        """
+        sha256 = hashlib.sha256()
+        with open(input_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(block)
+        
+        params = {'sha256': sha256.hexdigest(), 'filename': os.path.basename(input_path)}
+        if mode:
+            params['mode'] = mode
+        if patch:
+            params['format'] = 'patch'
+        
+        try:
+            response = requests.get(f"{self.endpoint}/api/precheck", params=params, timeout=60)
+        except requests.exceptions.RequestException:
+            return False
+        
+        if response.status_code != 200:
+            return False
+        
+        if patch:
+            try:
+                self.apply_revision_patch(input_path, response.content, output_path, verbose=verbose)
+            except Exception as e:
+                # Patch de outro arquivo/versão ou original corrompido: revisar com upload completo
+                if verbose:
+                    print(f"⚠️ Patch em cache não pôde ser aplicado ({str(e)}), enviando o documento")
+                return False
+        else:
+            with open(output_path, 'wb') as f:
+                f.write(response.content)
+        if verbose:
+            print(f"♻️ Resultado em cache, upload evitado ({len(response.content) / 1024:.2f} KB)")
+            print(f"📂 Arquivo: {output_path}")
+        return True
+    
+    def apply_revision_patch(self,
+                             input_path: str,
+                             patch_content: bytes,
+                             output_path: str,
+                             verbose: bool = True) -> Dict:
+        """
+        Monta o documento corrigido aplicando o patch da revisão ao arquivo original.
+        
+        Args:
+            input_path: Documento original (o mesmo enviado para correção)
+            patch_content: Corpo da resposta com format=patch
+            output_path: Caminho para salvar o documento corrigido
+            
+        Returns:
+            Resumo da aplicação (applied, images, skipped)
+            
+        Raises:
+            revision_patch.PatchMismatchError: patch gerado para outro arquivo
+        """
+        # python-docx só é necessário para o modo patch
+        from revision_patch import apply_patch
+        
+        with open(input_path, 'rb') as f:
+            original = f.read()
+        corrected, summary = apply_patch(original, json.loads(patch_content))
+        with open(output_path, 'wb') as f:
+            f.write(corrected)
+        if verbose:
+            print(f"🧩 Patch: {summary['applied']} parágrafo(s) e {summary['images']} descrição(ões) de imagem")
+            if summary['skipped']:
+                print(f"   ⚠️ {summary['skipped']} item(ns) do patch não conferem com o original e foram ignorados")
+        return summary
+    
+    def stream_document(self,
+                        input_path: str,
+                        output_path: Optional[str] = None,
+                        verbose: bool = True,
+                        mode: Optional[str] = None,
+                        document_id: Optional[str] = None,
+                        patch: bool = False,
+                        on_event: Optional[Callable[[Dict], None]] = None) -> bool:
+        """
+        Envia o documento para /api/correct-document-stream e acompanha os eventos NDJSON.
+        
+        Cada parágrafo revisado e cada descrição de imagem chega assim que fica
+        pronto (`on_event` recebe todos os eventos); o documento é salvo com o
+        evento final. Respostas 429/503 (antes do stream) são repetidas
+        respeitando o Retry-After, como em correct_document.
+        
+        Returns:
+            True se sucesso, False caso contrário
+        """
+        if not output_path:
+            input_file = Path(input_path)
+            output_path = str(input_file.parent / f"{input_file.stem}_corrigido.docx")
+        
+        fields = {key: value for key, value in (('mode', mode), ('document_id', document_id),
+                                                ('format', 'patch' if patch else None)) if value}
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if verbose and attempt > 1:
+                    print(f"   Tentativa {attempt}/{self.max_retries}...")
+                with open(input_path, 'rb') as f:
+                    files = {
+                        'file': (os.path.basename(input_path), f,
+                                'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+                    }
+                    response = requests.post(f"{self.endpoint}/api/correct-document-stream", files=files,
+                                             data=fields or None, stream=True, timeout=600)
+                
+                # 429 (admissão) e 503 (circuito aberto) chegam antes do stream, como JSON comum
+                if response.status_code != 200:
+                    if verbose:
+                        print(f"⚠️ Erro: Status {response.status_code}")
+                        try:
+                            print(f"   Mensagem: {response.json().get('error', 'Erro desconhecido')}")
+                        except ValueError:
+                            print(f"   Resposta: {response.text[:200]}")
+                    if attempt < self.max_retries:
+                        wait_time = min(retry_after_seconds(response, 2 ** attempt), self.max_retry_wait)
+                        if verbose:
+                            print(f"   Aguardando {wait_time:.0f}s antes de tentar novamente...")
+                        time.sleep(wait_time)
+                    continue
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        if verbose:
+                            print(f"⚠️ Linha inválida no stream ignorada: {line[:80]!r}")
+                        continue
+                    if on_event is not None:
+                        on_event(event)
+                    kind = event.get("event")
+                    if kind == "error":
+                        if verbose:
+                            print(f"❌ Erro {event.get('status')}: {event.get('error')}")
+                        self.stats["failed"] += 1
+                        return False
+                    if kind == "progress" and verbose:
+                        print(f"⏳ {event['done']}/{event['total']} item(ns) ({event['elapsed_seconds']:.0f}s)")
+                    elif kind == "result":
+                        if patch:
+                            try:
+                                self.apply_revision_patch(input_path, json.dumps(event["patch"]).encode('utf-8'),
+                                                          output_path, verbose=verbose)
+                            except Exception as e:
+                                if verbose:
+                                    print(f"❌ Erro ao aplicar o patch: {str(e)}")
+                                self.stats["failed"] += 1
+                                return False
+                        else:
+                            with open(output_path, 'wb') as out:
+                                out.write(base64.b64decode(event["document"]))
+                        if verbose:
+                            print(f"✅ Sucesso! Status: {event['report'].get('status')}")
+                            print(f"📂 Arquivo: {output_path}")
+                        self.stats["success"] += 1
+                        return True
+                if verbose:
+                    print("❌ Streaming encerrado sem o resultado")
+                break
+            except requests.exceptions.RequestException as e:
+                if verbose:
+                    print(f"❌ Erro de conexão: {str(e)}")
+                break
+        else:
+            if verbose:
+                print("❌ Falha após todas as tentativas")
+        
+        self.stats["failed"] += 1
+        return False
+    
     def correct_multiple(self, 
                         input_paths: List[str], 
                         output_dir: Optional[str] = None,
-                        verbose: bool = True) -> Dict:
+                        verbose: bool = True,
+                        mode: Optional[str] = None,
+                        use_cache: bool = True,
+                        incremental: bool = False,
+                        patch: bool = False) -> Dict:
         """
         Corrige múltiplos documentos.
         
@@ -193,6 +442,10 @@ class WordCorrectionClient:
             input_paths: Lista de caminhos dos documentos
             output_dir: Diretório para salvar documentos corrigidos
             verbose: Mostrar mensagens de progresso
+            mode: Modo de revisão aplicado a todos os documentos
+            use_cache: Consultar o cache de resultados antes de cada upload
+            incremental: Usar o nome do arquivo como document_id (revisão incremental)
+            patch: Baixar apenas o patch de cada revisão e montar os .docx localmente
             
         Returns:
             Dicionário com estatísticas do processamento
@@ -221,7 +474,10 @@ class WordCorrectionClient:
                 filename = Path(input_path).name
                 output_path = os.path.join(output_dir, filename.replace('.docx', '_corrigido.docx'))
             
-            success = self.correct_document(input_path, output_path, verbose=verbose)
+            success = self.correct_document(input_path, output_path, verbose=verbose, mode=mode,
+                                            use_cache=use_cache,
+                                            document_id=Path(input_path).name if incremental else None,
+                                            patch=patch)
             
             results["files"].append({
                 "input": input_path,
@@ -284,13 +540,14 @@ class BlobStorageClient:
         except ImportError:
             raise ImportError("azure-storage-blob não instalado. Execute: pip install azure-storage-blob")
     
-    def upload_document(self, file_path: str, verbose: bool = True) -> bool:
+    def upload_document(self, file_path: str, verbose: bool = True, mode: Optional[str] = None) -> bool:
         """
         Faz upload de documento para Blob Storage.
         
         Args:
             file_path: Caminho do arquivo
             verbose: Mostrar mensagens
+            mode: Modo de revisão, gravado na metadata "mode" do blob
             
         Returns:
             True se sucesso
@@ -309,7 +566,7 @@ class BlobStorageClient:
             )
             
             with open(file_path, 'rb') as data:
-                blob_client.upload_blob(data, overwrite=True)
+                blob_client.upload_blob(data, overwrite=True, metadata={"mode": mode} if mode else None)
             
             if verbose:
                 print(f"✅ Upload concluído!")
@@ -443,6 +700,15 @@ Exemplos de uso:
   # Processar múltiplos documentos
   python client.py *.docx --output-dir corrigidos
 
+  # Apenas correção ortográfica (mais rápido e barato)
+  python client.py documento.docx --mode spelling
+
+  # Baixar só o patch (documentos com muitas imagens, conexões lentas)
+  python client.py documento.docx --patch
+
+  # Acompanhar o progresso da revisão (streaming NDJSON)
+  python client.py documento.docx --stream
+
   # Especificar endpoint customizado
   python client.py documento.docx -e https://func-word-correction.azurewebsites.net
 
@@ -479,6 +745,23 @@ Exemplos de uso:
                        type=int,
                        default=3,
                        help='Número de tentativas em caso de falha (default: 3)')
+    parser.add_argument('--mode',
+                       choices=['pedagogical', 'spelling', 'text-only', 'images-only'],
+                       help='Modo de revisão (default: pedagogical)')
+    parser.add_argument('--no-cache',
+                       action='store_true',
+                       help='Sempre enviar o arquivo, sem consultar o cache de resultados')
+    parser.add_argument('--incremental',
+                       action='store_true',
+                       help='Revisão incremental: só os parágrafos alterados desde a última '
+                            'revisão de um arquivo com o mesmo nome são revisados')
+    parser.add_argument('--patch',
+                       action='store_true',
+                       help='Baixar apenas o patch da revisão (parágrafos alterados e descrições '
+                            'de imagem) e montar o .docx localmente a partir do original')
+    parser.add_argument('--stream',
+                       action='store_true',
+                       help='Acompanhar a revisão em streaming (parágrafos e progresso à medida que terminam)')
     parser.add_argument('-q', '--quiet',
                        action='store_true',
                        help='Modo silencioso (menos mensagens)')
@@ -527,7 +810,7 @@ Exemplos de uso:
             blob_client = BlobStorageClient(args.connection_string)
             
             if args.blob_upload:
-                success = blob_client.upload_document(args.blob_upload, verbose=verbose)
+                success = blob_client.upload_document(args.blob_upload, verbose=verbose, mode=args.mode)
                 return 0 if success else 1
             
             elif args.blob_download:
@@ -557,12 +840,22 @@ Exemplos de uso:
     if len(args.files) == 1:
         # Arquivo único
         output = args.output or args.output_dir
-        success = client.correct_document(args.files[0], output, verbose=verbose)
+        if args.stream:
+            success = client.stream_document(args.files[0], output, verbose=verbose, mode=args.mode,
+                                             document_id=Path(args.files[0]).name if args.incremental else None,
+                                             patch=args.patch)
+            return 0 if success else 1
+        success = client.correct_document(args.files[0], output, verbose=verbose, mode=args.mode,
+                                         use_cache=not args.no_cache,
+                                         document_id=Path(args.files[0]).name if args.incremental else None,
+                                         patch=args.patch)
         return 0 if success else 1
     else:
         # Múltiplos arquivos
         output_dir = args.output_dir or args.output or "corrigidos"
-        results = client.correct_multiple(args.files, output_dir, verbose=verbose)
+        results = client.correct_multiple(args.files, output_dir, verbose=verbose, mode=args.mode,
+                                         use_cache=not args.no_cache, incremental=args.incremental,
+                                         patch=args.patch)
         return 0 if results["summary"]["failed"] == 0 else 1
 
 
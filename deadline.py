@@ -0,0 +1,179 @@
+"""
+Orçamento de tempo por documento.
+
+Uma única chamada lenta ao Azure OpenAI não pode consumir todo o limite de
+execução da Azure Function e fazer o documento voltar vazio. Cada documento
+recebe um orçamento (DOCUMENT_TIME_BUDGET_SECONDS) com uma reserva para
+salvar o .docx no final:
+
+- cada chamada ao modelo usa timeout = min(timeout padrão, tempo restante)
+- antes de despachar um item, o pipeline consulta `can_dispatch()`; quando o
+  tempo restante não cobre a latência esperada de uma chamada, o despacho
+  para e os itens restantes mantêm o texto original
+- os itens que ficaram sem revisão são listados em `report()`, devolvido na
+  metadata da resposta
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Latência assumida antes da primeira chamada concluída (segundos)
+INITIAL_CALL_ESTIMATE = 5.0
+# Peso da última observação na média móvel exponencial de latência
+LATENCY_EWMA_ALPHA = 0.3
+
+
+class UnrevisedItemError(Exception):
+    """Item que mantém o texto original e aparece no relatório como não revisado."""
+
+    message = "Item sem revisão"
+
+    def __init__(self, reason: str):
+        super().__init__(f"{self.message}: {reason}")
+        self.reason = reason
+
+
+class DispatchBlockedError(UnrevisedItemError):
+    """Item não despachado ao modelo (orçamento esgotado ou circuito aberto)."""
+
+    message = "Item não despachado"
+
+
+class RevisionFailedError(UnrevisedItemError):
+    """
+    Item enviado ao modelo sem revisão utilizável (falha, timeout ou resposta truncada).
+
+    Não é um bloqueio: os engines contam as falhas separadamente dos itens
+    não despachados.
+    """
+
+    message = "Revisão falhou"
+
+
+class DocumentDeadline:
+    """Prazo de processamento de um documento e registro do que ficou sem revisão."""
+
+    def __init__(self, budget_seconds: Optional[float], reserve_seconds: float = 15.0,
+                 initial_estimate: float = INITIAL_CALL_ESTIMATE,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            budget_seconds: Tempo total disponível para o documento (None = sem limite)
+            reserve_seconds: Tempo reservado para montar e salvar o .docx
+            initial_estimate: Latência esperada de uma chamada antes de haver medições
+            clock: Relógio monotônico (injetável)
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.budget_seconds = budget_seconds
+        self.reserve_seconds = reserve_seconds
+        self.started_at = clock()
+        self.deadline = self.started_at + budget_seconds if budget_seconds else float("inf")
+        self._estimate = initial_estimate
+        self._exhausted = False
+        self._unrevised: List[Dict] = []
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started_at
+
+    def remaining(self) -> float:
+        """Segundos restantes para chamadas ao modelo (já descontada a reserva)."""
+        return self.deadline - self.reserve_seconds - self._clock()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def call_timeout(self, default: float) -> float:
+        """Timeout de uma chamada: o menor entre o padrão e o tempo restante."""
+        return max(0.0, min(default, self.remaining()))
+
+    def observe(self, latency: float):
+        """Atualiza a estimativa de latência com uma chamada concluída."""
+        with self._lock:
+            self._estimate = LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self._estimate
+
+    @property
+    def estimated_call_seconds(self) -> float:
+        return self._estimate
+
+    def can_dispatch(self, weight: float = 1.0) -> bool:
+        """
+        Indica se ainda há tempo para despachar um item.
+
+        Depois que o orçamento deixa de cobrir uma chamada, o despacho fica
+        encerrado para o restante do documento.
+
+        Args:
+            weight: Custo relativo do item em "chamadas típicas"
+        """
+        with self._lock:
+            if self._exhausted:
+                return False
+            if self.remaining() < self._estimate * weight:
+                self._exhausted = True
+                return False
+            return True
+
+    def mark_unrevised(self, kind: str, locator, reason: str = "budget"):
+        """
+        Registra um item que manteve o texto original.
+
+        Args:
+            kind: "paragraph", "table_cell" ou "image"
+            locator: Identificação do item (índice do parágrafo, "tabela:linha,coluna", ...)
+            reason: "budget" (não despachado), "timeout" (chamada excedeu o prazo),
+                "error" (chamada falhou), "circuit_open" (Azure OpenAI
+                indisponível), "degraded" (pulado pela escada de degradação) ou
+                "truncated" (resposta cortada pelo limite de tokens)
+        """
+        with self._lock:
+            self._unrevised.append({"kind": kind, "locator": locator, "reason": reason})
+
+    @property
+    def partial(self) -> bool:
+        return bool(self._unrevised)
+
+    def report(self) -> Dict:
+        """Resumo do orçamento para a metadata da resposta."""
+        with self._lock:
+            unrevised = list(self._unrevised)
+        by_kind: Dict[str, List] = {}
+        by_reason: Dict[str, int] = {}
+        for item in unrevised:
+            by_kind.setdefault(item["kind"], []).append(item["locator"])
+            by_reason[item["reason"]] = by_reason.get(item["reason"], 0) + 1
+        return {
+            "status": "partial" if unrevised else "complete",
+            "budget_seconds": self.budget_seconds,
+            "elapsed_seconds": round(self.elapsed(), 2),
+            "unrevised_count": len(unrevised),
+            "unrevised": by_kind,
+            "unrevised_reasons": by_reason,
+        }
+
+
+def report_summary(report: Dict) -> Dict:
+    """
+    Resumo do relatório para o header X-Revision-Report.
+
+    Os localizadores dos itens não revisados crescem com o documento e
+    estouravam o limite de tamanho dos headers; ficam apenas no relatório completo.
+    """
+    summary = {key: report[key] for key in (
+        "status", "degradation", "budget_seconds", "elapsed_seconds", "unrevised_count", "unrevised_reasons"
+    ) if key in report}
+    summary["unrevised_kinds"] = {kind: len(locators) for kind, locators in report.get("unrevised", {}).items()}
+    return summary
+
+
+def create_deadline(budget_seconds: Optional[float], reserve_seconds: float) -> DocumentDeadline:
+    """
+    Cria o prazo do documento.
+
+    Com orçamento None ou <= 0 o prazo é ilimitado, mas o registro de itens
+    não revisados continua disponível para o relatório.
+    """
+    if not budget_seconds or budget_seconds <= 0:
+        return DocumentDeadline(None, reserve_seconds=0.0)
+    return DocumentDeadline(budget_seconds, reserve_seconds)
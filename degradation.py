@@ -0,0 +1,132 @@
+"""
+Escada de degradação sob saturação prolongada.
+
+Com a cota esgotada por muito tempo, é melhor entregar um documento com
+revisão ortográfica e sem descrição de imagens do que estourar o tempo. A
+escada sobe um degrau quando a pressão (fila e ocupação do limitador) fica
+acima do limiar do próximo degrau por `sustain_seconds`, e desce um degrau
+quando fica abaixo do limiar do degrau atual por `recover_seconds`:
+
+    0 normal       revisão completa
+    1 no_images    sem descrição de imagens
+    2 spelling     prompt curto de revisão ortográfica (modo spelling)
+    3 essential    além disso, parágrafos de pouco valor não são revisados
+
+O degrau é decidido no início de cada documento e vale para o documento todo.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+LEVEL_NORMAL = 0
+LEVEL_NO_IMAGES = 1
+LEVEL_SPELLING = 2
+LEVEL_ESSENTIAL = 3
+LEVEL_NAMES = ("normal", "no_images", "spelling", "essential")
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]{2,}")
+
+
+def parse_thresholds(value: str) -> List[float]:
+    """Converte "1.5,3,5" nos limiares de pressão dos degraus 1, 2 e 3."""
+    thresholds = [float(part) for part in value.split(",") if part.strip()]
+    if len(thresholds) != len(LEVEL_NAMES) - 1 or thresholds != sorted(thresholds):
+        raise ValueError(f"Limiares de degradação inválidos: '{value}' (esperado 3 valores crescentes)")
+    return thresholds
+
+
+def is_low_value(text: str, min_words: int = 4) -> bool:
+    """
+    Texto de pouco valor para revisão: rótulos, números, legendas curtas.
+
+    Usado no degrau "essential" para poupar chamadas.
+    """
+    return len(_WORD_PATTERN.findall(text)) < min_words
+
+
+class DegradationLadder:
+    """Degrau de degradação atual de uma faixa, com histerese para subir e descer."""
+
+    def __init__(self, thresholds: Sequence[float] = (1.5, 3.0, 5.0), sustain_seconds: float = 10.0,
+                 recover_seconds: float = 30.0, enabled: bool = True):
+        """
+        Args:
+            thresholds: Pressão mínima para os degraus 1, 2 e 3
+            sustain_seconds: Tempo acima do limiar antes de subir um degrau
+            recover_seconds: Tempo abaixo do limiar antes de descer um degrau
+            enabled: False para manter sempre o degrau 0
+        """
+        self.thresholds = list(thresholds)
+        self.sustain_seconds = sustain_seconds
+        self.recover_seconds = recover_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.level = LEVEL_NORMAL
+        self.pressure = 0.0
+        self._above_since: Optional[float] = None
+        self._below_since: Optional[float] = None
+        self._last_sample: Optional[float] = None
+        self.transitions = 0
+        self.documents = [0] * len(LEVEL_NAMES)
+
+    def _target(self, pressure: float) -> int:
+        return sum(1 for threshold in self.thresholds if pressure >= threshold)
+
+    def observe(self, pressure: float, now: Optional[float] = None) -> int:
+        """Registra uma amostra de pressão e devolve o degrau atual."""
+        if not self.enabled:
+            return LEVEL_NORMAL
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.pressure = pressure
+            target = self._target(pressure)
+            idle_gap = self._last_sample is not None and now - self._last_sample >= self.recover_seconds
+            self._last_sample = now
+
+            if target > self.level:
+                self._below_since = None
+                if self._above_since is None:
+                    self._above_since = now
+                if now - self._above_since >= self.sustain_seconds:
+                    self.level += 1
+                    self.transitions += 1
+                    self._above_since = now
+            elif target < self.level:
+                self._above_since = None
+                if idle_gap:
+                    # Nenhuma chamada por um bom tempo: a carga já passou
+                    self.level = target
+                    self.transitions += 1
+                    self._below_since = None
+                else:
+                    if self._below_since is None:
+                        self._below_since = now
+                    if now - self._below_since >= self.recover_seconds:
+                        self.level -= 1
+                        self.transitions += 1
+                        self._below_since = now
+            else:
+                self._above_since = None
+                self._below_since = None
+            return self.level
+
+    def begin_document(self, pressure: float) -> int:
+        """Degrau aplicado a um documento que está começando."""
+        level = self.observe(pressure)
+        with self._lock:
+            self.documents[level] += 1
+        return level
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "level": self.level,
+                "name": LEVEL_NAMES[self.level],
+                "pressure": round(self.pressure, 2),
+                "thresholds": self.thresholds,
+                "transitions": self.transitions,
+                "documents": dict(zip(LEVEL_NAMES, self.documents)),
+            }
@@ -0,0 +1,259 @@
+"""
+Cache de resultados por documento inteiro.
+
+Clientes reenviam com frequência o mesmo .docx, byte a byte (depois de um
+timeout, ou um colega da equipe com a mesma cópia), e o pipeline inteiro roda
+de novo. O resultado revisado fica guardado sob a chave
+
+    sha256(entrada) + modo + versão da configuração
+
+A versão da configuração (config_fingerprint) muda quando deployments,
+prompts ou engine mudam, então resultados antigos deixam de ser usados sem
+precisar limpar o cache. Apenas resultados completos (sem itens pulados por
+orçamento ou degradação) são guardados.
+
+Como a chave só depende do hash, o cliente pode perguntar pelo resultado
+(endpoint de precheck) antes de enviar o arquivo.
+
+O mesmo cache guarda registros JSON (get_record/put_record), usados pela
+revisão incremental para lembrar a última versão revisada de um documento.
+
+Backends:
+- LocalDocumentCache: diretório local, despejo LRU por tamanho total e idade
+- BlobDocumentCache: prefixo `cache/` no container de documentos, despejo por idade
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def document_hash(file_content: bytes) -> str:
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def is_document_hash(value: Optional[str]) -> bool:
+    return bool(value) and bool(_SHA256_PATTERN.match(value))
+
+
+def config_fingerprint(config: Dict) -> str:
+    """Versão curta de uma configuração (qualquer mudança gera outra versão)."""
+    encoded = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def cache_key(sha256: str, mode: str, config_version: str) -> str:
+    return f"{sha256}-{mode}-{config_version}"
+
+
+class _CacheStats:
+    """Contadores do cache, atualizados pelas threads dos handlers e do pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+class LocalDocumentCache:
+    """Cache em disco: `{chave}.docx` + `{chave}.json` (metadata), despejo LRU."""
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024, max_age_seconds: float = 7 * 86400):
+        """
+        Args:
+            root: Diretório do cache
+            max_bytes: Tamanho total máximo dos documentos guardados
+            max_age_seconds: Idade máxima de uma entrada
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.stats = _CacheStats()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.root, f"{key}.{extension}")
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        """Documento e metadata guardados, ou None."""
+        path = self._path(key, "docx")
+        try:
+            if time.time() - os.path.getmtime(self._path(key, "json")) > self.max_age_seconds:
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                content = f.read()
+            with open(self._path(key, "json"), encoding="utf-8") as f:
+                metadata = json.load(f)
+            # Acesso recente: fica por último na ordem de despejo
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Despejado por um put() concorrente depois da leitura; o conteúdo já foi lido
+                pass
+        except (FileNotFoundError, ValueError):
+            self.stats.count("misses")
+            return None
+        self.stats.count("hits")
+        return content, metadata
+
+    def put(self, key: str, content: bytes, metadata: Dict):
+        with self._lock:
+            tmp_path = self._path(key, "docx.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(key, "docx"))
+            with open(self._path(key, "json"), "w", encoding="utf-8") as f:
+                json.dump(dict(metadata, stored_at=time.time()), f, ensure_ascii=False)
+            self.stats.count("stores")
+            self._evict()
+
+    def get_record(self, key: str) -> Optional[Dict]:
+        path = self._path(key, "record.json")
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_record(self, key: str, record: Dict):
+        with self._lock:
+            tmp_path = self._path(key, "record.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key, "record.json"))
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".record.json"):
+                key, extensions = name[:-len(".record.json")], ("record.json",)
+            elif name.endswith(".docx"):
+                key, extensions = name[:-len(".docx")], ("docx", "json")
+            else:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, key, extensions))
+        entries.sort()
+        total = sum(entry[1] for entry in entries)
+        now = time.time()
+        for mtime, size, key, extensions in entries:
+            if total <= self.max_bytes and now - mtime <= self.max_age_seconds:
+                break
+            for extension in extensions:
+                try:
+                    os.remove(self._path(key, extension))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.stats.count("evictions")
+
+    def snapshot(self) -> Dict:
+        return dict(self.stats.snapshot(), backend="disk", max_bytes=self.max_bytes)
+
+
+class BlobDocumentCache:
+    """
+    Cache no Blob Storage: `cache/{chave}.docx` + `cache/{chave}.json` (relatório).
+
+    O relatório fica em um blob próprio porque a metadata de um blob é limitada
+    a 8KB e o relatório cresce com o documento.
+    """
+
+    def __init__(self, container_client, prefix: str = "cache/", max_age_seconds: float = 7 * 86400,
+                 evict_interval_seconds: float = 3600):
+        """
+        Args:
+            container_client: azure.storage.blob.ContainerClient
+            prefix: Prefixo dos blobs do cache
+            max_age_seconds: Idade máxima de uma entrada
+            evict_interval_seconds: Intervalo mínimo entre varreduras de despejo
+        """
+        self.container = container_client
+        self.prefix = prefix
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval_seconds = evict_interval_seconds
+        self.stats = _CacheStats()
+        self._last_evict = 0.0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self.container.download_blob(f"{self.prefix}{key}.docx")
+            properties = downloader.properties
+            if time.time() - properties.last_modified.timestamp() > self.max_age_seconds:
+                raise ResourceNotFoundError("expirado")
+            content = downloader.readall()
+            metadata = json.loads(self.container.download_blob(f"{self.prefix}{key}.json").readall())
+        except (ResourceNotFoundError, ValueError):
+            self.stats.count("misses")
+            return None
+        self.stats.count("hits")
+        return content, metadata
+
+    def put(self, key: str, content: bytes, metadata: Dict):
+        # Relatório antes do documento: um .docx encontrado sempre tem o seu relatório
+        self.container.upload_blob(f"{self.prefix}{key}.json",
+                                   json.dumps(metadata, ensure_ascii=False).encode("utf-8"), overwrite=True)
+        self.container.upload_blob(f"{self.prefix}{key}.docx", content, overwrite=True)
+        self.stats.count("stores")
+        if time.time() - self._last_evict >= self.evict_interval_seconds:
+            self._last_evict = time.time()
+            self._evict()
+
+    def get_record(self, key: str) -> Optional[Dict]:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self.container.download_blob(f"{self.prefix}{key}.record.json")
+            if time.time() - downloader.properties.last_modified.timestamp() > self.max_age_seconds:
+                return None
+            return json.loads(downloader.readall())
+        except ResourceNotFoundError:
+            return None
+
+    def put_record(self, key: str, record: Dict):
+        self.container.upload_blob(f"{self.prefix}{key}.record.json",
+                                   json.dumps(record, ensure_ascii=False).encode("utf-8"), overwrite=True)
+
+    def _evict(self):
+        cutoff = time.time() - self.max_age_seconds
+        for blob in self.container.list_blobs(name_starts_with=self.prefix):
+            if blob.last_modified.timestamp() < cutoff:
+                try:
+                    self.container.delete_blob(blob.name)
+                    self.stats.count("evictions")
+                except Exception as e:
+                    logging.warning(f"Não foi possível remover {blob.name} do cache: {str(e)}")
+
+    def snapshot(self) -> Dict:
+        return dict(self.stats.snapshot(), backend="blob")
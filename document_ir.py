@@ -0,0 +1,348 @@
+"""
+Representação intermediária (IR) compacta dos itens de trabalho de um documento.
+
+A revisão trabalhava direto sobre objetos `Paragraph` do python-docx, que não
+podem ir para outro processo, fila ou máquina. A IR separa o documento em três
+etapas independentes:
+
+1. extração (extract_document_ir): lê o .docx e gera a lista de segmentos
+   de texto com localizadores no XML, estilo e referências de imagem
+2. revisão: trabalha só com textos e índices (pode rodar em qualquer lugar)
+3. aplicação (apply_revisions): localiza cada segmento no pacote original e
+   aplica o texto revisado e as descrições de imagem
+
+Os segmentos ficam em colunas (`array` + listas de textos) em vez de um
+objeto por parágrafo, o que mantém a IR pequena para serializar (pickle para
+o pool de processos, to_dict/from_dict para JSON).
+
+Localizadores:
+- parágrafo do corpo: índice em `doc.paragraphs`
+- parágrafo de célula: tabela, linha, coluna (primeira ocorrência da célula
+  mesclada) e índice do parágrafo dentro da célula
+"""
+
+import logging
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from docx.oxml.ns import qn
+
+from table_revision import TableCell
+
+SEGMENT_PARAGRAPH = 0
+SEGMENT_TABLE_CELL = 1
+
+
+def apply_text_formatting(paragraph, text: str):
+    """
+    Aplica formatações especiais ao texto do parágrafo.
+    - *palavra* -> itálico
+    - **palavra** -> negrito (se vier do GPT)
+    - <<ALT_CORRETA_INICIO>> ... <<ALT_CORRETA_FIM>> -> negrito
+
+    Args:
+        paragraph: Objeto Paragraph do python-docx
+        text: Texto com marcadores de formatação
+    """
+    # Limpar runs existentes
+    for run in paragraph.runs:
+        run.text = ""
+
+    # Processar marcadores de alternativa correta
+    # <<ALT_CORRETA_INICIO>> texto <<ALT_CORRETA_FIM>> -> negrito
+    alt_pattern = r'<<ALT_CORRETA_INICIO>>(.+?)<<ALT_CORRETA_FIM>>'
+    if '<<ALT_CORRETA_INICIO>>' in text:
+        parts = re.split(alt_pattern, text, flags=re.DOTALL)
+        for i, part in enumerate(parts):
+            if i % 2 == 1:  # Parte entre os marcadores
+                run = paragraph.add_run(part)
+                run.bold = True
+            else:
+                # Processar itálicos na parte normal
+                apply_italic_formatting(paragraph, part)
+    else:
+        # Processar itálicos
+        apply_italic_formatting(paragraph, text)
+
+
+def apply_italic_formatting(paragraph, text: str):
+    """
+    Aplica formatação de itálico (*palavra*).
+
+    Args:
+        paragraph: Objeto Paragraph do python-docx
+        text: Texto com marcadores de itálico
+    """
+    # Padrão para itálico: *palavra* (mas não **palavra**)
+    italic_pattern = r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)'
+    parts = re.split(italic_pattern, text)
+
+    for i, part in enumerate(parts):
+        if i % 2 == 1:  # Parte entre asteriscos simples
+            run = paragraph.add_run(part)
+            run.italic = True
+        elif part:  # Parte normal
+            paragraph.add_run(part)
+
+
+def paragraph_style_name(paragraph) -> Optional[str]:
+    """Nome do estilo do parágrafo (None se o estilo não puder ser resolvido)."""
+    try:
+        return paragraph.style.name if paragraph.style is not None else None
+    except Exception:
+        return None
+
+
+class DocumentIR:
+    """
+    Segmentos de texto e referências de imagem de um documento, em colunas.
+
+    O segmento `i` é descrito por texts[i], kinds[i], blocks[i] (índice do
+    parágrafo ou da tabela), rows[i]/cols[i]/subs[i] (apenas células, -1 nos
+    parágrafos do corpo) e style_ids[i] (índice em style_names, -1 sem estilo).
+    A imagem `j` é descrita por image_paragraphs[j] e image_rel_ids[j].
+    """
+
+    __slots__ = ("texts", "kinds", "blocks", "rows", "cols", "subs", "style_ids", "style_names",
+                 "image_paragraphs", "image_rel_ids", "paragraph_count", "images_count")
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.kinds = array("B")
+        self.blocks = array("i")
+        self.rows = array("i")
+        self.cols = array("i")
+        self.subs = array("i")
+        self.style_ids = array("h")
+        self.style_names: List[str] = []
+        self.image_paragraphs = array("i")
+        self.image_rel_ids: List[str] = []
+        self.paragraph_count = 0
+        self.images_count = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add_segment(self, kind: int, text: str, block: int, row: int = -1, col: int = -1, sub: int = -1,
+                    style: Optional[str] = None) -> int:
+        """Adiciona um segmento e devolve seu id."""
+        if style is None:
+            style_id = -1
+        else:
+            try:
+                style_id = self.style_names.index(style)
+            except ValueError:
+                style_id = len(self.style_names)
+                self.style_names.append(style)
+        self.texts.append(text)
+        self.kinds.append(kind)
+        self.blocks.append(block)
+        self.rows.append(row)
+        self.cols.append(col)
+        self.subs.append(sub)
+        self.style_ids.append(style_id)
+        return len(self.texts) - 1
+
+    def add_image(self, para_index: int, rel_id: str) -> int:
+        """Adiciona uma referência de imagem e devolve seu id."""
+        self.image_paragraphs.append(para_index)
+        self.image_rel_ids.append(rel_id)
+        return len(self.image_rel_ids) - 1
+
+    def style(self, segment: int) -> Optional[str]:
+        style_id = self.style_ids[segment]
+        return self.style_names[style_id] if style_id >= 0 else None
+
+    def locator(self, segment: int) -> str:
+        """Localizador legível do segmento (ex.: "p:12", "t:0:1,2:0")."""
+        if self.kinds[segment] == SEGMENT_PARAGRAPH:
+            return f"p:{self.blocks[segment]}"
+        return f"t:{self.blocks[segment]}:{self.rows[segment]},{self.cols[segment]}:{self.subs[segment]}"
+
+    def paragraph_segments(self) -> Iterator[Tuple[int, int, str, Optional[str]]]:
+        """Segmentos do corpo como (id, índice do parágrafo, texto, estilo)."""
+        for segment, kind in enumerate(self.kinds):
+            if kind == SEGMENT_PARAGRAPH:
+                yield segment, self.blocks[segment], self.texts[segment], self.style(segment)
+
+    def table_cells(self) -> List[Tuple[int, List[TableCell]]]:
+        """
+        Células de tabela agrupadas por tabela, na ordem do documento.
+
+        Returns:
+            [(índice da tabela, [TableCell com `segments` = ids dos segmentos])]
+        """
+        tables: Dict[int, Dict[Tuple[int, int], TableCell]] = {}
+        for segment, kind in enumerate(self.kinds):
+            if kind != SEGMENT_TABLE_CELL:
+                continue
+            cells = tables.setdefault(self.blocks[segment], {})
+            position = (self.rows[segment], self.cols[segment])
+            cell = cells.get(position)
+            if cell is None:
+                cell = cells[position] = TableCell(position[0], position[1], [], segments=[])
+            cell.texts.append(self.texts[segment])
+            cell.segments.append(segment)
+        return [(table_idx, list(cells.values())) for table_idx, cells in tables.items()]
+
+    def to_dict(self) -> Dict:
+        """Forma serializável em JSON."""
+        return {
+            "texts": self.texts,
+            "kinds": self.kinds.tolist(),
+            "blocks": self.blocks.tolist(),
+            "rows": self.rows.tolist(),
+            "cols": self.cols.tolist(),
+            "subs": self.subs.tolist(),
+            "style_ids": self.style_ids.tolist(),
+            "style_names": self.style_names,
+            "image_paragraphs": self.image_paragraphs.tolist(),
+            "image_rel_ids": self.image_rel_ids,
+            "paragraph_count": self.paragraph_count,
+            "images_count": self.images_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DocumentIR":
+        ir = cls()
+        ir.texts = list(data["texts"])
+        ir.kinds = array("B", data["kinds"])
+        ir.blocks = array("i", data["blocks"])
+        ir.rows = array("i", data["rows"])
+        ir.cols = array("i", data["cols"])
+        ir.subs = array("i", data["subs"])
+        ir.style_ids = array("h", data["style_ids"])
+        ir.style_names = list(data["style_names"])
+        ir.image_paragraphs = array("i", data["image_paragraphs"])
+        ir.image_rel_ids = list(data["image_rel_ids"])
+        ir.paragraph_count = data["paragraph_count"]
+        ir.images_count = data["images_count"]
+        return ir
+
+
+def iter_unique_cells(table) -> Iterator[Tuple[int, int, object]]:
+    """
+    Percorre as células únicas de uma tabela como (linha, coluna, célula).
+
+    `row.cells` devolve a mesma célula mesclada várias vezes; a deduplicação
+    usa o elemento `_tc`, e a coordenada registrada é a da primeira ocorrência.
+    """
+    seen = set()
+    for row_idx, row in enumerate(table.rows):
+        for col_idx, cell in enumerate(row.cells):
+            if cell._tc in seen:
+                continue
+            seen.add(cell._tc)
+            yield row_idx, col_idx, cell
+
+
+def extract_document_ir(doc, include_images: bool = True) -> DocumentIR:
+    """
+    Extrai a IR de um documento python-docx.
+
+    Args:
+        doc: Documento python-docx
+        include_images: Se True, registra as imagens inline (r:embed de a:blip)
+
+    Returns:
+        DocumentIR com os parágrafos e células que possuem texto
+    """
+    ir = DocumentIR()
+    paragraphs = doc.paragraphs
+    ir.paragraph_count = len(paragraphs)
+
+    for para_idx, paragraph in enumerate(paragraphs):
+        text = paragraph.text
+        if text.strip():
+            ir.add_segment(SEGMENT_PARAGRAPH, text, para_idx, style=paragraph_style_name(paragraph))
+
+    for table_idx, table in enumerate(doc.tables):
+        for row_idx, col_idx, cell in iter_unique_cells(table):
+            for sub_idx, paragraph in enumerate(cell.paragraphs):
+                text = paragraph.text
+                if text.strip():
+                    ir.add_segment(SEGMENT_TABLE_CELL, text, table_idx, row_idx, col_idx, sub_idx)
+
+    ir.images_count = sum(1 for rel in doc.part.rels.values() if "image" in rel.target_ref)
+    if include_images and ir.images_count:
+        for para_idx, paragraph in enumerate(paragraphs):
+            for run in paragraph.runs:
+                # Verificar se o run contém imagem
+                if 'graphic' not in run._element.xml:
+                    continue
+                for blip in run._element.xpath('.//a:blip'):
+                    embed = blip.get(qn('r:embed'))
+                    if embed:
+                        ir.add_image(para_idx, embed)
+
+    return ir
+
+
+def image_blobs(doc, ir: DocumentIR) -> List[bytes]:
+    """Bytes das imagens referenciadas pela IR (mesma ordem dos ids de imagem)."""
+    return [doc.part.related_parts[rel_id].blob for rel_id in ir.image_rel_ids]
+
+
+def resolve_paragraphs(doc, ir: DocumentIR, segments: Iterable[int]) -> Dict[int, object]:
+    """Localiza no documento os objetos Paragraph dos segmentos informados."""
+    body = None
+    grids: Dict[int, List] = {}
+    tables = None
+    resolved = {}
+    for segment in segments:
+        block = ir.blocks[segment]
+        if ir.kinds[segment] == SEGMENT_PARAGRAPH:
+            if body is None:
+                body = doc.paragraphs
+            resolved[segment] = body[block]
+        else:
+            if block not in grids:
+                if tables is None:
+                    tables = doc.tables
+                grids[block] = [row.cells for row in tables[block].rows]
+            cell = grids[block][ir.rows[segment]][ir.cols[segment]]
+            resolved[segment] = cell.paragraphs[ir.subs[segment]]
+    return resolved
+
+
+def apply_revisions(doc, ir: DocumentIR, revised: Dict[int, str],
+                    image_descriptions: Iterable[Tuple[int, str]] = ()) -> int:
+    """
+    Aplica textos revisados e descrições de imagem ao documento.
+
+    Segmentos cujo texto atual não confere com o da IR (documento diferente
+    do extraído) são ignorados.
+
+    Args:
+        doc: Documento python-docx lido do mesmo pacote usado na extração
+        ir: IR extraída do documento
+        revised: Id do segmento -> texto revisado (com marcadores)
+        image_descriptions: [(id da imagem, descrição)]
+
+    Returns:
+        Número de segmentos aplicados
+    """
+    applied = 0
+    paragraphs = resolve_paragraphs(doc, ir, revised.keys())
+    for segment, text in revised.items():
+        paragraph = paragraphs[segment]
+        if paragraph.text != ir.texts[segment]:
+            logging.warning(f"Segmento {ir.locator(segment)} não confere com o documento, ignorado")
+            continue
+        if text and text != ir.texts[segment]:
+            apply_text_formatting(paragraph, text)
+            applied += 1
+
+    # Inserir cada descrição como NOVO PARÁGRAFO logo após o parágrafo da imagem,
+    # em ordem reversa para manter as descrições na ordem das imagens
+    body = doc.paragraphs
+    for image_id, description in sorted(image_descriptions, reverse=True):
+        para_element = body[ir.image_paragraphs[image_id]]._element
+        parent_element = para_element.getparent()
+
+        new_para = doc.add_paragraph()
+        new_para.text = description
+        parent_element.insert(parent_element.index(para_element) + 1, new_para._element)
+
+    return applied
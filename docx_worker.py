@@ -0,0 +1,134 @@
+"""
+Etapas de CPU do .docx executadas em um pool de processos.
+
+Ler o documento (`Document(...)`), varrer o XML, aplicar as formatações e
+salvar (`doc.save`) seguram o GIL: em documentos grandes isso trava o event
+loop por segundos e atrasa todas as chamadas ao modelo em andamento. Essas
+etapas rodam em processos separados e, entre o processo e o loop, trafegam
+apenas itens de trabalho compactos (a IR do documento, ver document_ir):
+
+- extract_work_items: lê o .docx e devolve a IR e os bytes das imagens
+- assemble_document: lê o .docx original, aplica os textos revisados e as
+  descrições de imagem e devolve o novo .docx
+
+As funções executadas no pool ficam neste módulo, que os processos filhos
+importam sem carregar o function_app (cliente, loop, métricas).
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from docx import Document
+
+from document_ir import DocumentIR, apply_revisions, extract_document_ir, image_blobs
+
+
+def extract_work_items(file_content: bytes, include_images: bool = True) -> Tuple[DocumentIR, List[bytes]]:
+    """
+    Lê o documento e extrai a IR (executado no pool).
+
+    Args:
+        file_content: Conteúdo binário do documento Word
+        include_images: Se True, extrai também as imagens inline
+
+    Returns:
+        Tupla (IR do documento, bytes de cada imagem na ordem dos ids de imagem).
+        Os bytes ficam fora da IR para não voltarem ao pool na montagem.
+    """
+    doc = Document(io.BytesIO(file_content))
+    ir = extract_document_ir(doc, include_images)
+    return ir, image_blobs(doc, ir)
+
+
+def assemble_document(file_content: bytes, ir: DocumentIR, revised: Dict[int, str],
+                      image_descriptions: List[Tuple[int, str]]) -> bytes:
+    """
+    Aplica as revisões ao documento original e o salva (executado no pool).
+
+    Args:
+        file_content: Conteúdo binário do documento original
+        ir: IR extraída por extract_work_items
+        revised: Id do segmento -> texto revisado (com marcadores)
+        image_descriptions: [(id da imagem, descrição)]
+
+    Returns:
+        Conteúdo binário do documento corrigido
+    """
+    doc = Document(io.BytesIO(file_content))
+    apply_revisions(doc, ir, revised, image_descriptions)
+
+    output_stream = io.BytesIO()
+    doc.save(output_stream)
+    return output_stream.getvalue()
+
+
+class DocxWorkerPool:
+    """
+    Pool de processos para as etapas de CPU do .docx.
+
+    Com max_workers <= 0 as etapas rodam em uma thread (útil onde processos
+    filhos não são permitidos). Se um processo morrer, o pool é recriado e a
+    etapa é repetida uma vez.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {"tasks": 0, "errors": 0, "restarts": 0, "busy_seconds": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # "spawn": o processo do worker tem threads (event loop), fork não é seguro
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.stats["restarts"] += 1
+        broken.shutdown(wait=False)
+
+    async def run(self, fn: Callable, *args):
+        """Executa `fn(*args)` fora do event loop e aguarda o resultado."""
+        start = time.perf_counter()
+        try:
+            if self.max_workers <= 0:
+                return await asyncio.to_thread(fn, *args)
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                logging.warning(f"Pool de processos do .docx quebrado, recriando ({fn.__name__})")
+                self._restart(executor)
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self.stats["tasks"] += 1
+            self.stats["busy_seconds"] += time.perf_counter() - start
+
+    def snapshot(self) -> Dict:
+        stats = dict(self.stats)
+        stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+        stats["max_workers"] = self.max_workers
+        stats["mode"] = "process" if self.max_workers > 0 else "thread"
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
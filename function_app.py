@@ -3,108 +3,353 @@ import logging
 import io
 import os
 import base64
-from typing import Dict, List, Optional
-from docx import Document
-from docx.oxml import parse_xml
-from docx.oxml.ns import qn
-from openai import AzureOpenAI
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from openai import APITimeoutError, AsyncAzureOpenAI
 import json
+import math
 from PIL import Image
 import re
+import tempfile
+import time
+import uuid
+from admission import AdmissionController, WorkEstimate, estimate_document_work
+from async_runtime import LANE_BULK, LANE_INTERACTIVE, LANES, AsyncLimiter, AsyncRuntime, current_lane, in_lane
+from batch_api import AzureBatchBackend
+from bulk_batch import BlobBulkStore, BulkBatchProcessor
+from circuit_breaker import CircuitBreaker, CircuitOpenError, is_dependency_failure
+from degradation import (
+    LEVEL_ESSENTIAL,
+    LEVEL_NAMES,
+    LEVEL_NO_IMAGES,
+    LEVEL_NORMAL,
+    LEVEL_SPELLING,
+    DegradationLadder,
+    is_low_value,
+    parse_thresholds,
+)
+from deadline import (DispatchBlockedError, DocumentDeadline, RevisionFailedError, UnrevisedItemError, create_deadline,
+                      report_summary)
+from document_ir import DocumentIR
+from document_cache import (
+    BlobDocumentCache,
+    LocalDocumentCache,
+    cache_key,
+    config_fingerprint,
+    document_hash,
+    is_document_hash,
+)
+from docx_worker import DocxWorkerPool, assemble_document, extract_work_items
+from hedging import HedgedCaller
+from image_batching import (
+    IMAGE_BATCH_JSON_INSTRUCTIONS,
+    build_multi_image_content,
+    image_tokens,
+    pack_images,
+    parse_multi_image_response,
+)
+from image_hashing import PerceptualImageIndex, image_fingerprint
+from incremental import IncrementalRevision, RevisionRecord, image_key
+from model_routing import TIER_FAST, TIER_VISION, ModelRouter, TierMetrics
+from near_duplicates import NearDuplicateIndex, NearDuplicateMatch
+from revision_engines import (
+    DEFAULT_ENGINE,
+    ENGINE_BATCH_API,
+    ENGINE_BATCHED,
+    ENGINE_CONFIG,
+    ENGINES,
+    PACKED_JSON_INSTRUCTIONS,
+    RevisionItem,
+    build_packed_payload,
+    create_engine,
+    parse_packed_response,
+)
+from scheduling import CostModel, MakespanTracker, longest_first, lpt_makespan
+from single_flight import SingleFlight, request_key
+from revision_patch import PATCH_MIMETYPE, build_patch, encode_patch
+from revision_stream import NDJSON_MIMETYPE, RevisionProgress, encode_event
+from revision_modes import DEFAULT_MODE, MODE_SPELLING, REVISION_MODES, mode_max_tokens, resolve_mode
+from table_revision import (
+    TABLE_JSON_INSTRUCTIONS,
+    TableCell,
+    build_table_payload,
+    pack_table_cells,
+    parse_table_response,
+)
+from text_chunking import (
+    balance_formatting_markers,
+    estimate_tokens,
+    join_revised_chunks,
+    split_text_into_chunks,
+)
 
-app = func.FunctionApp()
-
+# Streaming HTTP (opcional): extensão FastAPI do Azure Functions. Sem ela,
+# /api/correct-document-stream devolve os mesmos eventos NDJSON de uma vez, no fim
+try:
+    from azurefunctions.extensions.http.fastapi import Request as StreamingRequest, StreamingResponse
+    HTTP_STREAMING_AVAILABLE = True
+except ImportError:
+    HTTP_STREAMING_AVAILABLE = False
 
-def apply_text_formatting(paragraph, text: str):
-    """
-    Aplica formatações especiais ao texto do parágrafo.
-    - *palavra* -> itálico
-    - **palavra** -> negrito (se vier do GPT)
-    - <<ALT_CORRETA_INICIO>> ... <<ALT_CORRETA_FIM>> -> negrito
-    
-    Args:
-        paragraph: Objeto Paragraph do python-docx
-        text: Texto com marcadores de formatação
-    """
-    # Limpar runs existentes
-    for run in paragraph.runs:
-        run.text = ""
-    
-    # Processar marcadores de alternativa correta
-    # <<ALT_CORRETA_INICIO>> texto <<ALT_CORRETA_FIM>> -> negrito
-    alt_pattern = r'<<ALT_CORRETA_INICIO>>(.+?)<<ALT_CORRETA_FIM>>'
-    if '<<ALT_CORRETA_INICIO>>' in text:
-        parts = re.split(alt_pattern, text, flags=re.DOTALL)
-        for i, part in enumerate(parts):
-            if i % 2 == 1:  # Parte entre os marcadores
-                run = paragraph.add_run(part)
-                run.bold = True
-            else:
-                # Processar itálicos na parte normal
-                apply_italic_formatting(paragraph, part)
-    else:
-        # Processar itálicos
-        apply_italic_formatting(paragraph, text)
+app = func.FunctionApp()
 
 
-def apply_italic_formatting(paragraph, text: str):
-    """
-    Aplica formatação de itálico (*palavra*).
-    
-    Args:
-        paragraph: Objeto Paragraph do python-docx
-        text: Texto com marcadores de itálico
-    """
-    # Padrão para itálico: *palavra* (mas não **palavra**)
-    italic_pattern = r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)'
-    parts = re.split(italic_pattern, text)
-    
-    for i, part in enumerate(parts):
-        if i % 2 == 1:  # Parte entre asteriscos simples
-            run = paragraph.add_run(part)
-            run.italic = True
-        elif part:  # Parte normal
-            paragraph.add_run(part)
 
 # Configuração do Azure OpenAI
 AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_DEPLOYMENT = os.environ.get("AZURE_OPENAI_DEPLOYMENT", "gpt-4")
+# Deployment rápido/barato para itens simples (títulos, listas, frases curtas)
+AZURE_OPENAI_DEPLOYMENT_FAST = os.environ.get("AZURE_OPENAI_DEPLOYMENT_FAST")
 AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+# Timeout (segundos) e número de retentativas do SDK por chamada
+AZURE_OPENAI_TIMEOUT = float(os.environ.get("AZURE_OPENAI_TIMEOUT", "60"))
+AZURE_OPENAI_MAX_RETRIES = int(os.environ.get("AZURE_OPENAI_MAX_RETRIES", "2"))
+# Chamadas simultâneas ao Azure OpenAI por worker (somando todos os documentos)
+AZURE_OPENAI_MAX_CONCURRENT_CALLS = int(os.environ.get("AZURE_OPENAI_MAX_CONCURRENT_CALLS", "16"))
+# Fração das chamadas simultâneas reservada ao HTTP (interactive) e ao Blob Trigger (bulk)
+LANE_INTERACTIVE_RESERVED = float(os.environ.get("LANE_INTERACTIVE_RESERVED", "0.25"))
+LANE_BULK_RESERVED = float(os.environ.get("LANE_BULK_RESERVED", "0.1"))
+
+# Orçamento de tempo por documento (0 desativa) e reserva para salvar o .docx
+DOCUMENT_TIME_BUDGET_SECONDS = float(os.environ.get("DOCUMENT_TIME_BUDGET_SECONDS", "270"))
+DOCUMENT_SAVE_RESERVE_SECONDS = float(os.environ.get("DOCUMENT_SAVE_RESERVE_SECONDS", "15"))
+
+# Hedging de chamadas lentas (opcional): cópia enviada após o percentil de latência,
+# de preferência para um segundo recurso Azure OpenAI (AZURE_OPENAI_HEDGE_*)
+HEDGING_ENABLED = os.environ.get("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MAX_RATIO = float(os.environ.get("HEDGE_MAX_RATIO", "0.1"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+AZURE_OPENAI_HEDGE_ENDPOINT = os.environ.get("AZURE_OPENAI_HEDGE_ENDPOINT")
+AZURE_OPENAI_HEDGE_API_KEY = os.environ.get("AZURE_OPENAI_HEDGE_API_KEY")
+AZURE_OPENAI_HEDGE_DEPLOYMENT = os.environ.get("AZURE_OPENAI_HEDGE_DEPLOYMENT")
+# Deployment rápido no recurso secundário (vazio = AZURE_OPENAI_HEDGE_DEPLOYMENT)
+AZURE_OPENAI_HEDGE_DEPLOYMENT_FAST = os.environ.get("AZURE_OPENAI_HEDGE_DEPLOYMENT_FAST")
+
+# Event loop compartilhado: todos os documentos do worker usam o mesmo loop,
+# o mesmo cliente (pool de conexões) e o mesmo limitador de chamadas, com
+# prioridade para o HTTP sobre o Blob Trigger
+runtime = AsyncRuntime()
+limiter = AsyncLimiter(AZURE_OPENAI_MAX_CONCURRENT_CALLS, {
+    LANE_INTERACTIVE: LANE_INTERACTIVE_RESERVED,
+    LANE_BULK: LANE_BULK_RESERVED,
+})
+
+# Escada de degradação por faixa sob saturação prolongada (sem imagens ->
+# revisão ortográfica -> sem parágrafos de pouco valor), com recuperação automática
+DEGRADATION_ENABLED = os.environ.get("DEGRADATION_ENABLED", "true").lower() == "true"
+DEGRADATION_THRESHOLDS = parse_thresholds(os.environ.get("DEGRADATION_THRESHOLDS", "1.5,3,5"))
+DEGRADATION_SUSTAIN_SECONDS = float(os.environ.get("DEGRADATION_SUSTAIN_SECONDS", "10"))
+DEGRADATION_RECOVER_SECONDS = float(os.environ.get("DEGRADATION_RECOVER_SECONDS", "30"))
+DEGRADATION_MIN_WORDS = int(os.environ.get("DEGRADATION_MIN_WORDS", "4"))
+ladders = {
+    lane: DegradationLadder(DEGRADATION_THRESHOLDS, DEGRADATION_SUSTAIN_SECONDS,
+                            DEGRADATION_RECOVER_SECONDS, DEGRADATION_ENABLED)
+    for lane in LANES
+}
+
+# Controle de admissão do HTTP: o trabalho admitido (chamadas estimadas x latência
+# média) precisa caber nas vagas do HTTP dentro do horizonte; acima disso, 429
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_HORIZON_SECONDS = float(os.environ.get(
+    "ADMISSION_HORIZON_SECONDS", str(DOCUMENT_TIME_BUDGET_SECONDS - DOCUMENT_SAVE_RESERVE_SECONDS)))
+ADMISSION_MAX_RETRY_AFTER = float(os.environ.get("ADMISSION_MAX_RETRY_AFTER", "120"))
+admission = AdmissionController(
+    limiter.max_concurrency - limiter.reserved[LANE_BULK],
+    ADMISSION_HORIZON_SECONDS,
+    max_retry_after=ADMISSION_MAX_RETRY_AFTER,
+    enabled=ADMISSION_ENABLED
+)
 
 # Inicializar cliente OpenAI
-client = AzureOpenAI(
+client = AsyncAzureOpenAI(
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
     api_key=AZURE_OPENAI_API_KEY,
-    api_version=AZURE_OPENAI_API_VERSION
+    api_version=AZURE_OPENAI_API_VERSION,
+    timeout=AZURE_OPENAI_TIMEOUT,
+    max_retries=AZURE_OPENAI_MAX_RETRIES
+)
+
+# Backend secundário para as cópias (sem configuração, a cópia vai para o mesmo recurso)
+hedge_client = AsyncAzureOpenAI(
+    azure_endpoint=AZURE_OPENAI_HEDGE_ENDPOINT,
+    api_key=AZURE_OPENAI_HEDGE_API_KEY,
+    api_version=AZURE_OPENAI_API_VERSION,
+    timeout=AZURE_OPENAI_TIMEOUT,
+    max_retries=AZURE_OPENAI_MAX_RETRIES
+) if AZURE_OPENAI_HEDGE_ENDPOINT and AZURE_OPENAI_HEDGE_API_KEY else None
+
+# Circuit breaker compartilhado por todas as chamadas e documentos da instância
+CIRCUIT_CONSECUTIVE_FAILURES = int(os.environ.get("CIRCUIT_CONSECUTIVE_FAILURES", "5"))
+CIRCUIT_FAILURE_RATE = float(os.environ.get("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", "30"))
+# Espera máxima do Blob Trigger pelo fechamento do circuito antes de devolver o blob ao host
+CIRCUIT_BLOB_WAIT_SECONDS = float(os.environ.get("CIRCUIT_BLOB_WAIT_SECONDS", "60"))
+
+breaker = CircuitBreaker(
+    consecutive_failures=CIRCUIT_CONSECUTIVE_FAILURES,
+    failure_rate=CIRCUIT_FAILURE_RATE,
+    open_seconds=CIRCUIT_OPEN_SECONDS
 )
 
+hedger = HedgedCaller(
+    enabled=HEDGING_ENABLED,
+    percentile=HEDGE_PERCENTILE,
+    max_ratio=HEDGE_MAX_RATIO,
+    min_samples=HEDGE_MIN_SAMPLES
+)
+
+# Requisições idênticas em andamento (mesmo tier e parâmetros) compartilham uma única chamada
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+single_flight = SingleFlight(enabled=SINGLE_FLIGHT_ENABLED)
+
+# Parágrafos acima desta estimativa de tokens são divididos em blocos por frase
+PARAGRAPH_CHUNK_TOKENS = int(os.environ.get("PARAGRAPH_CHUNK_TOKENS", "700"))
+# Número máximo de blocos de um mesmo parágrafo revisados simultaneamente
+PARAGRAPH_CHUNK_WORKERS = int(os.environ.get("PARAGRAPH_CHUNK_WORKERS", "4"))
+
+# Meta de tokens de entrada por requisição de tabela (células agrupadas em JSON)
+TABLE_REQUEST_TOKENS = int(os.environ.get("TABLE_REQUEST_TOKENS", "1500"))
+
+# Modelo de custo do despacho do maior para o menor (ver scheduling); makespan previsto x real em /api/metrics
+cost_model = CostModel(
+    call_seconds=float(os.environ.get("SCHEDULE_CALL_SECONDS", "1.0")),
+    seconds_per_token=float(os.environ.get("SCHEDULE_SECONDS_PER_TOKEN", "0.02")),
+    image_seconds=float(os.environ.get("SCHEDULE_IMAGE_SECONDS", "4.0"))
+)
+makespan = MakespanTracker()
 
-def describe_image(image_bytes: bytes, context: str = "") -> str:
+# Reaproveitamento de parágrafos quase iguais a outros já revisados (MinHash/LSH)
+NEAR_DUPLICATE_ENABLED = os.environ.get("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+NEAR_DUPLICATE_CAPACITY = int(os.environ.get("NEAR_DUPLICATE_CAPACITY", "5000"))
+NEAR_DUPLICATE_MIN_CHARS = int(os.environ.get("NEAR_DUPLICATE_MIN_CHARS", "40"))
+near_duplicates: Dict[str, NearDuplicateIndex] = {
+    name: NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD, capacity=NEAR_DUPLICATE_CAPACITY,
+                             min_chars=NEAR_DUPLICATE_MIN_CHARS)
+    for name in REVISION_MODES
+} if NEAR_DUPLICATE_ENABLED else {}
+
+# Processos para ler, extrair e montar o .docx fora do event loop (0 = thread)
+DOCX_PROCESS_WORKERS = int(os.environ.get("DOCX_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+docx_pool = DocxWorkerPool(DOCX_PROCESS_WORKERS)
+
+# Roteamento fast/full e métricas por tier
+router = ModelRouter(AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_DEPLOYMENT_FAST)
+tier_metrics = TierMetrics()
+# Deployments das cópias do hedging: os do recurso secundário, quando configurado
+if hedge_client is not None and AZURE_OPENAI_HEDGE_DEPLOYMENT:
+    hedge_router = ModelRouter(AZURE_OPENAI_HEDGE_DEPLOYMENT, AZURE_OPENAI_HEDGE_DEPLOYMENT_FAST)
+else:
+    hedge_router = router
+
+# Estratégia de revisão dos parágrafos (sequential, concurrent, batched, batch_api)
+REVISION_ENGINE = os.environ.get("REVISION_ENGINE", DEFAULT_ENGINE)
+# Deployment Global Batch usado pelo engine batch_api (vazio = engine indisponível)
+AZURE_OPENAI_BATCH_DEPLOYMENT = os.environ.get("AZURE_OPENAI_BATCH_DEPLOYMENT")
+batch_backend = AzureBatchBackend(client) if AZURE_OPENAI_BATCH_DEPLOYMENT else None
+
+# Modo em massa do Blob Trigger (Batch API): todos os blobs ou só os com metadata priority=bulk
+BLOB_BULK_MODE = os.environ.get("BLOB_BULK_MODE", "false").lower() == "true"
+# Frequência do timer que envia os pendentes e consulta os batches (NCRONTAB)
+BULK_BATCH_SCHEDULE = os.environ.get("BULK_BATCH_SCHEDULE", "0 */5 * * * *")
+BULK_BATCH_MAX_REQUESTS = int(os.environ.get("BULK_BATCH_MAX_REQUESTS", "50000"))
+BULK_MAX_ATTEMPTS = int(os.environ.get("BULK_MAX_ATTEMPTS", "3"))
+BLOB_CONTAINER = "documentos"
+
+
+async def create_chat_completion(tier: str, deadline: Optional[DocumentDeadline] = None, **kwargs):
     """
-    Gera descrição pedagógica de imagem usando Azure OpenAI Vision (GPT-4o).
-    Descrição será inserida no texto do documento após a imagem.
+    Executa uma chamada de chat no deployment do tier e registra latência/custo.
+    
+    A chamada espera sua vez no limitador compartilhado do worker; o despacho
+    só é decidido depois disso, para que itens que esperaram na fila não
+    estourem o orçamento do documento nem insistam com o circuito aberto.
+    
+    Uma requisição idêntica (tier e parâmetros) já em andamento em outro
+    documento ou thread não é repetida: o resultado dela é compartilhado
+    (single_flight).
     
     Args:
-        image_bytes: Bytes da imagem
-        context: Contexto adicional sobre a imagem (opcional)
+        tier: Tier da chamada (fast, full ou vision)
+        deadline: Prazo do documento; limita o timeout da chamada ao tempo restante
+        **kwargs: Parâmetros repassados para client.chat.completions.create
         
     Returns:
-        Descrição pedagógica da imagem em português
+        Resposta do Azure OpenAI
+        
+    Raises:
+        DispatchBlockedError: Se o orçamento se esgotou ou o circuito está aberto
+            (inclusive quando abriu entre a verificação e a chamada, ou quando a
+            chamada de teste do meio-aberto reabriu o circuito ou não terminou a tempo)
     """
-    try:
-        # Converter imagem para base64
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    return await single_flight.run(request_key(tier, kwargs),
+                                   lambda: dispatch_chat_completion(tier, deadline, **kwargs))
+
+
+async def dispatch_chat_completion(tier: str, deadline: Optional[DocumentDeadline] = None, **kwargs):
+    """Chamada de chat sem coalescência (ver create_chat_completion)."""
+    deployment = router.deployment_for(tier)
+    
+    # Amostra de pressão para a escada de degradação da faixa
+    lane = current_lane()
+    ladders[lane].observe(limiter.pressure(lane))
+    
+    async with limiter:
+        blocked = dispatch_block_reason(deadline)
+        if blocked:
+            raise DispatchBlockedError(blocked)
         
-        # Determinar tipo MIME da imagem
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
-            img_format = img.format.lower()
-            mime_type = f"image/{img_format}" if img_format in ['jpeg', 'jpg', 'png', 'gif', 'webp'] else "image/jpeg"
-        except:
-            mime_type = "image/jpeg"
+        def primary():
+            return client.chat.completions.create(model=deployment, **kwargs)
         
-        system_prompt = """Você é um revisor pedagógico do SENAC/SC especializado em descrição de imagens.
+        async def backup():
+            # A cópia ocupa uma vaga do limitador (na mesma faixa) como qualquer chamada
+            async with limiter:
+                if hedge_client is not None:
+                    return await hedge_client.chat.completions.create(model=hedge_router.deployment_for(tier),
+                                                                      **kwargs)
+                return await primary()
+        
+        # Meio-aberto: aguarda a chamada de teste. Circuito aberto (ou reaberto pelo
+        # teste) no momento da chamada: mesmo caminho dos itens não despachados
+        try:
+            await breaker.acquire(deadline.call_timeout(AZURE_OPENAI_TIMEOUT) if deadline is not None
+                                  else AZURE_OPENAI_TIMEOUT)
+        except CircuitOpenError:
+            raise DispatchBlockedError("circuit_open") from None
+        if deadline is not None:
+            if not deadline.can_dispatch():
+                # A espera pela chamada de teste consumiu o orçamento
+                breaker.record_cancelled()
+                raise DispatchBlockedError("budget")
+            kwargs["timeout"] = deadline.call_timeout(AZURE_OPENAI_TIMEOUT)
+        start = time.perf_counter()
+        try:
+            response = await hedger.call(f"{deployment}:{tier}", primary, backup)
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            tier_metrics.record(tier, time.perf_counter() - start, error=True)
+            # Erros da requisição (4xx) mostram que o serviço respondeu
+            if is_dependency_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+    
+    breaker.record_success()
+    latency = time.perf_counter() - start
+    tier_metrics.record(tier, latency, getattr(response, "usage", None))
+    admission.observe_call(latency)
+    if deadline is not None:
+        deadline.observe(latency)
+    return response
+
+
+IMAGE_SYSTEM_PROMPT = """Você é um revisor pedagógico do SENAC/SC especializado em descrição de imagens.
 
 OBJETIVO:
 Descrever a imagem de forma DIDÁTICA, CLARA e DETALHADA, como se estivesse explicando para um aluno.
@@ -124,255 +369,1356 @@ FORMATO DA RESPOSTA:
 Inicie sempre com "Descrição da imagem:" seguido da descrição completa em português.
 Seja detalhado mas objetivo. Mínimo 2 parágrafos, máximo 5 parágrafos."""
 
-        user_prompt = "Descreva detalhadamente esta imagem de forma pedagógica e didática."
-        if context:
-            user_prompt += f"\n\nContexto do documento: {context}"
+
+# Descrição de várias imagens por requisição (ver image_batching)
+IMAGE_BATCH_ENABLED = os.environ.get("IMAGE_BATCH_ENABLED", "true").lower() == "true"
+# Tokens de imagem estimados e quantidade máxima de imagens por requisição
+IMAGE_BATCH_TOKENS = int(os.environ.get("IMAGE_BATCH_TOKENS", "3000"))
+IMAGE_BATCH_MAX_IMAGES = int(os.environ.get("IMAGE_BATCH_MAX_IMAGES", "4"))
+image_batch_stats = {"requests": 0, "images": 0, "described": 0, "fallbacks": 0}
+
+# Reaproveitamento de descrições da mesma figura em outra resolução/formato (hash perceptual)
+IMAGE_HASH_ENABLED = os.environ.get("IMAGE_HASH_ENABLED", "true").lower() == "true"
+IMAGE_HASH_MAX_DISTANCE = int(os.environ.get("IMAGE_HASH_MAX_DISTANCE", "6"))
+IMAGE_HASH_CAPACITY = int(os.environ.get("IMAGE_HASH_CAPACITY", "5000"))
+image_index = PerceptualImageIndex(IMAGE_HASH_MAX_DISTANCE, IMAGE_HASH_CAPACITY) if IMAGE_HASH_ENABLED else None
+
+IMAGE_DESCRIPTION_ERROR = "Descrição da imagem: Imagem sem descrição disponível devido a erro técnico."
+
+
+def image_data_url(image_bytes: bytes) -> str:
+    """Imagem como data URL base64 para a API de visão."""
+    # Converter imagem para base64
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    
+    # Determinar tipo MIME da imagem
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        img_format = img.format.lower()
+        mime_type = f"image/{img_format}" if img_format in ['jpeg', 'jpg', 'png', 'gif', 'webp'] else "image/jpeg"
+    except:
+        mime_type = "image/jpeg"
+    
+    return f"data:{mime_type};base64,{base64_image}"
+
+
+def image_request(image_bytes: bytes, context: str = "") -> Dict:
+    """Mensagens e parâmetros da descrição de uma imagem."""
+    user_prompt = "Descreva detalhadamente esta imagem de forma pedagógica e didática."
+    if context:
+        user_prompt += f"\n\nContexto do documento: {context}"
+    
+    return {
+        "messages": [
+            {"role": "system", "content": IMAGE_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": user_prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_data_url(image_bytes)
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 1500,
+        "temperature": 0.3
+    }
+
+
+async def describe_image(image_bytes: bytes, context: str = "", deadline: Optional[DocumentDeadline] = None) -> str:
+    """
+    Gera descrição pedagógica de imagem usando Azure OpenAI Vision (GPT-4o).
+    Descrição será inserida no texto do documento após a imagem.
+    
+    Args:
+        image_bytes: Bytes da imagem
+        context: Contexto adicional sobre a imagem (opcional)
+        deadline: Prazo do documento (opcional)
+        
+    Returns:
+        Descrição pedagógica da imagem em português
+        
+    Raises:
+        DispatchBlockedError: Se a imagem não chegou a ser enviada ao modelo
+    """
+    try:
+        response = await create_chat_completion(TIER_VISION, deadline=deadline, **image_request(image_bytes, context))
         
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_DEPLOYMENT,
+        description = response.choices[0].message.content.strip()
+        logging.info(f"✅ Imagem descrita: {description[:80]}...")
+        return description
+        
+    except DispatchBlockedError:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao descrever imagem: {str(e)}")
+        return IMAGE_DESCRIPTION_ERROR
+
+
+async def describe_images_batch(entries: List[Tuple[int, bytes, str]],
+                                deadline: Optional[DocumentDeadline] = None) -> Dict[int, str]:
+    """
+    Descreve várias imagens em uma única requisição de visão.
+    
+    Args:
+        entries: (id, bytes, contexto do documento) de cada imagem
+        deadline: Prazo do documento (opcional)
+        
+    Returns:
+        Id da imagem -> descrição; imagens ausentes ou inválidas ficam de fora
+        
+    Raises:
+        DispatchBlockedError: Se o lote não chegou a ser enviado ao modelo
+    """
+    content = build_multi_image_content([
+        (image_id, image_data_url(image_bytes), context) for image_id, image_bytes, context in entries
+    ])
+    image_batch_stats["requests"] += 1
+    image_batch_stats["images"] += len(entries)
+    try:
+        response = await create_chat_completion(
+            TIER_VISION,
+            deadline=deadline,
             messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": user_prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
+                {"role": "system", "content": IMAGE_SYSTEM_PROMPT + IMAGE_BATCH_JSON_INSTRUCTIONS},
+                {"role": "user", "content": content}
             ],
-            max_tokens=1500,
+            max_tokens=min(16000, 1000 * len(entries)),
             temperature=0.3
         )
+    except DispatchBlockedError:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao descrever lote de imagens: {str(e)}")
+        return {}
+    
+    descriptions = parse_multi_image_response(response.choices[0].message.content,
+                                              [image_id for image_id, _, _ in entries])
+    image_batch_stats["described"] += len(descriptions)
+    logging.info(f"✅ Lote de imagens: {len(descriptions)} de {len(entries)} descrita(s)")
+    return descriptions
+
+
+MEDIA_TOKEN_PATTERN = re.compile(r'\[\[(?:FIG|TAB|SA)\d+\]\]')
+
+
+def preserves_media_tokens(original_text: str, corrected_text: str) -> bool:
+    """True se todos os tokens de mídia ([[FIG1]], [[TAB2]], ...) continuam no texto revisado."""
+    return all(token in corrected_text for token in MEDIA_TOKEN_PATTERN.findall(original_text))
+
+
+KNOWN_REVISION_SYSTEM_PROMPT = """Você é revisor de textos do SENAC/SC.
+
+Você recebe a revisão já aprovada de um parágrafo e um PARÁGRAFO NOVO quase igual a ele.
+Aplique ao parágrafo novo as mesmas correções e ajustes da revisão aprovada.
+Nas partes que diferem (datas, nomes, números), mantenha o conteúdo do parágrafo novo, apenas corrigido.
+Preserve exatamente tokens de mídia ([[FIG1]], [[TAB1]], [[SA1]]) e marcadores <<ALT_CORRETA_INICIO>>/<<ALT_CORRETA_FIM>>.
+
+Retorne SOMENTE o parágrafo novo revisado, sem comentários."""
+
+
+# Shingles, assinatura MinHash e transferência da revisão são CPU: fora do event loop
+async def find_near_duplicate(text: str, mode: Dict) -> Optional[NearDuplicateMatch]:
+    index = near_duplicates.get(mode["name"])
+    return await asyncio.to_thread(index.lookup, text) if index is not None else None
+
+
+async def find_near_duplicates(texts: Iterable[str], mode: Dict) -> Dict[str, Optional[NearDuplicateMatch]]:
+    """
+    Consulta vários textos em uma única ida ao pool de threads.
+    
+    Feita antes do despacho: com uma consulta por item, a ordem em que os itens
+    chegavam ao limitador dependia de qual thread terminava primeiro (os mais
+    longos, mais caros de comparar, ficavam para o fim), desfazendo o longest-first.
+    """
+    index = near_duplicates.get(mode["name"])
+    if index is None:
+        return {}
+    unique = list(dict.fromkeys(texts))
+    return await asyncio.to_thread(lambda: {text: index.lookup(text) for text in unique})
+
+
+async def remember_revision(text: str, corrected_text: str, mode: Dict):
+    index = near_duplicates.get(mode["name"])
+    if index is not None:
+        await asyncio.to_thread(index.add, text, corrected_text)
+
+
+async def apply_known_revision(text: str, match: NearDuplicateMatch, mode: Dict,
+                               deadline: Optional[DocumentDeadline] = None) -> Optional[str]:
+    """
+    Revisa um parágrafo quase igual a outro já revisado com o prompt curto de
+    "aplicar a revisão conhecida", no tier fast.
+    
+    Returns:
+        Texto revisado, ou None para seguir com a revisão completa
         
-        description = response.choices[0].message.content.strip()
-        logging.info(f"✅ Imagem descrita: {description[:80]}...")
-        return description
+    Raises:
+        DispatchBlockedError: Se o texto não chegou a ser enviado ao modelo
+    """
+    tier_metrics.record_decision(TIER_FAST, "near_duplicate")
+    user_content = (f"ORIGINAL APROVADO:\n{match.original}\n\nREVISÃO APROVADA:\n{match.revised}\n\n"
+                    f"PARÁGRAFO NOVO:\n{text}")
+    try:
+        response = await create_chat_completion(
+            TIER_FAST,
+            deadline=deadline,
+            messages=[
+                {"role": "system", "content": KNOWN_REVISION_SYSTEM_PROMPT},
+                {"role": "user", "content": user_content}
+            ],
+            temperature=0.1,
+            max_tokens=min(mode["max_tokens"], estimate_tokens(match.revised) * 2 + 200)
+        )
+        corrected_text = response.choices[0].message.content.strip()
+    except DispatchBlockedError:
+        raise
+    except Exception as e:
+        logging.warning(f"Erro ao aplicar revisão conhecida, seguindo com a revisão completa: {str(e)}")
+        corrected_text = ""
+    success = bool(corrected_text) and preserves_media_tokens(text, corrected_text)
+    near_duplicates[mode["name"]].record_applied(success)
+    return corrected_text if success else None
+
+
+def paragraph_request(text: str, mode: Dict) -> Dict:
+    """Mensagens e parâmetros da revisão de um parágrafo no modo informado."""
+    return {
+        "messages": [
+            {"role": "system", "content": mode["system_prompt"]},
+            {"role": "user", "content": mode["user_template"].format(text=text)}
+        ],
+        "temperature": mode["temperature"],
+        "max_tokens": mode_max_tokens(mode, text),
+    }
+
+
+async def process_paragraph_text(text: str, is_table_cell: bool = False, style_name: Optional[str] = None,
+                           mode: Optional[Dict] = None, deadline: Optional[DocumentDeadline] = None,
+                           near_matches: Optional[Dict[str, Optional[NearDuplicateMatch]]] = None) -> str:
+    """
+    Processa um parágrafo usando Azure OpenAI com revisão pedagógica SENAC.
+    
+    Args:
+        text: Texto do parágrafo a ser revisado
+        is_table_cell: Se True, aplica processamento específico para células de tabela
+        style_name: Estilo do parágrafo, usado no roteamento fast/full
+        mode: Configuração do modo de revisão (ver revision_modes); padrão: pedagógico
+        deadline: Prazo do documento (opcional)
+        near_matches: Consultas de quase-duplicatas já feitas (find_near_duplicates);
+            textos ausentes são consultados aqui
+        
+    Returns:
+        Texto revisado pedagogicamente
+        
+    Raises:
+        DispatchBlockedError: Se o texto não chegou a ser enviado ao modelo
+        RevisionFailedError: Se a chamada falhou ou excedeu o prazo ("error", "timeout"),
+            ou se a resposta veio truncada mesmo sem o limite proporcional ("truncated")
+    """
+    if not text or len(text.strip()) == 0:
+        return text
+    
+    mode = mode or REVISION_MODES[DEFAULT_MODE]
+    
+    # Parágrafos muito longos: dividir por frase e revisar os blocos em paralelo
+    if estimate_tokens(text) > PARAGRAPH_CHUNK_TOKENS:
+        chunks = split_text_into_chunks(text, PARAGRAPH_CHUNK_TOKENS)
+        if len(chunks) > 1:
+            return await process_long_paragraph_text(chunks, is_table_cell, style_name, mode, deadline, near_matches)
+    
+    # Parágrafo igual ou quase igual a outro já revisado
+    if near_matches is not None and text in near_matches:
+        match = near_matches[text]
+    else:
+        match = await find_near_duplicate(text, mode)
+    if match is not None:
+        if match.reusable is not None and preserves_media_tokens(text, match.reusable):
+            await remember_revision(text, match.reusable, mode)
+            return match.reusable
+        corrected_text = await apply_known_revision(text, match, mode, deadline)
+        if corrected_text is not None:
+            await remember_revision(text, corrected_text, mode)
+            return corrected_text
+    
+    # Detectar e preservar tokens de mídia
+    media_tokens = re.findall(r'\[\[(FIG|TAB|SA)\d+\]\]', text)
+    
+    tier, reason = router.classify(text, style_name)
+    tier_metrics.record_decision(tier, reason)
+    
+    try:
+        request = paragraph_request(text, mode)
+        response = await create_chat_completion(tier, deadline=deadline, **request)
+        
+        # Saída cortada pelo limite proporcional ao texto (modos de correção pura): repetir sem o limite
+        if response.choices[0].finish_reason == "length" and request["max_tokens"] < mode["max_tokens"]:
+            logging.warning("Revisão truncada pelo limite de tokens, repetindo sem o limite proporcional")
+            request["max_tokens"] = mode["max_tokens"]
+            response = await create_chat_completion(tier, deadline=deadline, **request)
+        if response.choices[0].finish_reason == "length":
+            raise RevisionFailedError("truncated")
+        
+        corrected_text = response.choices[0].message.content.strip()
+        
+        # Garantir que tokens de mídia foram preservados
+        for token in media_tokens:
+            if token not in corrected_text:
+                logging.warning(f"Token {token} foi removido, restaurando...")
+                # Tentar restaurar o token
+                corrected_text = text  # Fallback para texto original se tokens forem removidos
+                break
+        else:
+            await remember_revision(text, corrected_text, mode)
+        
+        return corrected_text
+        
+    except UnrevisedItemError:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao processar parágrafo com OpenAI: {str(e)}")
+        # O texto original é mantido pelo chamador, que registra o item como não revisado
+        timed_out = isinstance(e, (APITimeoutError, asyncio.TimeoutError)) or (
+            deadline is not None and deadline.expired())
+        raise RevisionFailedError("timeout" if timed_out else "error") from e
+
+
+async def process_long_paragraph_text(chunks: List[str], is_table_cell: bool = False,
+                                 style_name: Optional[str] = None, mode: Optional[Dict] = None,
+                                 deadline: Optional[DocumentDeadline] = None,
+                                 near_matches: Optional[Dict[str, Optional[NearDuplicateMatch]]] = None) -> str:
+    """
+    Revisa em paralelo os blocos de um parágrafo longo e junta o resultado.
+    
+    Cada bloco tem seus marcadores (<<ALT_CORRETA_...>>, *itálico*) balanceados
+    antes da junção, para que apply_text_formatting não estenda uma formatação
+    aberta em um bloco até o bloco seguinte.
+    
+    Args:
+        chunks: Blocos gerados por split_text_into_chunks (concatenação = texto original)
+        is_table_cell: Repassado para process_paragraph_text
+        style_name: Repassado para process_paragraph_text
+        mode: Repassado para process_paragraph_text
+        deadline: Repassado para process_paragraph_text
+        near_matches: Repassado para process_paragraph_text
+        
+    Returns:
+        Parágrafo revisado completo
+        
+    Raises:
+        DispatchBlockedError: Se algum bloco não chegou a ser enviado ao modelo
+        RevisionFailedError: Se a revisão de algum bloco falhou, excedeu o prazo
+            ou veio truncada
+        
+        Nos dois casos o parágrafo inteiro mantém o texto original.
+    """
+    logging.info(f"Parágrafo longo dividido em {len(chunks)} blocos para revisão paralela")
+    
+    semaphore = asyncio.Semaphore(PARAGRAPH_CHUNK_WORKERS)
+    
+    async def revise_chunk(chunk: str) -> str:
+        async with semaphore:
+            revised = await process_paragraph_text(chunk.strip(), is_table_cell, style_name, mode, deadline,
+                                                   near_matches)
+        return balance_formatting_markers(revised)
+    
+    # Esperar todos os blocos antes de propagar a falha de um deles (nenhuma chamada fica órfã)
+    revised_chunks = await asyncio.gather(*(revise_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    for result in revised_chunks:
+        if isinstance(result, BaseException):
+            raise result
+    
+    return join_revised_chunks(chunks, revised_chunks)
+
+
+async def revise_table_cells(cells, mode: Optional[Dict] = None,
+                       deadline: Optional[DocumentDeadline] = None) -> Dict[str, List[str]]:
+    """
+    Revisa um lote de células de tabela em uma única requisição JSON.
+    
+    Args:
+        cells: Lote de TableCell (ver table_revision.pack_table_cells)
+        mode: Configuração do modo de revisão; padrão: pedagógico
+        deadline: Prazo do documento (opcional)
+        
+    Returns:
+        Dicionário "linha,coluna" -> parágrafos revisados. Células ausentes
+        ou com resposta inválida não aparecem no dicionário.
+        
+    Raises:
+        DispatchBlockedError: Se o lote não chegou a ser enviado ao modelo
+    """
+    mode = mode or REVISION_MODES[DEFAULT_MODE]
+    payload = build_table_payload(cells)
+    
+    tier, reason = router.classify_many(text for cell in cells for text in cell.texts)
+    tier_metrics.record_decision(tier, reason)
+    
+    try:
+        response = await create_chat_completion(
+            tier,
+            deadline=deadline,
+            messages=[
+                {"role": "system", "content": mode["system_prompt"] + TABLE_JSON_INSTRUCTIONS},
+                {"role": "user", "content": payload}
+            ],
+            temperature=min(mode["temperature"], 0.3),
+            max_tokens=min(mode["max_tokens"], estimate_tokens(payload) * 2 + 500)
+        )
+        
+        revised = parse_table_response(response.choices[0].message.content, cells)
+        if len(revised) < len(cells):
+            logging.warning(f"Tabela: {len(cells) - len(revised)} de {len(cells)} células sem resposta válida")
+        return revised
+        
+    except DispatchBlockedError:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao revisar células de tabela com OpenAI: {str(e)}")
+        return {}
+
+
+async def process_table(cells: List[TableCell], mode: Optional[Dict] = None,
+                        deadline: Optional[DocumentDeadline] = None, table_index: int = 0) -> Dict[str, List[str]]:
+    """
+    Revisa uma tabela inteira como grade estruturada.
+    
+    Células mescladas são revisadas uma única vez. Células que não voltarem
+    na resposta JSON são revisadas individualmente com process_paragraph_text.
+    Os lotes da tabela são enviados simultaneamente, do maior para o menor.
+    
+    Args:
+        cells: Células únicas da tabela (ver DocumentIR.table_cells)
+        mode: Configuração do modo de revisão; padrão: pedagógico
+        deadline: Prazo do documento; lotes não despachados mantêm o texto original
+        table_index: Posição da tabela no documento (usada no relatório)
+        
+    Returns:
+        Dicionário "linha,coluna" -> textos revisados, apenas das células alteradas
+    """
+    batches = pack_table_cells(cells, TABLE_REQUEST_TOKENS)
+    if ENGINE_CONFIG["longest_first"]:
+        batches = longest_first(batches, lambda batch: sum(cell.tokens for cell in batch))
+    logging.info(f"Tabela com {len(cells)} células únicas revisada em {len(batches)} requisição(ões)")
+    
+    def mark_unrevised(cell: TableCell, reason: str):
+        if deadline is not None:
+            deadline.mark_unrevised("table_cell", f"{table_index}:{cell.key}", reason=reason)
+    
+    async def revise_batch(batch: List[TableCell]) -> Dict[str, List[str]]:
+        try:
+            revised = await revise_table_cells(batch, mode, deadline)
+        except DispatchBlockedError as e:
+            for cell in batch:
+                mark_unrevised(cell, e.reason)
+            return {}
+        
+        changed = {}
+        for cell in batch:
+            revised_texts = revised.get(cell.key)
+            corrected_texts = []
+            for idx, original_text in enumerate(cell.texts):
+                if revised_texts is not None:
+                    corrected_text = revised_texts[idx]
+                    # Tokens de mídia removidos: manter o original
+                    if not preserves_media_tokens(original_text, corrected_text):
+                        corrected_text = original_text
+                else:
+                    try:
+                        corrected_text = await process_paragraph_text(original_text, is_table_cell=True, mode=mode,
+                                                                      deadline=deadline)
+                    except UnrevisedItemError as e:
+                        mark_unrevised(cell, e.reason)
+                        corrected_text = original_text
+                corrected_texts.append(corrected_text or original_text)
+            
+            if corrected_texts != cell.texts:
+                changed[cell.key] = corrected_texts
+        return changed
+    
+    changed: Dict[str, List[str]] = {}
+    for batch_changed in await asyncio.gather(*(revise_batch(batch) for batch in batches)):
+        changed.update(batch_changed)
+    return changed
+
+
+def dispatch_block_reason(deadline: Optional[DocumentDeadline]) -> Optional[str]:
+    """
+    Motivo para não despachar mais itens ao modelo (None = pode despachar).
+    
+    - "circuit_open": Azure OpenAI indisponível, o item falharia imediatamente
+    - "budget": o tempo restante do documento não cobre mais uma chamada
+    """
+    if breaker.is_open():
+        return "circuit_open"
+    if deadline is not None and not deadline.can_dispatch():
+        return "budget"
+    return None
+
+
+class DocumentReviser:
+    """
+    Chamadas ao modelo usadas pelos engines de revisão (ver revision_engines).
+    
+    Um por documento: guarda o modo de revisão e o prazo do documento.
+    `on_revised(item, texto)` é chamado a cada item concluído (streaming).
+    """
+    
+    def __init__(self, mode: Dict, deadline: DocumentDeadline,
+                 on_revised: Optional[Callable[[RevisionItem, str], None]] = None):
+        self.mode = mode
+        self.deadline = deadline
+        self.on_revised = on_revised
+        # Texto -> resultado da consulta de quase-duplicatas (ver prepare)
+        self.near_matches: Dict[str, Optional[NearDuplicateMatch]] = {}
+    
+    async def prepare(self, items: List[RevisionItem]):
+        """Consulta o índice de quase-duplicatas para todos os itens (e blocos de parágrafos longos) de uma vez."""
+        texts = []
+        for item in items:
+            texts.append(item.text)
+            if estimate_tokens(item.text) > PARAGRAPH_CHUNK_TOKENS:
+                texts.extend(chunk.strip() for chunk in split_text_into_chunks(item.text, PARAGRAPH_CHUNK_TOKENS))
+        self.near_matches = await find_near_duplicates(texts, self.mode)
+    
+    async def revise_item(self, item: RevisionItem) -> str:
+        # Bloqueios e falhas (DispatchBlockedError/RevisionFailedError): o engine registra o item (mark_blocked)
+        corrected_text = await process_paragraph_text(
+            item.text, is_table_cell=False, style_name=item.style, mode=self.mode, deadline=self.deadline,
+            near_matches=self.near_matches
+        )
+        if self.on_revised is not None:
+            self.on_revised(item, corrected_text)
+        return corrected_text
+    
+    async def revise_packed(self, items: List[RevisionItem]) -> Dict[int, str]:
+        """Revisa vários parágrafos pequenos em uma única requisição JSON."""
+        revised = await self._revise_packed(items)
+        if self.on_revised is not None:
+            for item in items:
+                if item.segment in revised:
+                    self.on_revised(item, revised[item.segment])
+        return revised
+    
+    async def _revise_packed(self, items: List[RevisionItem]) -> Dict[int, str]:
+        # Parágrafos já revisados (iguais ou com diferenças triviais) ficam fora do lote
+        reused: Dict[int, str] = {}
+        missing = [item.text for item in items if item.text not in self.near_matches]
+        if missing:
+            self.near_matches.update(await find_near_duplicates(missing, self.mode))
+        for item in items:
+            match = self.near_matches.get(item.text)
+            if match is not None and match.reusable is not None and preserves_media_tokens(item.text, match.reusable):
+                reused[item.segment] = match.reusable
+        items = [item for item in items if item.segment not in reused]
+        if not items:
+            return reused
+        
+        payload = build_packed_payload(items)
+        tier, reason = router.classify_many((item.text for item in items), reason="packed_paragraphs")
+        tier_metrics.record_decision(tier, reason)
+        
+        try:
+            response = await create_chat_completion(
+                tier,
+                deadline=self.deadline,
+                messages=[
+                    {"role": "system", "content": self.mode["system_prompt"] + PACKED_JSON_INSTRUCTIONS},
+                    {"role": "user", "content": payload}
+                ],
+                temperature=self.mode["temperature"],
+                max_tokens=min(self.mode["max_tokens"], estimate_tokens(payload) * 2 + 500)
+            )
+        except DispatchBlockedError:
+            # Os reaproveitados continuam valendo; os demais seguem pelo caminho individual
+            if reused:
+                return reused
+            raise
+        except Exception as e:
+            logging.error(f"Erro ao revisar lote de parágrafos com OpenAI: {str(e)}")
+            return reused
+        
+        revised = parse_packed_response(response.choices[0].message.content, items)
+        for item in items:
+            if item.segment in revised and preserves_media_tokens(item.text, revised[item.segment]):
+                reused[item.segment] = revised[item.segment]
+                await remember_revision(item.text, revised[item.segment], self.mode)
+        return reused
+    
+    def mark_blocked(self, item: RevisionItem, reason: str):
+        self.deadline.mark_unrevised("paragraph", item.locator, reason=reason)
+    
+    def batch_request(self, item: RevisionItem) -> Dict:
+        return {"model": AZURE_OPENAI_BATCH_DEPLOYMENT, **paragraph_request(item.text, self.mode)}
+    
+    def parse_batch_content(self, item: RevisionItem, content: str) -> str:
+        corrected_text = content.strip()
+        return corrected_text if preserves_media_tokens(item.text, corrected_text) else item.text
+
+
+class BulkRequests:
+    """Requisições do modo em massa (ver bulk_batch.BulkBatchProcessor)."""
+    
+    def mode(self, name: Optional[str]) -> Dict:
+        try:
+            return resolve_mode(name)
+        except ValueError as e:
+            logging.warning(f'⚠️ {str(e)} — usando modo padrão')
+            return resolve_mode(None)
+    
+    def text_request(self, text: str, mode: Dict) -> Dict:
+        return {"model": AZURE_OPENAI_BATCH_DEPLOYMENT, **paragraph_request(text, mode)}
+    
+    def image_request(self, image_bytes: bytes, context: str) -> Dict:
+        return {"model": AZURE_OPENAI_BATCH_DEPLOYMENT, **image_request(image_bytes, context)}
+    
+    def parse_text(self, original: str, content: str) -> str:
+        corrected_text = content.strip()
+        return corrected_text if preserves_media_tokens(original, corrected_text) else original
+
+
+def create_bulk_processor() -> Optional[BulkBatchProcessor]:
+    """Modo em massa sobre o container de documentos (requer Batch API e AzureWebJobsStorage)."""
+    connection_string = os.environ.get("AzureWebJobsStorage")
+    if batch_backend is None or not connection_string:
+        return None
+    from azure.storage.blob import BlobServiceClient
+    container = BlobServiceClient.from_connection_string(connection_string).get_container_client(BLOB_CONTAINER)
+    return BulkBatchProcessor(BlobBulkStore(container), batch_backend, BulkRequests(), docx_pool.run,
+                              max_requests=BULK_BATCH_MAX_REQUESTS, max_attempts=BULK_MAX_ATTEMPTS)
+
+
+bulk_processor = create_bulk_processor()
+
+# Cache de resultados por documento inteiro (disk, blob ou off)
+DOCUMENT_CACHE_BACKEND = os.environ.get("DOCUMENT_CACHE_BACKEND", "disk").lower()
+DOCUMENT_CACHE_DIR = os.environ.get("DOCUMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "word-correction-cache"))
+DOCUMENT_CACHE_MAX_MB = int(os.environ.get("DOCUMENT_CACHE_MAX_MB", "1024"))
+DOCUMENT_CACHE_MAX_AGE_HOURS = float(os.environ.get("DOCUMENT_CACHE_MAX_AGE_HOURS", "168"))
+# Versão da configuração na chave do cache: muda com deployments, prompts e engine
+DOCUMENT_CONFIG_VERSION = config_fingerprint({
+    "deployments": [AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_DEPLOYMENT_FAST],
+    "modes": REVISION_MODES,
+    "image_prompt": IMAGE_SYSTEM_PROMPT,
+    "engine": REVISION_ENGINE,
+    "version": os.environ.get("DOCUMENT_CACHE_VERSION", "1"),
+})
+
+
+def create_document_cache():
+    """Cache de resultados conforme DOCUMENT_CACHE_BACKEND (None = desativado)."""
+    max_age_seconds = DOCUMENT_CACHE_MAX_AGE_HOURS * 3600
+    if DOCUMENT_CACHE_BACKEND == "blob":
+        connection_string = os.environ.get("AzureWebJobsStorage")
+        if not connection_string:
+            logging.warning("DOCUMENT_CACHE_BACKEND=blob sem AzureWebJobsStorage: cache desativado")
+            return None
+        from azure.storage.blob import BlobServiceClient
+        container = BlobServiceClient.from_connection_string(connection_string).get_container_client(BLOB_CONTAINER)
+        return BlobDocumentCache(container, max_age_seconds=max_age_seconds)
+    if DOCUMENT_CACHE_BACKEND == "disk":
+        return LocalDocumentCache(DOCUMENT_CACHE_DIR, DOCUMENT_CACHE_MAX_MB * 1024 * 1024, max_age_seconds)
+    return None
+
+
+document_cache = create_document_cache()
+
+# Engine usado pelo aquecimento do cache de parágrafos padronizados (cache_warming)
+CACHE_WARMING_ENGINE = os.environ.get("CACHE_WARMING_ENGINE", ENGINE_BATCHED)
+# Intervalo (minutos) entre recargas dos parágrafos padronizados (0 = só ao iniciar)
+BOILERPLATE_REFRESH_MINUTES = float(os.environ.get("BOILERPLATE_REFRESH_MINUTES", "30"))
+
+
+def boilerplate_key(mode_name: str) -> str:
+    return cache_key("boilerplate", mode_name, DOCUMENT_CONFIG_VERSION)
+
+
+def load_boilerplate() -> int:
+    """
+    Carrega nos índices de quase duplicados os parágrafos aquecidos por cache_warming.
+    
+    Parágrafos já presentes com a mesma revisão não são reindexados (recargas
+    periódicas só pagam pelo que mudou).
+    
+    Returns:
+        Parágrafos adicionados aos índices
+    """
+    if document_cache is None:
+        return 0
+    total = 0
+    for name, index in near_duplicates.items():
+        try:
+            record = document_cache.get_record(boilerplate_key(name))
+        except Exception as e:
+            logging.warning(f"Erro ao carregar parágrafos padronizados do modo {name}: {str(e)}")
+            continue
+        if not record:
+            continue
+        added = 0
+        for original, revised in record["paragraphs"].items():
+            if index.revision_for(original) != revised:
+                index.add(original, revised)
+                added += 1
+        if added:
+            logging.info(f"♻️ {added} parágrafo(s) padronizado(s) carregado(s) (modo {name})")
+        total += added
+    return total
+
+
+async def refresh_boilerplate():
+    """
+    Carrega os parágrafos padronizados em segundo plano e os recarrega a cada
+    BOILERPLATE_REFRESH_MINUTES, para receber aquecimentos feitos depois do início.
+    
+    Rodar no import atrasava a inicialização a frio do worker (até
+    NEAR_DUPLICATE_CAPACITY parágrafos por modo); enquanto a carga não termina,
+    os documentos apenas deixam de aproveitar esses parágrafos.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(load_boilerplate)
+        except Exception as e:
+            logging.warning(f"Erro ao recarregar parágrafos padronizados: {str(e)}")
+        if BOILERPLATE_REFRESH_MINUTES <= 0:
+            return
+        await asyncio.sleep(BOILERPLATE_REFRESH_MINUTES * 60)
+
+
+if document_cache is not None and near_duplicates:
+    runtime.submit(refresh_boilerplate())
+
+
+async def warm_boilerplate(texts: List[str], mode: Optional[str] = None) -> Dict:
+    """
+    Revisa em lote parágrafos padronizados e os guarda para todos os workers.
+    
+    Os textos são revisados pelo CACHE_WARMING_ENGINE na faixa bulk; as
+    revisões entram no índice de quase duplicados deste processo e no registro
+    "boilerplate" do cache de documentos, recarregado pelos demais workers
+    (refresh_boilerplate).
+    
+    Args:
+        texts: Parágrafos a revisar (ver cache_warming.BoilerplateScanner)
+        mode: Nome do modo de revisão
+        
+    Returns:
+        Resumo do aquecimento
+    """
+    revision_mode = resolve_mode(mode)
+    index = near_duplicates.get(revision_mode["name"])
+    if index is None or not revision_mode["revise_text"]:
+        logging.warning("Aquecimento ignorado: índice de quase duplicados desativado ou modo sem revisão de texto")
+        return {"mode": revision_mode["name"], "requested": len(texts), "warmed": 0}
+    
+    items = [RevisionItem(position, position, text, None) for position, text in enumerate(texts)]
+    revision_engine = create_engine(CACHE_WARMING_ENGINE, batch_backend)
+    deadline = create_deadline(None, 0)
+    changed = await in_lane(LANE_BULK, revision_engine.revise(items, DocumentReviser(revision_mode, deadline)))
+    
+    # Revisões pelo caminho direto já estão no índice; as da Batch API só voltam alteradas
+    paragraphs: Dict[str, str] = {}
+    for item in items:
+        revised = index.revision_for(item.text) or changed.get(item.segment)
+        if revised is not None:
+            paragraphs[item.text] = revised
+            index.add(item.text, revised)
+    
+    if document_cache is not None and paragraphs:
+        key = boilerplate_key(revision_mode["name"])
+        existing = await asyncio.to_thread(document_cache.get_record, key)
+        merged = dict(existing["paragraphs"]) if existing else {}
+        merged.update(paragraphs)
+        # Mantém os mais recentes dentro da capacidade do índice
+        merged = dict(list(merged.items())[-NEAR_DUPLICATE_CAPACITY:])
+        await asyncio.to_thread(document_cache.put_record, key, {"paragraphs": merged})
+    
+    logging.info(f"🔥 Aquecimento: {len(paragraphs)} de {len(texts)} parágrafo(s) padronizado(s) revisado(s)")
+    return {
+        "mode": revision_mode["name"],
+        "requested": len(texts),
+        "warmed": len(paragraphs),
+        "unrevised": deadline.report()["unrevised_count"],
+        "engine": revision_engine.stats.snapshot(),
+    }
+
+
+# Formato da resposta: o .docx revisado inteiro ou o patch JSON (revision_patch)
+RESPONSE_DOCX = "docx"
+RESPONSE_PATCH = "patch"
+RESPONSE_FORMATS = (RESPONSE_DOCX, RESPONSE_PATCH)
+
+
+def resolve_response_format(name: Optional[str]) -> str:
+    """Formato da resposta pelo nome (vazio -> docx)."""
+    if not name:
+        return RESPONSE_DOCX
+    if name not in RESPONSE_FORMATS:
+        raise ValueError(f"Formato de resposta inválido: '{name}'. Opções: {', '.join(RESPONSE_FORMATS)}")
+    return name
+
+
+def result_key(sha256: str, mode_name: str, response_format: str = RESPONSE_DOCX) -> str:
+    # O patch fica em uma chave própria: o mesmo arquivo pode ter os dois formatos em cache
+    if response_format != RESPONSE_DOCX:
+        mode_name = f"{mode_name}.{response_format}"
+    return cache_key(sha256, mode_name, DOCUMENT_CONFIG_VERSION)
+
+
+async def lookup_cached_result(sha256: str, mode_name: str,
+                               response_format: str = RESPONSE_DOCX) -> Optional[Tuple[bytes, Dict]]:
+    """Resultado (documento revisado ou patch) e relatório guardados para o hash e modo, ou None."""
+    if document_cache is None:
+        return None
+    try:
+        return await asyncio.to_thread(document_cache.get, result_key(sha256, mode_name, response_format))
+    except Exception as e:
+        logging.warning(f"Erro ao consultar o cache de documentos: {str(e)}")
+        return None
+
+
+async def store_cached_result(sha256: str, mode_name: str, content: bytes, report: Dict,
+                              response_format: str = RESPONSE_DOCX):
+    if document_cache is None:
+        return
+    try:
+        await asyncio.to_thread(document_cache.put, result_key(sha256, mode_name, response_format),
+                                content, report)
+    except Exception as e:
+        logging.warning(f"Erro ao gravar no cache de documentos: {str(e)}")
+
+
+def report_record_key(report_id: str) -> str:
+    return f"report-{report_id}"
+
+
+async def publish_report(report: Dict) -> Optional[str]:
+    """
+    Guarda o relatório completo para GET /api/revision-report e devolve seu id.
+
+    O header X-Revision-Report leva apenas o resumo (report_summary).
+    """
+    if document_cache is None:
+        return None
+    report_id = uuid.uuid4().hex
+    try:
+        await asyncio.to_thread(document_cache.put_record, report_record_key(report_id), report)
+    except Exception as e:
+        logging.warning(f"Erro ao gravar o relatório da revisão: {str(e)}")
+        return None
+    return report_id
+
+
+# Revisão incremental: reaproveitar a revisão da versão anterior do mesmo documento
+INCREMENTAL_REVISION = os.environ.get("INCREMENTAL_REVISION", "true").lower() == "true"
+
+
+def revision_record_key(document_id: str, mode_name: str) -> str:
+    return cache_key(f"record-{document_hash(document_id.encode('utf-8'))}", mode_name, DOCUMENT_CONFIG_VERSION)
+
+
+async def load_revision_record(document_id: str, mode_name: str) -> Optional[RevisionRecord]:
+    """Registro da última revisão completa do documento, ou None."""
+    if document_cache is None or not INCREMENTAL_REVISION:
+        return None
+    try:
+        data = await asyncio.to_thread(document_cache.get_record, revision_record_key(document_id, mode_name))
+        return RevisionRecord.from_dict(data) if data is not None else None
+    except Exception as e:
+        logging.warning(f"Erro ao ler o registro de revisão de '{document_id}': {str(e)}")
+        return None
+
+
+async def save_revision_record(document_id: str, mode_name: str, incremental: IncrementalRevision, report: Dict):
+    # Apenas revisões completas servem de base para a próxima versão
+    if document_cache is None or incremental.record is None:
+        return
+    if report["status"] != "complete" or report["degradation"] != LEVEL_NAMES[LEVEL_NORMAL]:
+        return
+    try:
+        await asyncio.to_thread(document_cache.put_record, revision_record_key(document_id, mode_name),
+                                incremental.record.to_dict())
+    except Exception as e:
+        logging.warning(f"Erro ao gravar o registro de revisão de '{document_id}': {str(e)}")
+
+
+async def revise_incremental(file_content: bytes, document_id: Optional[str], mode: Optional[str] = None,
+                             **kwargs) -> Tuple[bytes, Dict]:
+    """
+    revise_document reaproveitando a revisão da versão anterior do documento.
+    
+    `document_id` identifica o documento entre versões (nome do blob, ou o
+    informado pelo cliente). Sem ele, ou com INCREMENTAL_REVISION=false, o
+    documento é revisado inteiro.
+    
+    Returns:
+        Tupla (conteúdo do documento corrigido, relatório de processamento)
+    """
+    if not document_id or not INCREMENTAL_REVISION:
+        return await revise_document(file_content, mode=mode, **kwargs)
+    mode_name = resolve_mode(mode)["name"]
+    incremental = IncrementalRevision(await load_revision_record(document_id, mode_name))
+    corrected_content, report = await revise_document(file_content, mode=mode, incremental=incremental, **kwargs)
+    # O modo pode ter sido trocado pela degradação: o registro fica no modo pedido
+    await save_revision_record(document_id, mode_name, incremental, report)
+    return corrected_content, report
+
+
+def predict_text_makespan(paragraph_items: List[RevisionItem], tables: List[Tuple[int, List[TableCell]]]) -> float:
+    """Makespan previsto da revisão de texto: requisições distribuídas por LPT nas vagas do limitador."""
+    durations = []
+    for item in paragraph_items:
+        tokens = estimate_tokens(item.text)
+        if tokens == 0:
+            continue
+        # Parágrafos longos viram blocos revisados em paralelo
+        chunks = max(1, math.ceil(tokens / PARAGRAPH_CHUNK_TOKENS))
+        durations.extend([cost_model.text_seconds(min(tokens, PARAGRAPH_CHUNK_TOKENS))] * chunks)
+    for _, cells in tables:
+        for batch in pack_table_cells(cells, TABLE_REQUEST_TOKENS):
+            durations.append(cost_model.text_seconds(sum(cell.tokens for cell in batch)))
+    return lpt_makespan(durations, AZURE_OPENAI_MAX_CONCURRENT_CALLS)
+
+
+def process_word_document(file_content: bytes, describe_images: bool = True, mode: Optional[str] = None,
+                          document_id: Optional[str] = None) -> bytes:
+    """
+    Processa documento Word completo mantendo formatação, imagens, tabelas, etc.
+    Adiciona descrições automáticas às imagens usando Azure OpenAI Vision.
+    
+    Versão síncrona de revise_document: o documento é processado no event loop
+    compartilhado do worker.
+    
+    Args:
+        file_content: Conteúdo binário do documento Word
+        describe_images: Se True, adiciona descrições às imagens (se o modo permitir)
+        mode: Nome do modo de revisão (pedagogical, spelling, text-only, images-only)
+        document_id: Identificação do documento entre versões (revisão incremental)
         
-    except Exception as e:
-        logging.error(f"Erro ao descrever imagem: {str(e)}")
-        return "Descrição da imagem: Imagem sem descrição disponível devido a erro técnico."
+    Returns:
+        Conteúdo binário do documento corrigido
+    """
+    corrected_content, _ = runtime.run(revise_incremental(file_content, document_id,
+                                                          describe_images=describe_images, mode=mode))
+    return corrected_content
 
 
-def process_paragraph_text(text: str, is_table_cell: bool = False) -> str:
+async def revise_document(file_content: bytes, describe_images: bool = True, mode: Optional[str] = None,
+                          budget_seconds: Optional[float] = None, engine: Optional[str] = None,
+                          extracted: Optional[Tuple[DocumentIR, List[bytes]]] = None,
+                          incremental: Optional[IncrementalRevision] = None,
+                          response_format: str = RESPONSE_DOCX,
+                          progress: Optional[RevisionProgress] = None) -> Tuple[bytes, Dict]:
     """
-    Processa um parágrafo usando Azure OpenAI com revisão pedagógica SENAC.
+    Processa o documento dentro de um orçamento de tempo e devolve o relatório.
+    
+    Leitura, extração e montagem do .docx rodam no pool de processos
+    (docx_worker); o event loop só trabalha com a IR do documento
+    (document_ir): segmentos de texto e referências de imagem. Os parágrafos
+    são revisados pelo engine configurado (revision_engines) enquanto as
+    tabelas são revisadas como grade; as imagens são descritas em seguida, em
+    lotes de várias imagens por requisição, com o texto vizinho já revisado
+    como contexto.
+    
+    Com `incremental`, os segmentos iguais aos da versão anterior (alinhados
+    por diff) e as imagens já descritas reaproveitam o resultado anterior; só
+    o que mudou vai ao modelo.
+    
+    Parágrafos, tabelas e imagens são despachados do mais caro para o mais
+    barato (LPT, ver scheduling); o makespan previsto e o real vão para o
+    relatório e para o MakespanTracker.
+    
+    Quando o tempo restante não cobre mais uma chamada, o despacho é encerrado:
+    os itens restantes mantêm o texto original, o documento é salvo mesmo assim
+    e os itens não revisados aparecem no relatório.
     
     Args:
-        text: Texto do parágrafo a ser revisado
-        is_table_cell: Se True, aplica processamento específico para células de tabela
+        file_content: Conteúdo binário do documento Word
+        describe_images: Se True, adiciona descrições às imagens (se o modo permitir)
+        mode: Nome do modo de revisão
+        budget_seconds: Orçamento de tempo do documento (padrão: DOCUMENT_TIME_BUDGET_SECONDS)
+        engine: Engine de revisão dos parágrafos (padrão: REVISION_ENGINE)
+        extracted: IR e imagens já extraídas por extract_work_items (evita ler o documento de novo)
+        incremental: Estado da revisão incremental (registro da versão anterior)
+        response_format: "docx" (documento corrigido) ou "patch" (JSON com os segmentos
+            alterados e as descrições de imagem; o .docx não é montado)
+        progress: Recebe cada segmento revisado e cada descrição de imagem assim
+            que concluídos (streaming NDJSON)
         
     Returns:
-        Texto revisado pedagogicamente
+        Tupla (conteúdo do documento corrigido ou do patch, relatório de processamento)
+        
+    Raises:
+        ValueError: Modo ou engine de revisão inválido
     """
-    if not text or len(text.strip()) == 0:
-        return text
+    revision_engine = create_engine(engine or REVISION_ENGINE, batch_backend)
+    if budget_seconds is None:
+        budget_seconds = DOCUMENT_TIME_BUDGET_SECONDS
+    deadline = create_deadline(budget_seconds, DOCUMENT_SAVE_RESERVE_SECONDS)
     
-    # Detectar e preservar tokens de mídia
-    import re
-    media_tokens = re.findall(r'\[\[(FIG|TAB|SA)\d+\]\]', text)
+    revision_mode = resolve_mode(mode)
     
-    try:
-        system_prompt = """Você é revisor pedagógico do SENAC/SC.
-
-OBJETIVO:
-Entregar o texto revisado, didático e padronizado, pronto para publicação.
-O texto deve soar como uma AULA, em tom explicativo e próximo ao aluno, quase como uma conversa.
-Use linguagem dialógica e interações leves ("Você sabia…?", "Reflita…", "Agora pense…", "Vamos entender…") para engajar o aluno.
-Devolva exclusivamente o texto revisado, sem qualquer comentário, explicação, preâmbulo ou cabeçalho extra.
-
-REGRAS OBRIGATÓRIAS:
-0) PROIBIDO qualquer meta-texto/comentário fora do conteúdo (ex.: "Segue o texto...", "O texto foi revisado...").
-0a) PROIBIDO inserir placeholders como "..." ou "(continua...)". NUNCA encerre com frase incompleta.
-1) MODO CÓPIA MELHORADA: mantenha as frases próximas do original. Corrija ortografia, gramática, pontuação, concordância e coesão.
-   PORÉM, MELHORE a linguagem para ser mais dialógica e pedagógica, sem reescrita total.
-2) Simplifique linguagem técnica mantendo precisão. Explique termos complexos em linguagem acessível.
-3) Use TOM CONVERSACIONAL como em aula: 1ª pessoa do plural ("vamos", "veremos"), perguntas retóricas, interações.
-4) PARÁGRAFOS CURTOS: divida parágrafos longos em parágrafos menores (máximo 5-6 linhas cada).
-5) FRASES CLARAS: divida frases muito longas em frases mais curtas e diretas.
-6) INSIRA nomes fictícios para empresas, pessoas, instituições quando aplicável (ex: "Empresa TechSolutions", "João Silva").
-   Mantenha o MESMO nome fictício em todo o texto.
-7) Preserve estrutura, ordem, exemplos, tabelas, listas.
-8) Padronize títulos/subtítulos em CAIXA ALTA quando forem cabeçalhos principais.
-9) TERMOS TÉCNICOS: simplifique ou explique brevemente quando aparecerem pela primeira vez.
-10) PALAVRAS ESTRANGEIRAS: coloque em itálico (retorne com marcador *palavra* para indicar itálico).
-11) REMOVA linguagem excessivamente formal ou acadêmica.
-12) ADICIONE pequenos elementos pedagógicos quando natural: "Observe que...", "Note que...", "É importante destacar...".
-13) TOKENS DE MÍDIA ([[FIG1]], [[TAB1]], [[SA1]]): PRESERVE EXATAMENTE onde estão. NUNCA remova, renomeie ou mova.
-14) NÃO remova citações, autores, anos, referências bibliográficas.
-15) MANTENHA o comprimento similar ao original - não resuma nem encurte drasticamente.
-16) NÃO use markdown (##, **, __, ---).
-17) ALTERNATIVAS DE QUESTÕES: se detectar questões de múltipla escolha, identifique a alternativa correta e envolva
-    APENAS A LINHA DA ALTERNATIVA com <<ALT_CORRETA_INICIO>> texto da alternativa <<ALT_CORRETA_FIM>>.
-
-IMPORTANTE: Retorne SOMENTE o texto revisado. Sem comentários, sem explicações, sem preâmbulos."""
-
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"TEXTO ORIGINAL:\n{text}"}
-            ],
-            temperature=0.4,  # Aumentado para permitir mais criatividade pedagógica
-            max_tokens=6000
+    # Saturação prolongada: degradar o documento em vez de estourar o tempo
+    lane = current_lane()
+    level = ladders[lane].begin_document(limiter.pressure(lane))
+    if level >= LEVEL_NO_IMAGES:
+        describe_images = False
+    if level >= LEVEL_SPELLING and revision_mode["revise_text"]:
+        revision_mode = resolve_mode(MODE_SPELLING)
+    if level > LEVEL_NORMAL:
+        logging.warning(f"📉 Degradação '{LEVEL_NAMES[level]}' aplicada ao documento (faixa {lane})")
+    
+    revise_text = revision_mode["revise_text"]
+    describe_images = describe_images and revision_mode["describe_images"]
+    
+    # Ler o documento e extrair a IR (fora do event loop)
+    if extracted is None:
+        extracted = await docx_pool.run(extract_work_items, file_content, describe_images)
+    ir, images = extracted
+    if not describe_images:
+        images = []
+    
+    logging.info(f"Processando documento com {ir.paragraph_count} parágrafos (modo: {revision_mode['name']})")
+    logging.info(f"Imagens encontradas no documento: {ir.images_count}")
+    
+    # Id do segmento -> texto revisado (apenas segmentos alterados)
+    revised: Dict[int, str] = {}
+    
+    # Segmentos iguais aos da versão anterior: texto revisado reaproveitado
+    reused: Dict[int, str] = {}
+    if incremental is not None and incremental.previous is not None and revise_text:
+        reused = incremental.previous.align(ir.texts)
+        revised.update({segment: text for segment, text in reused.items() if text != ir.texts[segment]})
+        logging.info(f"♻️ Revisão incremental: {len(reused)} de {len(ir.texts)} segmento(s) reaproveitado(s)")
+    
+    # Parágrafos e células a revisar (sem os reaproveitados e, no degrau essential, os de pouco valor)
+    paragraph_items: List[RevisionItem] = []
+    tables: List[Tuple[int, List[TableCell]]] = []
+    if revise_text:
+        paragraph_items = [RevisionItem(segment, para_idx, text, style_name)
+                           for segment, para_idx, text, style_name in ir.paragraph_segments()
+                           if segment not in reused]
+        if level >= LEVEL_ESSENTIAL:
+            for item in paragraph_items:
+                if item.text.strip() and is_low_value(item.text, DEGRADATION_MIN_WORDS):
+                    deadline.mark_unrevised("paragraph", item.locator, reason="degraded")
+            paragraph_items = [item for item in paragraph_items
+                               if not is_low_value(item.text, DEGRADATION_MIN_WORDS)]
+        for table_idx, cells in ir.table_cells():
+            cells = [cell for cell in cells if not all(segment in reused for segment in cell.segments)]
+            if level >= LEVEL_ESSENTIAL:
+                low_value = [cell for cell in cells
+                             if all(is_low_value(text, DEGRADATION_MIN_WORDS) for text in cell.texts)]
+                for cell in low_value:
+                    if any(text.strip() for text in cell.texts):
+                        deadline.mark_unrevised("table_cell", f"{table_idx}:{cell.key}", reason="degraded")
+                cells = [cell for cell in cells if cell not in low_value]
+            if cells:
+                tables.append((table_idx, cells))
+    predicted_seconds = predict_text_makespan(paragraph_items, tables)
+    schedule_started = time.perf_counter()
+    
+    # Streaming: segmentos reaproveitados saem de imediato, os demais à medida que terminam
+    on_revised = None
+    if progress is not None:
+        pending_segments = {item.segment for item in paragraph_items}
+        pending_segments.update(segment for _, cells in tables for cell in cells for segment in cell.segments)
+        reused_segments = [segment for segment in reused if segment not in pending_segments]
+        progress.start(len(pending_segments) + len(reused_segments) + len(images))
+        for segment in reused_segments:
+            progress.segment(ir.locator(segment), ir.texts[segment], reused[segment])
+        
+        # Textos repetidos são revisados uma vez pelo engine e valem para todas as ocorrências
+        segments_by_text: Dict[str, List[int]] = {}
+        if revision_engine.config["use_cache"]:
+            for item in paragraph_items:
+                segments_by_text.setdefault(item.text, []).append(item.segment)
+        
+        def stream_revised(item: RevisionItem, text: str):
+            for segment in segments_by_text.get(item.text, [item.segment]):
+                progress.segment(ir.locator(segment), ir.texts[segment], text)
+        
+        on_revised = stream_revised
+    
+    # Processar os parágrafos com o engine configurado
+    async def revise_paragraphs():
+        revised.update(await revision_engine.revise(paragraph_items,
+                                                    DocumentReviser(revision_mode, deadline, on_revised)))
+    
+    # Processar tabelas (grade deduplicada, poucas requisições por tabela)
+    async def revise_table(table_idx: int, cells: List[TableCell]):
+        try:
+            changed = await process_table(cells, revision_mode, deadline, table_idx)
+        except Exception as e:
+            logging.error(f"Erro ao processar tabela: {str(e)}")
+            return
+        for cell in cells:
+            for segment, text in zip(cell.segments, changed.get(cell.key, ())):
+                if text != ir.texts[segment]:
+                    revised[segment] = text
+                else:
+                    revised.pop(segment, None)
+                if progress is not None:
+                    progress.segment(ir.locator(segment), ir.texts[segment], text)
+    
+    if revise_text:
+        # Quem tem a maior requisição começa primeiro (as requisições entram no limitador nessa ordem)
+        components = [(max((estimate_tokens(item.text) for item in paragraph_items), default=0), None)]
+        components += [
+            (max(min(sum(cell.tokens for cell in cells), TABLE_REQUEST_TOKENS), max(cell.tokens for cell in cells)),
+             (table_idx, cells))
+            for table_idx, cells in tables
+        ]
+        if ENGINE_CONFIG["longest_first"]:
+            components = longest_first(components, lambda component: component[0])
+        await asyncio.gather(*(
+            revise_paragraphs() if table is None else revise_table(*table)
+            for _, table in components
+        ))
+    
+    paragraph_segments = {para_idx: segment for segment, para_idx, _, _ in ir.paragraph_segments()}
+    paragraphs_corrected = sum(1 for segment in paragraph_segments.values() if segment in revised)
+    logging.info(f"Total de parágrafos corrigidos: {paragraphs_corrected}")
+    logging.info(f"Métricas por tier: {tier_metrics.snapshot()}")
+    
+    # Processar e descrever imagens
+    image_descriptions: List[Tuple[int, str]] = []
+    image_keys = [image_key(image_bytes) for image_bytes in images] if incremental is not None else []
+    reused_images: Dict[int, str] = {}
+    if incremental is not None and incremental.previous is not None and describe_images:
+        reused_images = {image_id: incremental.previous.images[key]
+                         for image_id, key in enumerate(image_keys) if key in incremental.previous.images}
+    if describe_images and images:
+        logging.info("🖼️ Iniciando descrição de imagens...")
+        
+        def neighbour_text(para_idx: int) -> str:
+            segment = paragraph_segments.get(para_idx)
+            if segment is None:
+                return ""
+            return revised.get(segment, ir.texts[segment])[:150]
+        
+        def image_context(image_id: int) -> str:
+            # Buscar contexto dos parágrafos vizinhos
+            para_idx = ir.image_paragraphs[image_id]
+            return " ".join(neighbour_text(i) for i in (para_idx - 1, para_idx, para_idx + 1)).strip()
+        
+        image_ids = list(range(len(images)))
+        if ENGINE_CONFIG["longest_first"]:
+            image_ids = longest_first(image_ids, lambda image_id: len(images[image_id]))
+        
+        # Mesma figura já descrita (outra resolução ou reexportada): reaproveitar a descrição
+        fingerprints: Dict[int, Optional[Tuple[int, int]]] = {}
+        similar_images: Dict[int, str] = {}
+        if image_index is not None:
+            def fingerprint_and_lookup():
+                # Hash e consulta no mesmo pool de threads: o índice não roda no event loop
+                for image_id in image_ids:
+                    if image_id in reused_images:
+                        continue
+                    fingerprints[image_id] = image_fingerprint(images[image_id])
+                    description = image_index.lookup(fingerprints[image_id])
+                    if description is not None:
+                        similar_images[image_id] = description
+            
+            await asyncio.to_thread(fingerprint_and_lookup)
+            if similar_images:
+                logging.info(f"♻️ {len(similar_images)} imagem(ns) com descrição reaproveitada (hash perceptual)")
+        pending = [image_id for image_id in image_ids
+                   if image_id not in reused_images and image_id not in similar_images]
+        
+        # Várias imagens por requisição; as que não voltarem são descritas individualmente
+        batches: List[List[int]] = []
+        if IMAGE_BATCH_ENABLED and len(pending) > 1:
+            batches = [batch for batch in pack_images(pending, lambda image_id: image_tokens(images[image_id]),
+                                                      IMAGE_BATCH_TOKENS, IMAGE_BATCH_MAX_IMAGES)
+                       if len(batch) > 1]
+        batched_ids = {image_id for batch in batches for image_id in batch}
+        predicted_seconds += lpt_makespan(
+            [cost_model.image_seconds_for(sum(len(images[image_id]) for image_id in batch)) for batch in batches] +
+            [cost_model.image_seconds_for(len(images[image_id])) for image_id in pending
+             if image_id not in batched_ids],
+            AZURE_OPENAI_MAX_CONCURRENT_CALLS
         )
         
-        corrected_text = response.choices[0].message.content.strip()
+        batch_descriptions: Dict[int, str] = {}
+        blocked_images = set()
         
-        # Garantir que tokens de mídia foram preservados
-        for token in media_tokens:
-            if token not in corrected_text:
-                logging.warning(f"Token {token} foi removido, restaurando...")
-                # Tentar restaurar o token
-                corrected_text = text  # Fallback para texto original se tokens forem removidos
-                break
+        async def describe_batch(batch: List[int]):
+            try:
+                batch_descriptions.update(await describe_images_batch(
+                    [(image_id, images[image_id], image_context(image_id)) for image_id in batch], deadline
+                ))
+            except DispatchBlockedError as e:
+                for image_id in batch:
+                    deadline.mark_unrevised("image", ir.image_paragraphs[image_id], reason=e.reason)
+                    blocked_images.add(image_id)
         
-        return corrected_text
+        await asyncio.gather(*(describe_batch(batch) for batch in batches))
         
-    except Exception as e:
-        logging.error(f"Erro ao processar parágrafo com OpenAI: {str(e)}")
-        return text  # Retorna texto original em caso de erro
+        async def describe(image_id: int, image_bytes: bytes) -> Optional[str]:
+            if image_id in reused_images:
+                return reused_images[image_id]
+            if image_id in similar_images:
+                return similar_images[image_id]
+            if image_id in batch_descriptions:
+                return batch_descriptions[image_id]
+            if image_id in blocked_images:
+                return None
+            if image_id in batched_ids:
+                image_batch_stats["fallbacks"] += 1
+            try:
+                description = await describe_image(image_bytes, image_context(image_id), deadline)
+            except DispatchBlockedError as e:
+                deadline.mark_unrevised("image", ir.image_paragraphs[image_id], reason=e.reason)
+                return None
+            # Aviso de erro técnico inserido no lugar da descrição: o documento não está completo
+            if description == IMAGE_DESCRIPTION_ERROR:
+                deadline.mark_unrevised("image", ir.image_paragraphs[image_id], reason="error")
+            return description
+        
+        async def describe_and_report(image_id: int) -> Optional[str]:
+            description = await describe(image_id, images[image_id])
+            if progress is not None and description is not None:
+                progress.image(image_id, ir.image_paragraphs[image_id], description)
+            return description
+        
+        descriptions = await asyncio.gather(*(describe_and_report(image_id) for image_id in image_ids))
+        image_descriptions = sorted(
+            (image_id, description)
+            for image_id, description in zip(image_ids, descriptions)
+            if description is not None
+        )
+        if image_index is not None:
+            for image_id, description in image_descriptions:
+                if image_id in pending and description != IMAGE_DESCRIPTION_ERROR:
+                    image_index.add(fingerprints.get(image_id), description)
+        logging.info(f"✅ Total de imagens descritas: {len(image_descriptions)}")
+    
+    actual_seconds = time.perf_counter() - schedule_started
+    if predicted_seconds > 0:
+        makespan.record(predicted_seconds, actual_seconds)
+    
+    if response_format == RESPONSE_PATCH:
+        # Só os segmentos alterados e as descrições: o cliente aplica sobre o original
+        corrected_content = encode_patch(build_patch(ir, revised, image_descriptions, document_hash(file_content)))
+    else:
+        # Aplicar revisões e salvar o documento (fora do event loop)
+        corrected_content = await docx_pool.run(assemble_document, file_content, ir, revised, image_descriptions)
+    
+    report = {
+        "mode": revision_mode["name"],
+        "paragraphs_corrected": paragraphs_corrected,
+        "engine": revision_engine.stats.snapshot(),
+        "degradation": LEVEL_NAMES[level],
+        "schedule": {"predicted_seconds": round(predicted_seconds, 2), "actual_seconds": round(actual_seconds, 2)}
+    }
+    report.update(deadline.report())
+    if incremental is not None:
+        incremental.stats["segments_reused"] = len(reused)
+        if revise_text:
+            incremental.stats["segments_revised"] = sum(
+                1 for segment, text in enumerate(ir.texts) if text.strip() and segment not in reused
+            )
+        incremental.stats["images_reused"] = len(reused_images)
+        descriptions_by_id = dict(image_descriptions)
+        incremental.record = RevisionRecord(
+            list(ir.texts), dict(revised),
+            {key: descriptions_by_id[image_id] for image_id, key in enumerate(image_keys)
+             if image_id in descriptions_by_id}
+        )
+        report["incremental"] = incremental.report()
+    if deadline.partial:
+        logging.warning(f"⏱️ Documento parcial: {report['unrevised_count']} item(ns) mantidos sem revisão")
+    
+    return corrected_content, report
 
 
-def process_word_document(file_content: bytes, describe_images: bool = True) -> bytes:
+async def compare_revision_engines(file_content: bytes, engines: Optional[List[str]] = None,
+                                   mode: Optional[str] = None) -> Dict[str, Dict]:
     """
-    Processa documento Word completo mantendo formatação, imagens, tabelas, etc.
-    Adiciona descrições automáticas às imagens usando Azure OpenAI Vision.
+    Executa vários engines sobre os mesmos parágrafos de um documento.
+    
+    Nenhum .docx é gerado: o resultado serve para comparar estratégias
+    (requisições, itens por requisição, tempo) com entradas idênticas.
+    
+    Uso:
+        runtime.run(compare_revision_engines(conteudo, ["sequential", "batched"]))
     
     Args:
         file_content: Conteúdo binário do documento Word
-        describe_images: Se True, adiciona descrições às imagens
+        engines: Engines a comparar (padrão: todos os disponíveis)
+        mode: Nome do modo de revisão
         
     Returns:
-        Conteúdo binário do documento corrigido
+        Nome do engine -> estatísticas da execução
     """
-    # Carregar documento da memória
-    doc_stream = io.BytesIO(file_content)
-    doc = Document(doc_stream)
+    revision_mode = resolve_mode(mode)
+    ir, _ = await docx_pool.run(extract_work_items, file_content, False)
+    items = [RevisionItem(segment, para_idx, text, style_name)
+             for segment, para_idx, text, style_name in ir.paragraph_segments()]
     
-    logging.info(f"Processando documento com {len(doc.paragraphs)} parágrafos")
+    if engines is None:
+        engines = [name for name in ENGINES if name != ENGINE_BATCH_API or batch_backend is not None]
     
-    # Contar imagens no documento
-    images_count = 0
-    for rel in doc.part.rels.values():
-        if "image" in rel.target_ref:
-            images_count += 1
-    logging.info(f"Imagens encontradas no documento: {images_count}")
+    results = {}
+    for name in engines:
+        revision_engine = create_engine(name, batch_backend)
+        deadline = create_deadline(None, 0)
+        await revision_engine.revise(items, DocumentReviser(revision_mode, deadline))
+        results[name] = revision_engine.stats.snapshot()
+        logging.info(f"Engine {name}: {results[name]}")
+    return results
+
+
+def document_response(content: bytes, filename: str, report: Dict, cache_status: str,
+                      response_format: str = RESPONSE_DOCX, report_id: Optional[str] = None) -> func.HttpResponse:
+    """Resposta com o documento corrigido (ou o patch) e o resumo da revisão."""
+    if response_format == RESPONSE_PATCH:
+        corrected_filename = filename.replace('.docx', '_corrigido.patch.json')
+        mimetype = PATCH_MIMETYPE
+    else:
+        corrected_filename = filename.replace('.docx', '_corrigido.docx')
+        mimetype = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     
-    # Processar cada parágrafo mantendo formatação
-    paragraphs_processed = 0
-    for paragraph in doc.paragraphs:
-        if paragraph.text.strip():  # Apenas processar parágrafos com texto
-            try:
-                original_text = paragraph.text
-                corrected_text = process_paragraph_text(original_text, is_table_cell=False)
-                
-                # Aplicar formatações especiais e preservar estilo
-                if corrected_text != original_text:
-                    # Aplicar formatações (itálico, negrito, marcadores)
-                    apply_text_formatting(paragraph, corrected_text)
-                    paragraphs_processed += 1
-                    
-            except Exception as e:
-                logging.error(f"Erro ao processar parágrafo: {str(e)}")
-                continue
-    
-    logging.info(f"Total de parágrafos corrigidos: {paragraphs_processed}")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{corrected_filename}"',
+        "X-Revision-Status": report["status"],
+        "X-Revision-Degradation": report.get("degradation", LEVEL_NAMES[LEVEL_NORMAL]),
+        "X-Revision-Cache": cache_status,
+        "X-Revision-Report": json.dumps(report_summary(report))
+    }
+    if report_id is not None:
+        headers["X-Revision-Report-Id"] = report_id
     
-    # Processar e descrever imagens
-    if describe_images and images_count > 0:
-        logging.info("🖼️ Iniciando descrição de imagens...")
-        images_described = 0
-        
-        try:
-            # Precisamos iterar em ordem reversa para não afetar índices ao inserir parágrafos
-            paragraphs_list = list(doc.paragraphs)
-            
-            for para_idx in range(len(paragraphs_list) - 1, -1, -1):
-                paragraph = paragraphs_list[para_idx]
-                
-                for run in paragraph.runs:
-                    # Verificar se o run contém imagem
-                    if 'graphic' in run._element.xml:
-                        try:
-                            # Extrair a imagem
-                            blip_elements = run._element.xpath('.//a:blip')
-                            if blip_elements:
-                                for blip in blip_elements:
-                                    embed = blip.get(qn('r:embed'))
-                                    if embed:
-                                        image_part = doc.part.related_parts[embed]
-                                        image_bytes = image_part.blob
-                                        
-                                        # Gerar descrição pedagógica
-                                        # Buscar contexto dos parágrafos vizinhos
-                                        context_parts = []
-                                        if para_idx > 0:
-                                            context_parts.append(paragraphs_list[para_idx - 1].text[:150])
-                                        context_parts.append(paragraph.text[:150])
-                                        if para_idx < len(paragraphs_list) - 1:
-                                            context_parts.append(paragraphs_list[para_idx + 1].text[:150])
-                                        context = " ".join(context_parts)
-                                        
-                                        description = describe_image(image_bytes, context)
-                                        
-                                        # Inserir descrição como NOVO PARÁGRAFO após a imagem
-                                        # Encontrar o elemento do parágrafo no XML
-                                        para_element = paragraph._element
-                                        parent_element = para_element.getparent()
-                                        
-                                        # Criar novo parágrafo com a descrição
-                                        new_para = doc.add_paragraph()
-                                        new_para.text = description
-                                        new_para_element = new_para._element
-                                        
-                                        # Inserir o novo parágrafo logo após o parágrafo da imagem
-                                        parent_element.insert(
-                                            parent_element.index(para_element) + 1,
-                                            new_para_element
-                                        )
-                                        
-                                        images_described += 1
-                                        logging.info(f"  ✅ Imagem {images_described} descrita e inserida no texto")
-                        except Exception as e:
-                            logging.warning(f"  ⚠️ Erro ao processar imagem inline: {str(e)}")
-            
-            logging.info(f"✅ Total de imagens descritas: {images_described}")
-            
-        except Exception as e:
-            logging.error(f"Erro ao processar imagens: {str(e)}")
-    
-    # Processar tabelas
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    if paragraph.text.strip():
-                        try:
-                            original_text = paragraph.text
-                            corrected_text = process_paragraph_text(original_text, is_table_cell=True)
-                            
-                            if corrected_text != original_text:
-                                apply_text_formatting(paragraph, corrected_text)
-                                    
-                        except Exception as e:
-                            logging.error(f"Erro ao processar célula de tabela: {str(e)}")
-                            continue
-    
-    # Salvar documento processado em memória
-    output_stream = io.BytesIO()
-    doc.save(output_stream)
-    output_stream.seek(0)
-    
-    return output_stream.getvalue()
+    return func.HttpResponse(
+        body=content,
+        status_code=200,
+        mimetype=mimetype,
+        headers=headers
+    )
+
+
+def overloaded_response(retry_after: int, estimate: Optional[WorkEstimate] = None) -> func.HttpResponse:
+    """Resposta 429 do controle de admissão."""
+    body = {
+        "error": "Capacidade de processamento esgotada no momento. Tente novamente mais tarde.",
+        "retry_after_seconds": retry_after
+    }
+    if estimate is not None:
+        body["estimate"] = estimate.to_dict()
+    return func.HttpResponse(
+        json.dumps(body),
+        status_code=429,
+        mimetype="application/json",
+        headers={"Retry-After": str(retry_after)}
+    )
 
 
 @app.route(route="correct-document", auth_level=func.AuthLevel.FUNCTION, methods=["POST"])
-def correct_document(req: func.HttpRequest) -> func.HttpResponse:
+async def correct_document(req: func.HttpRequest) -> func.HttpResponse:
     """
     Azure Function HTTP endpoint para correção de documentos Word.
     
@@ -381,9 +1727,28 @@ def correct_document(req: func.HttpRequest) -> func.HttpResponse:
     
     Parâmetros:
         - file: Arquivo .docx para correção (upload)
+        - mode: Modo de revisão (opcional, query string ou campo do formulário):
+                pedagogical (padrão), spelling, text-only, images-only
+        - document_id: Identificação do documento entre versões (opcional): com
+                ele, só os parágrafos alterados desde a última revisão completa
+                vão ao modelo (revisão incremental)
+        - format: Formato da resposta (opcional): docx (padrão) ou patch — JSON
+                compacto com os localizadores dos parágrafos alterados, o texto
+                revisado com marcadores de formatação e as descrições de imagem;
+                o cliente reconstrói o .docx a partir do original (revision_patch)
         
     Retorna:
-        - Arquivo .docx corrigido
+        - Arquivo .docx corrigido (ou o patch JSON)
+        - Header X-Revision-Status: "complete" ou "partial" (orçamento de tempo esgotado)
+        - Header X-Revision-Degradation: degrau aplicado sob saturação
+          (normal, no_images, spelling, essential)
+        - Header X-Revision-Cache: "hit" (mesmo arquivo já revisado) ou "miss"
+        - Header X-Revision-Report: resumo JSON (status, tempo gasto, contagem de itens
+          mantidos sem revisão por tipo e motivo)
+        - Header X-Revision-Report-Id: id do relatório completo, com os localizadores
+          dos itens não revisados (GET /api/revision-report?id=...)
+        - 429 + Retry-After quando o trabalho estimado do documento não cabe na
+          capacidade atual (controle de admissão)
     """
     logging.info('Recebida requisição para correção de documento Word')
     
@@ -421,25 +1786,84 @@ def correct_document(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
         
+        # Validar modo de revisão e formato da resposta
+        mode_name = req.params.get('mode') or req.form.get('mode')
+        try:
+            revision_mode = resolve_mode(mode_name)
+            response_format = resolve_response_format(req.params.get('format') or req.form.get('format'))
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": str(e)
+                }),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        # Identificação do documento entre versões (revisão incremental)
+        document_id = req.params.get('document_id') or req.form.get('document_id')
+        
         # Ler conteúdo do arquivo
         file_content = file.read()
-        logging.info(f"Arquivo recebido: {filename} ({len(file_content)} bytes)")
+        logging.info(f"Arquivo recebido: {filename} ({len(file_content)} bytes, modo: {revision_mode['name']})")
         
-        # Processar documento
-        corrected_content = process_word_document(file_content)
-        logging.info(f"Documento processado com sucesso ({len(corrected_content)} bytes)")
+        # Mesmo documento já revisado no mesmo modo e configuração
+        sha256 = document_hash(file_content)
+        cached = await lookup_cached_result(sha256, revision_mode["name"], response_format)
+        if cached is not None:
+            logging.info(f"♻️ {filename}: resultado em cache ({sha256[:12]})")
+            return document_response(cached[0], filename, cached[1], "hit", response_format)
         
-        # Retornar arquivo corrigido
-        corrected_filename = filename.replace('.docx', '_corrigido.docx')
+        # Azure OpenAI indisponível: rejeitar rapidamente em vez de gerar uma cópia sem revisão
+        if breaker.is_open():
+            retry_after = max(1, int(breaker.retry_after() + 0.5))
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "Azure OpenAI temporariamente indisponível. Tente novamente mais tarde.",
+                    "retry_after_seconds": retry_after
+                }),
+                status_code=503,
+                mimetype="application/json",
+                headers={"Retry-After": str(retry_after)}
+            )
         
-        return func.HttpResponse(
-            body=corrected_content,
-            status_code=200,
-            mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={
-                "Content-Disposition": f'attachment; filename="{corrected_filename}"'
-            }
+        # Capacidade já tomada pelo trabalho admitido: rejeitar antes de processar o documento
+        retry_after = admission.check_load()
+        if retry_after is not None:
+            logging.warning(f"Requisição rejeitada pelo controle de admissão (Retry-After: {retry_after}s)")
+            return overloaded_response(retry_after)
+        
+        # Estimar o trabalho do documento e decidir a admissão
+        extracted = await runtime.run_async(
+            docx_pool.run(extract_work_items, file_content, revision_mode["describe_images"])
         )
+        ir, images = extracted
+        estimate = estimate_document_work(ir, revision_mode["revise_text"], len(images),
+                                          PARAGRAPH_CHUNK_TOKENS, TABLE_REQUEST_TOKENS)
+        ticket, retry_after = admission.try_admit(estimate)
+        if ticket is None:
+            logging.warning(f"{filename} rejeitado pelo controle de admissão: {estimate.calls} chamada(s) "
+                            f"estimada(s), Retry-After: {retry_after}s")
+            return overloaded_response(retry_after, estimate)
+        
+        # Processar documento (dentro do orçamento de tempo, com prioridade sobre o Blob Trigger)
+        try:
+            corrected_content, report = await runtime.run_async(
+                in_lane(LANE_INTERACTIVE, revise_incremental(file_content, document_id, mode=revision_mode["name"],
+                                                             extracted=extracted, response_format=response_format))
+            )
+        finally:
+            admission.release(ticket)
+        report["estimate"] = estimate.to_dict()
+        logging.info(f"Documento processado com sucesso ({len(corrected_content)} bytes, status: {report['status']})")
+        
+        # Guardar resultados completos para reenvios do mesmo arquivo
+        if report["status"] == "complete" and report["degradation"] == LEVEL_NAMES[LEVEL_NORMAL]:
+            await store_cached_result(sha256, revision_mode["name"], corrected_content, report, response_format)
+        
+        # Retornar arquivo corrigido (relatório completo em /api/revision-report)
+        report_id = await publish_report(report)
+        return document_response(corrected_content, filename, report, "miss", response_format, report_id)
         
     except Exception as e:
         logging.error(f"Erro ao processar documento: {str(e)}", exc_info=True)
@@ -452,16 +1876,319 @@ def correct_document(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 
+# Intervalo (segundos) entre eventos de progresso do streaming
+STREAM_PROGRESS_SECONDS = float(os.environ.get("STREAM_PROGRESS_SECONDS", "5"))
+
+
+def result_event(content: bytes, report: Dict, response_format: str, cache_status: str) -> Dict:
+    """Evento final do streaming: relatório e o patch ou o .docx (base64)."""
+    event = {"event": "result", "format": response_format, "cache": cache_status, "report": report}
+    if response_format == RESPONSE_PATCH:
+        event["patch"] = json.loads(content)
+    else:
+        event["document"] = base64.b64encode(content).decode("ascii")
+    return event
+
+
+async def revision_events(file_content: Optional[bytes], filename: Optional[str], mode_name: Optional[str],
+                          document_id: Optional[str], format_name: Optional[str]) -> AsyncIterator[Dict]:
+    """
+    Eventos da revisão de um documento para /api/correct-document-stream (ver revision_stream).
+    
+    Mesmas validações, cache e controle de admissão de /api/correct-document:
+    uma rejeição sai como um único evento "error" com o status HTTP e, se
+    houver, o retry_after_seconds.
+    """
+    def error(status: int, message: str, **extra) -> Dict:
+        return {"event": "error", "status": status, "error": message, **extra}
+    
+    if not AZURE_OPENAI_ENDPOINT or not AZURE_OPENAI_API_KEY:
+        yield error(500, "Configuração do Azure OpenAI não encontrada. Verifique as variáveis de ambiente.")
+        return
+    if file_content is None or not filename:
+        yield error(400, "Nenhum arquivo foi enviado. Use o campo 'file' no multipart/form-data")
+        return
+    if not filename.lower().endswith('.docx'):
+        yield error(400, "Apenas arquivos .docx são suportados")
+        return
+    try:
+        revision_mode = resolve_mode(mode_name)
+        response_format = resolve_response_format(format_name)
+    except ValueError as e:
+        yield error(400, str(e))
+        return
+    logging.info(f"Streaming: {filename} ({len(file_content)} bytes, modo: {revision_mode['name']})")
+    
+    sha256 = document_hash(file_content)
+    cached = await lookup_cached_result(sha256, revision_mode["name"], response_format)
+    if cached is not None:
+        logging.info(f"♻️ {filename}: resultado em cache ({sha256[:12]})")
+        yield result_event(cached[0], cached[1], response_format, "hit")
+        return
+    
+    if breaker.is_open():
+        yield error(503, "Azure OpenAI temporariamente indisponível. Tente novamente mais tarde.",
+                    retry_after_seconds=max(1, int(breaker.retry_after() + 0.5)))
+        return
+    retry_after = admission.check_load()
+    if retry_after is not None:
+        yield error(429, "Capacidade de processamento esgotada no momento. Tente novamente mais tarde.",
+                    retry_after_seconds=retry_after)
+        return
+    
+    extracted = await runtime.run_async(
+        docx_pool.run(extract_work_items, file_content, revision_mode["describe_images"])
+    )
+    ir, images = extracted
+    estimate = estimate_document_work(ir, revision_mode["revise_text"], len(images),
+                                      PARAGRAPH_CHUNK_TOKENS, TABLE_REQUEST_TOKENS)
+    ticket, retry_after = admission.try_admit(estimate)
+    if ticket is None:
+        yield error(429, "Capacidade de processamento esgotada no momento. Tente novamente mais tarde.",
+                    retry_after_seconds=retry_after, estimate=estimate.to_dict())
+        return
+    
+    progress = RevisionProgress()
+    task = None
+    try:
+        yield {"event": "start", "mode": revision_mode["name"], "format": response_format,
+               "estimate": estimate.to_dict()}
+        task = asyncio.ensure_future(runtime.run_async(
+            in_lane(LANE_INTERACTIVE, revise_incremental(file_content, document_id, mode=revision_mode["name"],
+                                                         extracted=extracted, response_format=response_format,
+                                                         progress=progress))
+        ))
+        async for event in progress.events(task, STREAM_PROGRESS_SECONDS):
+            yield event
+        corrected_content, report = task.result()
+    except Exception as e:
+        logging.error(f"Erro ao processar documento: {str(e)}", exc_info=True)
+        yield error(500, f"Erro ao processar documento: {str(e)}")
+        return
+    finally:
+        # Cliente desconectado: a revisão deixa de ocupar o limitador
+        if task is not None and not task.done():
+            task.cancel()
+        admission.release(ticket)
+    report["estimate"] = estimate.to_dict()
+    
+    if report["status"] == "complete" and report["degradation"] == LEVEL_NAMES[LEVEL_NORMAL]:
+        await store_cached_result(sha256, revision_mode["name"], corrected_content, report, response_format)
+    yield result_event(corrected_content, report, response_format, "miss")
+
+
+async def first_event(events: AsyncIterator[Dict]) -> Tuple[Dict, int, Dict[str, str]]:
+    """Primeiro evento do streaming, com o status HTTP e os headers da resposta."""
+    event = await events.__anext__()
+    if event["event"] != "error":
+        return event, 200, {}
+    headers = {}
+    if "retry_after_seconds" in event:
+        headers["Retry-After"] = str(event["retry_after_seconds"])
+    return event, event["status"], headers
+
+
+if HTTP_STREAMING_AVAILABLE:
+    @app.route(route="correct-document-stream", auth_level=func.AuthLevel.FUNCTION, methods=["POST"])
+    async def correct_document_stream(req: StreamingRequest) -> StreamingResponse:
+        """
+        Variante de /api/correct-document com a resposta em NDJSON (uma linha JSON por evento).
+        
+        Endpoint: POST /api/correct-document-stream
+        Content-Type: multipart/form-data (mesmos campos: file, mode, document_id, format)
+        
+        Eventos:
+            - start: modo, formato e trabalho estimado
+            - segment: localizador e texto revisado de cada parágrafo/célula, assim que concluído
+            - image: descrição de cada imagem, assim que concluída
+            - progress: itens concluídos / total, a cada STREAM_PROGRESS_SECONDS
+            - result: relatório e o patch (format=patch) ou o .docx em base64
+            - error: status e mensagem (rejeições respondem com esse status HTTP e Retry-After)
+        
+        Com a extensão azurefunctions-extensions-http-fastapi os eventos saem à
+        medida que são produzidos; sem ela, todos saem juntos no fim.
+        """
+        form = await req.form()
+        upload = form.get("file")
+        file_content = await upload.read() if upload is not None and hasattr(upload, "read") else None
+        events = revision_events(
+            file_content, getattr(upload, "filename", None),
+            req.query_params.get('mode') or form.get('mode'),
+            req.query_params.get('document_id') or form.get('document_id'),
+            req.query_params.get('format') or form.get('format')
+        )
+        event, status_code, headers = await first_event(events)
+        
+        async def body():
+            yield encode_event(event)
+            async for later in events:
+                yield encode_event(later)
+        
+        return StreamingResponse(body(), status_code=status_code, media_type=NDJSON_MIMETYPE, headers=headers)
+else:
+    @app.route(route="correct-document-stream", auth_level=func.AuthLevel.FUNCTION, methods=["POST"])
+    async def correct_document_stream(req: func.HttpRequest) -> func.HttpResponse:
+        """Mesmo endpoint sem a extensão de streaming: os eventos NDJSON saem juntos, no fim."""
+        file = req.files.get('file')
+        events = revision_events(
+            file.read() if file else None, file.filename if file else None,
+            req.params.get('mode') or req.form.get('mode'),
+            req.params.get('document_id') or req.form.get('document_id'),
+            req.params.get('format') or req.form.get('format')
+        )
+        event, status_code, headers = await first_event(events)
+        lines = [encode_event(event)] + [encode_event(later) async for later in events]
+        return func.HttpResponse(b"".join(lines), status_code=status_code, mimetype=NDJSON_MIMETYPE,
+                                 headers=headers)
+
+
+@app.route(route="precheck", auth_level=func.AuthLevel.FUNCTION, methods=["GET"])
+async def precheck_document(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Consulta o cache de resultados pelo hash do arquivo, sem enviá-lo.
+    
+    Endpoint: GET /api/precheck?sha256=<hash>&mode=<modo>&filename=<nome>&format=<docx|patch>
+    
+    Retorna:
+        - 200 com o .docx corrigido ou o patch (mesmos headers de /api/correct-document)
+        - 404 {"cached": false} quando o arquivo precisa ser enviado
+    """
+    sha256 = (req.params.get('sha256') or "").lower()
+    if not is_document_hash(sha256):
+        return func.HttpResponse(
+            json.dumps({
+                "error": "Parâmetro 'sha256' inválido (esperado o SHA-256 do arquivo em hexadecimal)"
+            }),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    try:
+        revision_mode = resolve_mode(req.params.get('mode'))
+        response_format = resolve_response_format(req.params.get('format'))
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e)
+            }),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    cached = await lookup_cached_result(sha256, revision_mode["name"], response_format)
+    if cached is None:
+        return func.HttpResponse(
+            json.dumps({
+                "cached": False,
+                "sha256": sha256,
+                "mode": revision_mode["name"]
+            }),
+            status_code=404,
+            mimetype="application/json"
+        )
+    
+    filename = req.params.get('filename') or f"{sha256[:12]}.docx"
+    logging.info(f"♻️ Precheck: resultado em cache para {filename} ({sha256[:12]})")
+    return document_response(cached[0], filename, cached[1], "hit", response_format)
+
+
+@app.route(route="revision-report", auth_level=func.AuthLevel.FUNCTION, methods=["GET"])
+async def revision_report(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Relatório completo de uma revisão.
+    
+    Endpoint: GET /api/revision-report?id=<X-Revision-Report-Id>
+    
+    Retorna:
+        - 200 com o relatório JSON (tempo, estimativa, itens mantidos sem revisão por localizador)
+        - 404 quando o id não existe ou o relatório expirou com o cache de documentos
+    """
+    report_id = (req.params.get('id') or "").strip().lower()
+    if not re.fullmatch(r"[0-9a-f]{32}", report_id):
+        return func.HttpResponse(
+            json.dumps({
+                "error": "Parâmetro 'id' inválido: use o valor do header X-Revision-Report-Id"
+            }),
+            status_code=400,
+            mimetype="application/json"
+        )
+    
+    report = None
+    if document_cache is not None:
+        try:
+            report = await asyncio.to_thread(document_cache.get_record, report_record_key(report_id))
+        except Exception as e:
+            logging.warning(f"Erro ao ler o relatório {report_id}: {str(e)}")
+    if report is None:
+        return func.HttpResponse(
+            json.dumps({
+                "error": "Relatório não encontrado"
+            }),
+            status_code=404,
+            mimetype="application/json"
+        )
+    return func.HttpResponse(json.dumps(report, ensure_ascii=False), status_code=200, mimetype="application/json")
+
+
 @app.route(route="health", auth_level=func.AuthLevel.ANONYMOUS, methods=["GET"])
 def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """
     Endpoint de health check para verificar status da função.
+    
+    Com o circuito do Azure OpenAI aberto (ou em teste), ou com alguma faixa
+    em degradação, o status é "degraded".
     """
+    circuit = breaker.snapshot()
+    degradation = {lane: LEVEL_NAMES[ladder.level] for lane, ladder in ladders.items()}
+    healthy = circuit["state"] == "closed" and all(ladder.level == LEVEL_NORMAL for ladder in ladders.values())
     return func.HttpResponse(
         json.dumps({
-            "status": "healthy",
+            "status": "healthy" if healthy else "degraded",
             "service": "word-correction-function",
-            "azure_openai_configured": bool(AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY)
+            "azure_openai_configured": bool(AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY),
+            "circuit_breaker": circuit,
+            "degradation": degradation
+        }),
+        status_code=200,
+        mimetype="application/json"
+    )
+
+
+@app.route(route="metrics", auth_level=func.AuthLevel.FUNCTION, methods=["GET"])
+def metrics(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Endpoint de métricas de processamento desta instância.
+    
+    Retorna latência, tokens e custo estimado por tier (fast/full/vision), a
+    contagem de decisões de roteamento (para calibrar ROUTING_CONFIG), as
+    estatísticas de hedging e de coalescência de requisições, o makespan
+    previsto x real dos documentos, os lotes de imagens, o reaproveitamento de
+    descrições por hash perceptual, o estado do circuit breaker, a ocupação do
+    limitador de chamadas simultâneas (fila e espera por faixa), o controle de
+    admissão, o degrau de degradação por faixa, o cache de documentos, o
+    reaproveitamento de parágrafos quase duplicados, o uso do
+    pool de processos do .docx e os contadores do modo em massa.
+    """
+    return func.HttpResponse(
+        json.dumps({
+            "routing": {
+                "enabled": router.enabled,
+                "deployments": router.deployments,
+                **tier_metrics.snapshot()
+            },
+            "hedging": hedger.snapshot(),
+            "single_flight": single_flight.snapshot(),
+            "makespan": makespan.snapshot(),
+            "image_batching": dict(image_batch_stats, enabled=IMAGE_BATCH_ENABLED),
+            "image_reuse": image_index.snapshot() if image_index is not None else None,
+            "circuit_breaker": breaker.snapshot(),
+            "concurrency": limiter.snapshot(),
+            "admission": admission.snapshot(),
+            "degradation": {lane: ladder.snapshot() for lane, ladder in ladders.items()},
+            "document_cache": document_cache.snapshot() if document_cache is not None else None,
+            "near_duplicates": {name: index.snapshot() for name, index in near_duplicates.items()},
+            "docx_pool": docx_pool.snapshot(),
+            "bulk": bulk_processor.stats if bulk_processor is not None else None
         }),
         status_code=200,
         mimetype="application/json"
@@ -474,7 +2201,7 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
 @app.blob_output(arg_name="outputblob",
                  path="documentos/output/{name}",
                  connection="AzureWebJobsStorage")
-def blob_correct_document(inputblob: func.InputStream, outputblob: func.Out[bytes]) -> None:
+async def blob_correct_document(inputblob: func.InputStream, outputblob: func.Out[bytes]) -> None:
     """
     Blob Trigger: Processa automaticamente documentos Word quando carregados no container.
     
@@ -484,6 +2211,16 @@ def blob_correct_document(inputblob: func.InputStream, outputblob: func.Out[byte
     Exemplo:
     - Upload: documentos/input/documento.docx
     - Output: documentos/output/documento.docx (corrigido)
+    
+    O modo de revisão pode ser definido na metadata "mode" do blob
+    (pedagogical, spelling, text-only, images-only).
+    
+    Um novo upload com o mesmo nome é revisado de forma incremental: só os
+    parágrafos alterados desde a última revisão completa vão ao modelo.
+    
+    Com BLOB_BULK_MODE=true (ou metadata "priority" = "bulk") o documento só é
+    registrado para o modo em massa: o timer bulk_batch_timer o envia à Batch
+    API junto com os demais e grava a saída quando o batch terminar.
     """
     logging.info(f'🔔 Blob Trigger ativado!')
     logging.info(f'📄 Processando blob: {inputblob.name}')
@@ -500,20 +2237,91 @@ def blob_correct_document(inputblob: func.InputStream, outputblob: func.Out[byte
             logging.error("❌ Azure OpenAI não configurado!")
             return
         
+        metadata = getattr(inputblob, "metadata", None) or {}
+        
+        # Modo em massa: registrar o documento para o próximo batch
+        if bulk_processor is not None and (BLOB_BULK_MODE or metadata.get("priority") == "bulk"):
+            name = inputblob.name.split(f"{BLOB_CONTAINER}/input/", 1)[-1]
+            await runtime.run_async(bulk_processor.enqueue(name, metadata.get("mode")))
+            return
+        
+        # Azure OpenAI indisponível: aguardar um pouco e, se continuar aberto, devolver o
+        # blob ao host (a falha faz o runtime tentar o blob novamente mais tarde)
+        if breaker.is_open():
+            wait_seconds = min(breaker.retry_after(), CIRCUIT_BLOB_WAIT_SECONDS)
+            logging.warning(f'⛔ Circuito do Azure OpenAI aberto, aguardando {wait_seconds:.0f}s...')
+            await asyncio.sleep(wait_seconds)
+            if breaker.is_open():
+                raise CircuitOpenError(breaker.retry_after())
+        
+        # Modo de revisão via metadata do blob (inválido -> padrão)
+        mode_name = metadata.get("mode")
+        try:
+            revision_mode = resolve_mode(mode_name)
+        except ValueError as e:
+            logging.warning(f'⚠️ {str(e)} — usando modo padrão')
+            revision_mode = resolve_mode(None)
+        
         # Ler conteúdo do blob
         file_content = inputblob.read()
         logging.info(f'✅ Arquivo lido: {len(file_content)} bytes')
         
         # Processar documento
-        logging.info('⚙️ Iniciando processamento com Azure OpenAI...')
-        corrected_content = process_word_document(file_content)
+        logging.info(f"⚙️ Iniciando processamento com Azure OpenAI (modo: {revision_mode['name']})...")
+        # Faixa bulk: cede as vagas às requisições HTTP e reveza com os demais blobs
+        corrected_content, report = await runtime.run_async(
+            in_lane(LANE_BULK, revise_incremental(file_content, inputblob.name, mode=revision_mode["name"]),
+                    key=inputblob.name)
+        )
         
         # Escrever no blob de saída
         outputblob.set(corrected_content)
         
+        if report["status"] == "partial":
+            logging.warning(f'⏱️ Documento salvo parcialmente revisado: {json.dumps(report)}')
+        
         logging.info(f'✅ Documento processado com sucesso!')
         logging.info(f'📤 Salvo em: documentos/output/{inputblob.name.split("/")[-1]}')
         logging.info(f'📊 Tamanho final: {len(corrected_content)} bytes')
         
+    except CircuitOpenError:
+        # Propagar para o runtime tentar o blob novamente quando o circuito fechar
+        logging.error(f'⛔ Azure OpenAI indisponível, {inputblob.name} será reprocessado')
+        raise
     except Exception as e:
-        logging.error(f'❌ Erro ao processar {inputblob.name}: {str(e)}', exc_info=True)
\ No newline at end of file
+        logging.error(f'❌ Erro ao processar {inputblob.name}: {str(e)}', exc_info=True)
+
+
+@app.timer_trigger(arg_name="timer", schedule=BULK_BATCH_SCHEDULE, run_on_startup=False)
+async def bulk_batch_timer(timer: func.TimerRequest) -> None:
+    """
+    Timer do modo em massa: envia os documentos registrados à Batch API e
+    monta em 'documentos/output/' os documentos dos batches concluídos.
+    """
+    if bulk_processor is None:
+        return
+    
+    cycle = await runtime.run_async(bulk_processor.run_cycle())
+    if cycle["submitted"] or cycle["polled"]:
+        logging.info(f'📦 Modo em massa: {json.dumps(cycle)}')
+
+
+@app.route(route="bulk-status", auth_level=func.AuthLevel.FUNCTION, methods=["GET"])
+async def bulk_status(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Estado do modo em massa: documentos aguardando envio e jobs da Batch API.
+    """
+    if bulk_processor is None:
+        return func.HttpResponse(
+            json.dumps({
+                "error": "Modo em massa não configurado (AZURE_OPENAI_BATCH_DEPLOYMENT e AzureWebJobsStorage)"
+            }),
+            status_code=404,
+            mimetype="application/json"
+        )
+    
+    return func.HttpResponse(
+        json.dumps(await runtime.run_async(bulk_processor.list_jobs())),
+        status_code=200,
+        mimetype="application/json"
+    )
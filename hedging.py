@@ -0,0 +1,186 @@
+"""
+Requisições "hedged" para reduzir a latência de cauda das chamadas ao modelo.
+
+O tempo de um documento é ditado pelo parágrafo mais lento: algumas chamadas
+ao Azure OpenAI levam 5–10× a mediana enquanto o resto do documento já
+terminou. Com o hedging ativo, quando uma chamada passa do percentil
+configurado de latência do seu deployment (HEDGE_PERCENTILE), uma cópia é
+enviada — de preferência para outro backend — e a primeira resposta vence.
+
+Para não multiplicar o custo, as cópias são limitadas a uma fração das
+chamadas primárias (HEDGE_MAX_RATIO).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+# Amostras por chave mantidas para o cálculo do percentil
+LATENCY_WINDOW = 200
+
+
+class LatencyTracker:
+    """Janela deslizante de latências por chave (deployment:tier)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, key: str, latency: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self._window)).append(latency)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, fraction: float) -> Optional[float]:
+        """Percentil das latências observadas (None sem amostras)."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+        return samples[index]
+
+
+class HedgeBudget:
+    """Limita as cópias a uma fração das chamadas primárias (com pequena folga inicial)."""
+
+    def __init__(self, max_ratio: float, burst: int = 2):
+        self._lock = threading.Lock()
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.primary_calls = 0
+        self.hedges = 0
+
+    def record_primary(self):
+        with self._lock:
+            self.primary_calls += 1
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.primary_calls * self.max_ratio + self.burst:
+                return False
+            self.hedges += 1
+            return True
+
+
+class HedgedCaller:
+    """
+    Executa chamadas assíncronas com hedging opcional.
+
+    Uso:
+        await caller.call("gpt-4:full", primary=lambda: client.chat..., backup=lambda: ...)
+    """
+
+    def __init__(self, enabled: bool, percentile: float = 0.95, max_ratio: float = 0.1,
+                 min_samples: int = 20):
+        """
+        Args:
+            enabled: Ativa o hedging (desativado, a chamada primária roda direto)
+            percentile: Percentil de latência que dispara a cópia
+            max_ratio: Fração máxima de cópias em relação às chamadas primárias
+            min_samples: Amostras necessárias antes de disparar cópias para uma chave
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker()
+        self.budget = HedgeBudget(max_ratio)
+        self._lock = threading.Lock()
+        self.stats = {
+            "primary_calls": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+            "budget_denied": 0,
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Tempo de espera antes da cópia (None enquanto não há amostras suficientes)."""
+        if self.tracker.count(key) < self.min_samples:
+            return None
+        return self.tracker.percentile(key, self.percentile)
+
+    async def call(self, key: str, primary: Callable[[], Awaitable], backup: Optional[Callable[[], Awaitable]] = None,
+                   clock: Optional[Callable[[], float]] = None):
+        """
+        Executa `primary` e, se passar do percentil de latência, também `backup`.
+
+        Args:
+            key: Chave de latência (ex.: "gpt-4:full")
+            primary: Função que cria a corrotina da chamada primária
+            backup: Função que cria a corrotina da cópia (padrão: repetir `primary`)
+            clock: Relógio para medir latência (padrão: time.perf_counter)
+
+        Returns:
+            Resultado da primeira chamada concluída com sucesso
+        """
+        clock = clock or time.perf_counter
+
+        self.budget.record_primary()
+        self._count("primary_calls")
+
+        async def timed(fn: Callable[[], Awaitable], latency_key: str):
+            start = clock()
+            result = await fn()
+            self.tracker.record(latency_key, clock() - start)
+            return result
+
+        delay = self.hedge_delay(key) if self.enabled else None
+        if delay is None:
+            return await timed(primary, key)
+
+        primary_task = asyncio.ensure_future(timed(primary, key))
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done:
+                return primary_task.result()
+
+            if not self.budget.try_acquire():
+                self._count("budget_denied")
+                return await primary_task
+
+            self._count("hedges_sent")
+            logging.info(f"Hedging: chamada {key} passou de {delay:.1f}s, enviando cópia")
+            backup_task = asyncio.ensure_future(timed(backup or primary, f"{key}:hedge"))
+            return await self._first_success(primary_task, backup_task)
+        finally:
+            # asyncio.wait não cancela a chamada primária quando quem espera é
+            # cancelado; sem isso ela seguiria ocupando uma vaga do limitador
+            if not primary_task.done():
+                primary_task.cancel()
+
+    async def _first_success(self, primary_task: asyncio.Future, backup_task: asyncio.Future):
+        pending = {primary_task, backup_task}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup_task:
+                            self._count("hedges_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # A chamada perdedora é cancelada (a conexão HTTP é encerrada)
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["enabled"] = self.enabled
+        stats["percentile"] = self.percentile
+        stats["max_ratio"] = self.budget.max_ratio
+        return stats
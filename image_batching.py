@@ -0,0 +1,107 @@
+"""
+Descrição de várias imagens em uma única requisição de visão.
+
+Cada chamada de describe_image repetia o prompt de sistema inteiro para uma
+única imagem. Aqui as imagens de um documento são agrupadas em lotes
+limitados pelo custo estimado em tokens de imagem; cada imagem vai com seu
+id e o texto vizinho, e o modelo devolve um objeto JSON id -> descrição.
+Imagens que não voltarem na resposta são descritas individualmente.
+"""
+
+import io
+import math
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from PIL import Image
+
+from table_revision import load_json_object
+
+IMAGE_BATCH_JSON_INSTRUCTIONS = """
+
+FORMATO DE ENTRADA E SAÍDA (LOTE DE IMAGENS):
+Você receberá VÁRIAS imagens independentes. Cada imagem vem precedida de uma linha "IMAGEM <id>" e do contexto do documento em que aparece.
+Descreva cada imagem separadamente, seguindo todas as regras acima.
+Responda SOMENTE com um objeto JSON válido, sem texto antes ou depois, no formato:
+{"<id>": "Descrição da imagem: ...", "<id>": "Descrição da imagem: ..."}
+Use exatamente os ids recebidos e inclua todas as imagens."""
+
+# Custo de imagens em modo de detalhe alto: 85 tokens + 170 por bloco de 512px
+_BASE_TOKENS = 85
+_TILE_TOKENS = 170
+_DEFAULT_IMAGE_TOKENS = _BASE_TOKENS + 4 * _TILE_TOKENS
+
+
+def image_tokens(image_bytes: bytes) -> int:
+    """Tokens estimados de uma imagem enviada ao modelo de visão."""
+    try:
+        width, height = Image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        return _DEFAULT_IMAGE_TOKENS
+    # A imagem cabe em 2048x2048 e o menor lado é reduzido a 768px
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return _BASE_TOKENS + _TILE_TOKENS * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def pack_images(image_ids: Sequence[int], tokens: Callable[[int], int], max_tokens: int,
+                max_images: int) -> List[List[int]]:
+    """
+    Agrupa imagens em lotes limitados por tokens estimados e quantidade.
+
+    Uma imagem que sozinha excede o limite forma um lote próprio.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for image_id in image_ids:
+        cost = tokens(image_id)
+        if current and (len(current) >= max_images or current_tokens + cost > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(image_id)
+        current_tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_multi_image_content(entries: Sequence[Tuple[int, str, str]]) -> List[Dict]:
+    """
+    Conteúdo da mensagem do usuário para um lote.
+
+    Args:
+        entries: (id, data URL da imagem, contexto do documento) de cada imagem
+    """
+    content: List[Dict] = [{"type": "text", "text": "Descreva detalhadamente cada imagem a seguir de forma "
+                                                    "pedagógica e didática."}]
+    for image_id, url, context in entries:
+        header = f"IMAGEM {image_id}"
+        if context:
+            header += f"\nContexto do documento: {context}"
+        content.append({"type": "text", "text": header})
+        content.append({"type": "image_url", "image_url": {"url": url}})
+    return content
+
+
+def parse_multi_image_response(content: str, image_ids: Sequence[int]) -> Dict[int, str]:
+    """
+    Interpreta a resposta de um lote.
+
+    Returns:
+        Id da imagem -> descrição (imagens ausentes ou vazias ficam de fora)
+    """
+    data = load_json_object(content)
+    if not isinstance(data, dict):
+        return {}
+    descriptions = {}
+    for image_id in image_ids:
+        value = data.get(str(image_id))
+        if isinstance(value, str) and value.strip():
+            description = value.strip()
+            if not description.startswith("Descrição da imagem:"):
+                description = f"Descrição da imagem: {description}"
+            descriptions[image_id] = description
+    return descriptions
@@ -0,0 +1,175 @@
+"""
+Reaproveitamento de descrições de imagens por hash perceptual.
+
+A mesma figura aparece em vários documentos em resoluções diferentes ou
+reexportada como JPEG, e o hash dos bytes não a reconhece. Cada imagem
+descrita entra em um índice com dois hashes perceptuais de 64 bits:
+
+- dHash: gradiente horizontal da imagem reduzida a 9x8 em tons de cinza
+- pHash: sinal dos coeficientes de baixa frequência da DCT da imagem 32x32
+
+Uma imagem nova reaproveita a descrição de uma já descrita quando os dois
+hashes ficam a no máximo `max_distance` bits (distância de Hamming).
+A consulta não percorre o índice inteiro: o dHash é dividido em 8 faixas
+de 8 bits e, se a distância é menor que 8, pelo menos uma faixa coincide
+(princípio da casa dos pombos). Só as entradas que compartilham alguma
+faixa com a imagem nova são comparadas.
+Imagens quase uniformes (ícones, fundos) não são indexadas: qualquer uma
+teria o mesmo hash.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Desvio padrão mínimo dos tons de cinza para a imagem ter um hash útil
+_MIN_CONTRAST = 2.0
+
+# Faixas do dHash usadas como chaves dos baldes do índice
+_BANDS = 8
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Matriz da DCT-II ortonormal de ordem `size`."""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _grayscale(image: Image.Image) -> Image.Image:
+    # Transparência sobre fundo branco, como a imagem aparece no documento
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    return image.convert("L")
+
+
+def image_fingerprint(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Hashes perceptuais (dHash, pHash) de uma imagem.
+
+    Returns:
+        Tupla (dhash, phash) de 64 bits, ou None se a imagem não puder ser
+        lida ou for quase uniforme
+    """
+    try:
+        image = _grayscale(Image.open(io.BytesIO(image_bytes)))
+    except Exception:
+        return None
+
+    small = np.asarray(image.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    if small.std() < _MIN_CONTRAST:
+        return None
+
+    gradient = np.asarray(image.resize((9, 8), Image.LANCZOS), dtype=np.float64)
+    dhash = _bits_to_int(gradient[:, 1:] > gradient[:, :-1])
+
+    # Baixas frequências (8x8 do canto, sem o termo constante) comparadas à mediana
+    coefficients = (_DCT_32 @ small @ _DCT_32.T)[:8, :8].flatten()[1:]
+    phash = _bits_to_int(np.append(coefficients > np.median(coefficients), False))
+    return dhash, phash
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(dhash: int) -> List[Tuple[int, int]]:
+    return [(band, (dhash >> (band * _BAND_BITS)) & _BAND_MASK) for band in range(_BANDS)]
+
+
+class PerceptualImageIndex:
+    """Índice em memória de descrições de imagens por hash perceptual, com despejo do mais antigo."""
+
+    def __init__(self, max_distance: int = 6, capacity: int = 5000):
+        """
+        Args:
+            max_distance: Distância de Hamming máxima (em cada hash) para considerar a mesma figura
+            capacity: Imagens guardadas
+        """
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, fingerprint: Optional[Tuple[int, int]]) -> Optional[str]:
+        """Descrição da figura mais parecida dentro da distância máxima, ou None."""
+        if fingerprint is None:
+            return None
+        dhash, phash = fingerprint
+        with self._lock:
+            self.lookups += 1
+            best, best_distance = None, None
+            for key in self._candidates(dhash):
+                dhash_distance = hamming(dhash, key[0])
+                phash_distance = hamming(phash, key[1])
+                if dhash_distance > self.max_distance or phash_distance > self.max_distance:
+                    continue
+                distance = dhash_distance + phash_distance
+                # Empates decididos pela chave: o resultado não depende da ordem dos baldes
+                if best_distance is None or (distance, key) < (best_distance, best):
+                    best, best_distance = key, distance
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best]
+
+    def add(self, fingerprint: Optional[Tuple[int, int]], description: str):
+        if fingerprint is None:
+            return
+        with self._lock:
+            if fingerprint not in self._entries:
+                for band in _bands(fingerprint[0]):
+                    self._buckets.setdefault(band, set()).add(fingerprint)
+            self._entries[fingerprint] = description
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.capacity:
+                evicted, _ = self._entries.popitem(last=False)
+                for band in _bands(evicted[0]):
+                    bucket = self._buckets[band]
+                    bucket.discard(evicted)
+                    if not bucket:
+                        del self._buckets[band]
+
+    def _candidates(self, dhash: int):
+        """Entradas que podem estar dentro da distância máxima (chamado com o lock)."""
+        if self.max_distance >= _BANDS:
+            # Nenhuma faixa precisa coincidir: comparar com todas
+            return list(self._entries)
+        candidates: Set[Tuple[int, int]] = set()
+        for band in _bands(dhash):
+            candidates |= self._buckets.get(band, set())
+        return candidates
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "max_distance": self.max_distance,
+            }
@@ -0,0 +1,90 @@
+"""
+Revisão incremental entre versões do mesmo documento.
+
+Autores enviam v2, v3 e v4 da mesma apostila mudando poucos parágrafos, e
+cada versão era revisada inteira. Depois de cada revisão completa fica
+guardado um RevisionRecord: os textos originais dos segmentos (na ordem da
+IR), os textos revisados e as descrições das imagens (pelo hash da imagem).
+
+Na versão seguinte os segmentos são alinhados com os da anterior por um diff
+de sequência (difflib.SequenceMatcher sobre os textos): segmentos em blocos
+iguais reaproveitam o texto revisado anterior; só os inseridos ou alterados
+vão ao modelo. Imagens já descritas (mesmo conteúdo) reaproveitam a descrição.
+"""
+
+import hashlib
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+
+def image_key(image_bytes: bytes) -> str:
+    """Identificação de uma imagem pelo conteúdo."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class RevisionRecord:
+    """Resultado de uma revisão completa, guardado para a próxima versão."""
+
+    __slots__ = ("texts", "revised", "images")
+
+    def __init__(self, texts: List[str], revised: Dict[int, str], images: Dict[str, str]):
+        """
+        Args:
+            texts: Textos originais dos segmentos, na ordem da IR
+            revised: Id do segmento -> texto revisado (apenas os alterados pela revisão)
+            images: Hash da imagem -> descrição
+        """
+        self.texts = texts
+        self.revised = revised
+        self.images = images
+
+    def align(self, texts: List[str]) -> Dict[int, str]:
+        """
+        Alinha os segmentos de uma nova versão com os desta.
+
+        Returns:
+            Id do segmento na nova versão -> texto revisado reaproveitado
+            (o próprio texto quando a revisão anterior não o alterou)
+        """
+        matcher = SequenceMatcher(None, self.texts, texts, autojunk=False)
+        reused: Dict[int, str] = {}
+        for tag, old_start, old_end, new_start, _ in matcher.get_opcodes():
+            if tag != "equal":
+                continue
+            for offset in range(old_end - old_start):
+                old_segment = old_start + offset
+                reused[new_start + offset] = self.revised.get(old_segment, self.texts[old_segment])
+        return reused
+
+    def to_dict(self) -> Dict:
+        return {
+            "texts": self.texts,
+            "revised": {str(segment): text for segment, text in self.revised.items()},
+            "images": self.images,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RevisionRecord":
+        return cls(
+            list(data["texts"]),
+            {int(segment): text for segment, text in data["revised"].items()},
+            dict(data.get("images", {})),
+        )
+
+
+class IncrementalRevision:
+    """
+    Estado da revisão incremental de um documento.
+
+    `previous` é o registro da versão anterior (None = primeira versão); ao
+    final de revise_document, `record` guarda o registro desta versão e
+    `stats` o que foi reaproveitado.
+    """
+
+    def __init__(self, previous: Optional[RevisionRecord] = None):
+        self.previous = previous
+        self.record: Optional[RevisionRecord] = None
+        self.stats = {"segments_reused": 0, "segments_revised": 0, "images_reused": 0}
+
+    def report(self) -> Dict:
+        return dict(self.stats, base_version=self.previous is not None)
@@ -0,0 +1,222 @@
+"""
+Roteamento automático de itens de trabalho entre deployments "fast" e "full".
+
+Títulos curtos, itens de lista e frases isoladas são revisados tão bem por um
+modelo menor quanto pelo GPT-4; enviá-los ao deployment rápido reduz
+latência e custo. A decisão usa apenas características locais do texto:
+
+- tamanho estimado em tokens e número de frases
+- estilo do parágrafo (título/lista)
+- presença de alternativas de questão, que exigem o marcador
+  <<ALT_CORRETA_INICIO>>/<<ALT_CORRETA_FIM>> e ficam sempre no modelo completo
+
+Latência, tokens e custo de cada tier são registrados em TierMetrics para
+calibrar os limites abaixo.
+"""
+
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+from text_chunking import estimate_tokens, split_sentences
+
+TIER_FAST = "fast"
+TIER_FULL = "full"
+TIER_VISION = "vision"
+
+# Limites de roteamento (ajustáveis por variável de ambiente)
+ROUTING_CONFIG = {
+    "fast_max_tokens": int(os.environ.get("ROUTING_FAST_MAX_TOKENS", "60")),
+    "fast_max_sentences": int(os.environ.get("ROUTING_FAST_MAX_SENTENCES", "2")),
+    "heading_max_tokens": int(os.environ.get("ROUTING_HEADING_MAX_TOKENS", "40")),
+    "list_max_tokens": int(os.environ.get("ROUTING_LIST_MAX_TOKENS", "120")),
+}
+
+# Preço por 1K tokens (entrada, saída) de cada tier, usado só para estimar custo
+TIER_PRICING = {
+    TIER_FULL: (
+        float(os.environ.get("AZURE_OPENAI_FULL_INPUT_PRICE", "0.03")),
+        float(os.environ.get("AZURE_OPENAI_FULL_OUTPUT_PRICE", "0.06")),
+    ),
+    TIER_FAST: (
+        float(os.environ.get("AZURE_OPENAI_FAST_INPUT_PRICE", "0.00015")),
+        float(os.environ.get("AZURE_OPENAI_FAST_OUTPUT_PRICE", "0.0006")),
+    ),
+}
+TIER_PRICING[TIER_VISION] = TIER_PRICING[TIER_FULL]
+
+# Linhas como "a) ...", "B. ...", "(c) ..." indicam alternativas de questão
+_ALTERNATIVE_LINE = re.compile(r'(?m)^\s*\(?[a-eA-E][\).]\s+\S')
+_QUESTION_HINTS = re.compile(r'\b(assinale|alternativa correta|marque a (?:opção|alternativa))\b', re.IGNORECASE)
+
+
+def has_question_alternatives(text: str) -> bool:
+    """Detecta questões de múltipla escolha (exigem marcação da alternativa correta)."""
+    return len(_ALTERNATIVE_LINE.findall(text)) >= 2 or bool(_QUESTION_HINTS.search(text))
+
+
+def _is_heading(style_name: Optional[str]) -> bool:
+    if not style_name:
+        return False
+    name = style_name.lower()
+    return name.startswith(("heading", "título", "titulo", "title", "subtitle", "subtítulo"))
+
+
+def _is_list(style_name: Optional[str]) -> bool:
+    if not style_name:
+        return False
+    name = style_name.lower()
+    return "list" in name or "lista" in name
+
+
+class ModelRouter:
+    """
+    Decide o tier (fast/full) de cada item e resolve o deployment correspondente.
+
+    Sem AZURE_OPENAI_DEPLOYMENT_FAST configurado, tudo vai para o deployment
+    completo (comportamento original).
+    """
+
+    def __init__(self, full_deployment: str, fast_deployment: Optional[str] = None,
+                 config: Optional[Dict] = None):
+        self.deployments = {
+            TIER_FULL: full_deployment,
+            TIER_FAST: fast_deployment or full_deployment,
+            TIER_VISION: full_deployment,
+        }
+        self.enabled = bool(fast_deployment) and fast_deployment != full_deployment
+        self.config = {**ROUTING_CONFIG, **(config or {})}
+
+    def deployment_for(self, tier: str) -> str:
+        return self.deployments.get(tier, self.deployments[TIER_FULL])
+
+    def classify(self, text: str, style_name: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Classifica um item de texto.
+
+        Args:
+            text: Texto do parágrafo/bloco
+            style_name: Nome do estilo do parágrafo (ex.: "Heading 1", "List Bullet")
+
+        Returns:
+            Tupla (tier, motivo) — o motivo é registrado para calibragem
+        """
+        if not self.enabled:
+            return TIER_FULL, "routing_disabled"
+
+        if has_question_alternatives(text):
+            return TIER_FULL, "question_alternatives"
+
+        tokens = estimate_tokens(text)
+        if _is_heading(style_name) and tokens <= self.config["heading_max_tokens"]:
+            return TIER_FAST, "heading"
+        if _is_list(style_name) and tokens <= self.config["list_max_tokens"]:
+            return TIER_FAST, "list_item"
+        if tokens <= self.config["fast_max_tokens"] and \
+                len(split_sentences(text)) <= self.config["fast_max_sentences"]:
+            return TIER_FAST, "short_text"
+        return TIER_FULL, "long_text"
+
+    def classify_many(self, texts: Iterable[str], reason: str = "table_cells") -> Tuple[str, str]:
+        """
+        Classifica um lote (células de tabela, parágrafos empacotados).
+
+        O lote só vai ao tier rápido se todos os itens passarem nos limites de
+        texto curto de `classify`; qualquer questão força o tier completo.
+
+        Args:
+            texts: Textos dos itens do lote
+            reason: Motivo registrado quando o lote vai ao tier rápido
+        """
+        if not self.enabled:
+            return TIER_FULL, "routing_disabled"
+        long_text = False
+        for text in texts:
+            if has_question_alternatives(text):
+                return TIER_FULL, "question_alternatives"
+            if not long_text:
+                long_text = estimate_tokens(text) > self.config["fast_max_tokens"] or \
+                    len(split_sentences(text)) > self.config["fast_max_sentences"]
+        if long_text:
+            return TIER_FULL, "long_text"
+        return TIER_FAST, reason
+
+
+class TierMetrics:
+    """Latência, tokens e custo estimado por tier (thread-safe)."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._tiers: Dict[str, Dict] = {}
+        self._reasons: Dict[str, int] = {}
+
+    def _tier(self, tier: str) -> Dict:
+        if tier not in self._tiers:
+            self._tiers[tier] = {
+                "calls": 0,
+                "errors": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost_usd": 0.0,
+                "latency_total": 0.0,
+                "latencies": deque(maxlen=self._window),
+            }
+        return self._tiers[tier]
+
+    def record_decision(self, tier: str, reason: str):
+        with self._lock:
+            key = f"{tier}:{reason}"
+            self._reasons[key] = self._reasons.get(key, 0) + 1
+
+    def record(self, tier: str, latency: float, usage=None, error: bool = False):
+        """
+        Registra uma chamada ao modelo.
+
+        Args:
+            tier: Tier usado na chamada
+            latency: Duração em segundos
+            usage: Objeto `usage` da resposta (prompt_tokens/completion_tokens)
+            error: True se a chamada falhou
+        """
+        with self._lock:
+            stats = self._tier(tier)
+            stats["calls"] += 1
+            stats["latency_total"] += latency
+            stats["latencies"].append(latency)
+            if error:
+                stats["errors"] += 1
+            if usage is not None:
+                prompt = getattr(usage, "prompt_tokens", 0) or 0
+                completion = getattr(usage, "completion_tokens", 0) or 0
+                input_price, output_price = TIER_PRICING.get(tier, TIER_PRICING[TIER_FULL])
+                stats["prompt_tokens"] += prompt
+                stats["completion_tokens"] += completion
+                stats["cost_usd"] += prompt / 1000 * input_price + completion / 1000 * output_price
+
+    def snapshot(self) -> Dict:
+        """Retorna estatísticas agregadas por tier e contagem de decisões."""
+        with self._lock:
+            tiers = {}
+            for tier, stats in self._tiers.items():
+                latencies = sorted(stats["latencies"])
+                tiers[tier] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "completion_tokens": stats["completion_tokens"],
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "latency_avg": round(stats["latency_total"] / max(stats["calls"], 1), 3),
+                    "latency_p50": round(_percentile(latencies, 0.50), 3),
+                    "latency_p95": round(_percentile(latencies, 0.95), 3),
+                }
+            return {"tiers": tiers, "decisions": dict(self._reasons)}
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,272 @@
+"""
+Índice de parágrafos quase duplicados (MinHash + LSH).
+
+Textos padronizados do catálogo de cursos (cabeçalhos, orientações de
+atividade, avisos) se repetem entre documentos com pequenas diferenças: uma
+data, o nome do curso, a pontuação. O cache por hash não os reconhece, e cada
+ocorrência voltava ao modelo.
+
+Cada parágrafo revisado entra no índice com a assinatura MinHash dos seus
+shingles (5-gramas de caracteres do texto normalizado: minúsculas, dígitos
+como 0, sem pontuação). Um parágrafo novo consulta as faixas do LSH, e os
+candidatos são confirmados pela similaridade de Jaccard exata dos shingles.
+
+A assinatura é calculada com numpy (todas as permutações sobre todos os
+shingles de uma vez) e fora da trava do índice, assim como a transferência
+da revisão: a trava cobre apenas a consulta às faixas e a atualização.
+
+Um parágrafo encontrado é:
+- exact: igual ao já revisado, reaproveita a revisão
+- trivial: difere só em números/pontuação fora dos trechos alterados pela
+  revisão anterior; a revisão anterior é reaplicada sobre o texto novo
+  (merge por palavras), sem chamada ao modelo
+- similar: vai ao modelo com o prompt curto de "aplicar a revisão conhecida"
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from text_chunking import estimate_tokens
+
+MATCH_EXACT = "exact"
+MATCH_TRIVIAL = "trivial"
+MATCH_SIMILAR = "similar"
+
+# Primo das permutações: a * x + b (x = crc32, até 32 bits) cabe em uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+_SHINGLE_SIZE = 5
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]+|\s+")
+_LETTER_PATTERN = re.compile(r"[^\W\d_]")
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]+")
+_DIGIT_PATTERN = re.compile(r"\d")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Texto usado nos shingles: minúsculas, dígitos como 0, sem pontuação."""
+    text = _DIGIT_PATTERN.sub("0", text.lower())
+    text = _PUNCTUATION_PATTERN.sub(" ", text)
+    return _SPACE_PATTERN.sub(" ", text).strip()
+
+
+def shingles(text: str) -> FrozenSet[int]:
+    """Hashes dos 5-gramas de caracteres do texto normalizado."""
+    normalized = normalize_text(text)
+    if len(normalized) <= _SHINGLE_SIZE:
+        return frozenset([zlib.crc32(normalized.encode("utf-8"))])
+    return frozenset(
+        zlib.crc32(normalized[i:i + _SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(normalized) - _SHINGLE_SIZE + 1)
+    )
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _is_trivial_token(token: str) -> bool:
+    return not _LETTER_PATTERN.search(token)
+
+
+def _changes(old: List[str], new: List[str]) -> List[Tuple[int, int, List[str]]]:
+    """Trechos de `old` substituídos em `new`: (início, fim, tokens novos)."""
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    return [(i1, i2, new[j1:j2]) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def transfer_revision(original: str, revised: str, text: str) -> Optional[str]:
+    """
+    Reaplica a revisão `original` -> `revised` sobre `text`.
+
+    Só funciona quando `text` difere de `original` apenas em números e
+    pontuação, e essas diferenças não tocam os trechos alterados pela revisão.
+
+    Returns:
+        Texto revisado, ou None quando a transferência não é segura
+    """
+    old = _TOKEN_PATTERN.findall(original)
+    text_changes = _changes(old, _TOKEN_PATTERN.findall(text))
+    for _, _, tokens in text_changes:
+        if not all(_is_trivial_token(token) for token in tokens):
+            return None
+    for start, end, _ in text_changes:
+        if not all(_is_trivial_token(token) for token in old[start:end]):
+            return None
+
+    revision_changes = _changes(old, _TOKEN_PATTERN.findall(revised))
+    for start, end, _ in text_changes:
+        for revision_start, revision_end, _ in revision_changes:
+            # Trechos que se sobrepõem ou se encostam: conflito
+            if start <= revision_end and revision_start <= end:
+                return None
+
+    merged: List[str] = []
+    position = 0
+    for start, end, tokens in sorted(text_changes + revision_changes, key=lambda change: change[0]):
+        merged.extend(old[position:start])
+        merged.extend(tokens)
+        position = end
+    merged.extend(old[position:])
+    return "".join(merged)
+
+
+class NearDuplicateMatch:
+    """Parágrafo já revisado encontrado para um texto novo."""
+
+    __slots__ = ("kind", "original", "revised", "similarity", "reusable")
+
+    def __init__(self, kind: str, original: str, revised: str, similarity: float, reusable: Optional[str]):
+        """
+        Args:
+            kind: exact, trivial ou similar
+            original: Texto original do parágrafo já revisado
+            revised: Revisão desse parágrafo
+            similarity: Similaridade de Jaccard dos shingles
+            reusable: Texto revisado pronto para uso (exact e trivial), senão None
+        """
+        self.kind = kind
+        self.original = original
+        self.revised = revised
+        self.similarity = similarity
+        self.reusable = reusable
+
+
+class _Entry:
+    __slots__ = ("original", "revised", "shingles", "bands")
+
+    def __init__(self, original: str, revised: str, shingle_set: FrozenSet[int], bands: List[Tuple]):
+        self.original = original
+        self.revised = revised
+        self.shingles = shingle_set
+        self.bands = bands
+
+
+class NearDuplicateIndex:
+    """
+    Índice em memória de parágrafos revisados, com despejo do mais antigo.
+
+    Um índice por modo de revisão: revisões de modos diferentes não se misturam.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, rows: int = 4,
+                 capacity: int = 5000, min_chars: int = 40, seed: int = 42):
+        """
+        Args:
+            threshold: Similaridade de Jaccard mínima para aceitar um candidato
+            num_perm: Permutações da assinatura MinHash
+            rows: Linhas por faixa do LSH (num_perm / rows faixas)
+            capacity: Parágrafos guardados
+            min_chars: Tamanho mínimo do texto (textos curtos geram falsos positivos)
+            seed: Semente das permutações
+        """
+        self.threshold = threshold
+        self.rows = rows
+        self.bands_count = num_perm // rows
+        self.capacity = capacity
+        self.min_chars = min_chars
+        rng = np.random.default_rng(seed)
+        permutations = self.bands_count * rows
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(permutations, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(permutations, 1), dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, set] = {}
+        self.stats = {
+            "lookups": 0, "exact": 0, "trivial": 0, "similar": 0,
+            "applied": 0, "apply_failed": 0, "calls_saved": 0, "tokens_saved": 0,
+        }
+
+    def _bands(self, shingle_set: FrozenSet[int]) -> List[Tuple]:
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        signature = ((self._a * values + self._b) % _MERSENNE_PRIME).min(axis=1)
+        rows = signature.reshape(self.bands_count, self.rows).tolist()
+        return [(band, tuple(rows[band])) for band in range(self.bands_count)]
+
+    def lookup(self, text: str) -> Optional[NearDuplicateMatch]:
+        """Parágrafo revisado mais parecido com `text` acima do limiar, ou None."""
+        if len(text.strip()) < self.min_chars:
+            return None
+        with self._lock:
+            self.stats["lookups"] += 1
+            entry = self._entries.get(text)
+            if entry is not None:
+                self._entries.move_to_end(text)
+                self.stats["exact"] += 1
+                self._record_saved(text)
+                return NearDuplicateMatch(MATCH_EXACT, entry.original, entry.revised, 1.0, entry.revised)
+            if not self._entries:
+                return None
+
+        shingle_set = shingles(text)
+        bands = self._bands(shingle_set)
+        with self._lock:
+            candidates = set()
+            for band in bands:
+                candidates.update(self._buckets.get(band, ()))
+            entries = [self._entries[original] for original in candidates]
+        best, best_similarity = None, 0.0
+        for candidate in entries:
+            similarity = jaccard(shingle_set, candidate.shingles)
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < self.threshold:
+            return None
+
+        reusable = transfer_revision(best.original, best.revised, text)
+        with self._lock:
+            if reusable is not None:
+                self.stats["trivial"] += 1
+                self._record_saved(text)
+                return NearDuplicateMatch(MATCH_TRIVIAL, best.original, best.revised, best_similarity, reusable)
+            self.stats["similar"] += 1
+            return NearDuplicateMatch(MATCH_SIMILAR, best.original, best.revised, best_similarity, None)
+
+    def _record_saved(self, text: str):
+        self.stats["calls_saved"] += 1
+        self.stats["tokens_saved"] += estimate_tokens(text) * 2
+
+    def record_applied(self, success: bool):
+        """Resultado do prompt de "aplicar a revisão conhecida" para um match similar."""
+        with self._lock:
+            self.stats["applied" if success else "apply_failed"] += 1
+
+    def revision_for(self, original: str) -> Optional[str]:
+        """Revisão guardada para exatamente este texto, ou None."""
+        with self._lock:
+            entry = self._entries.get(original)
+            return entry.revised if entry is not None else None
+
+    def add(self, original: str, revised: str):
+        if len(original.strip()) < self.min_chars:
+            return
+        shingle_set = shingles(original)
+        bands = self._bands(shingle_set)
+        with self._lock:
+            if original in self._entries:
+                self._remove(original)
+            self._entries[original] = _Entry(original, revised, shingle_set, bands)
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(original)
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, original: str):
+        entry = self._entries.pop(original)
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(original)
+                if not bucket:
+                    del self._buckets[band]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), threshold=self.threshold)
@@ -8,11 +8,21 @@ Melhorias:
 - Tratamento de timeout
 """
 
+import io
 import logging
 from typing import List, Dict
+from docx import Document
 from openai import AzureOpenAI
 import hashlib
 
+from document_ir import apply_revisions, extract_document_ir
+
+
+# Prompt curto de correção ortográfica (também usado pelo modo "spelling" do function_app)
+SPELLING_SYSTEM_PROMPT = """Você é um corretor ortográfico profissional em português.
+Corrija erros ortográficos, gramaticais e elimine redundâncias.
+Retorne APENAS o texto corrigido, sem explicações."""
+
 
 class OptimizedDocumentProcessor:
     """
@@ -66,14 +76,10 @@ class OptimizedDocumentProcessor:
                 return self.correction_cache[text_hash]
         
         try:
-            system_prompt = """Você é um corretor ortográfico profissional em português.
-Corrija erros ortográficos, gramaticais e elimine redundâncias.
-Retorne APENAS o texto corrigido, sem explicações."""
-
             response = self.client.chat.completions.create(
                 model=self.deployment,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": SPELLING_SYSTEM_PROMPT},
                     {"role": "user", "content": f"Corrija:\n\n{text}"}
                 ],
                 temperature=0.3,
@@ -151,6 +157,53 @@ Não adicione explicações, apenas os textos corrigidos."""
             # Fallback para processamento individual
             return [self.process_text(t) for t in texts]
     
+    def process_document(self, file_content: bytes, small_paragraph_threshold: int = 200) -> bytes:
+        """
+        Corrige um documento Word inteiro a partir da sua IR (ver document_ir).
+        
+        Segmentos pequenos (parágrafos e células) são corrigidos em lotes de
+        `batch_size`; os maiores, individualmente.
+        
+        Args:
+            file_content: Conteúdo binário do documento Word
+            small_paragraph_threshold: Tamanho (caracteres) abaixo do qual o segmento vai para um lote
+            
+        Returns:
+            Conteúdo binário do documento corrigido
+        """
+        doc = Document(io.BytesIO(file_content))
+        ir = extract_document_ir(doc, include_images=False)
+        revised: Dict[int, str] = {}
+        batch: List[int] = []
+        
+        def flush_batch():
+            corrected = self.process_batch([ir.texts[segment] for segment in batch])
+            for segment, text in zip(batch, corrected):
+                if text and text != ir.texts[segment]:
+                    revised[segment] = text
+            batch.clear()
+        
+        for segment, text in enumerate(ir.texts):
+            if len(text) < small_paragraph_threshold:
+                batch.append(segment)
+                if len(batch) >= self.batch_size:
+                    flush_batch()
+            else:
+                corrected = self.process_text(text)
+                if corrected != text:
+                    revised[segment] = corrected
+            log_processing_progress(segment + 1, len(ir), self.stats)
+        
+        if batch:
+            flush_batch()
+        
+        apply_revisions(doc, ir, revised)
+        logging.info(f"Estatísticas: {self.get_statistics()}")
+        
+        output_stream = io.BytesIO()
+        doc.save(output_stream)
+        return output_stream.getvalue()
+    
     def get_statistics(self) -> Dict:
         """Retorna estatísticas do processamento."""
         return {
@@ -179,31 +232,8 @@ def create_optimized_processor(client: AzureOpenAI, deployment: str) -> Optimize
     processor = create_optimized_processor(client, AZURE_OPENAI_DEPLOYMENT)
     
     def process_word_document(file_content: bytes) -> bytes:
-        doc = Document(io.BytesIO(file_content))
-        
-        # Coletar parágrafos para processamento em batch
-        batch = []
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                if len(paragraph.text) < 200:  # Parágrafos pequenos em batch
-                    batch.append(paragraph.text)
-                    if len(batch) >= 5:  # Processar batch
-                        corrected = processor.process_batch(batch)
-                        # Aplicar correções...
-                        batch = []
-                else:  # Parágrafos grandes individualmente
-                    corrected = processor.process_text(paragraph.text)
-                    # Aplicar correção...
-        
-        # Processar batch restante
-        if batch:
-            corrected = processor.process_batch(batch)
-        
-        # Estatísticas
-        stats = processor.get_statistics()
-        logging.info(f"Estatísticas: {stats}")
-        
-        return doc_bytes
+        # Extrai a IR, corrige em lotes e aplica as correções no documento
+        return processor.process_document(file_content)
     ```
     """
     return OptimizedDocumentProcessor(client, deployment)
@@ -0,0 +1,405 @@
+"""
+Estratégias de revisão dos segmentos de texto de um documento.
+
+O laço de revisão era fixo no function_app. Aqui ele vira um "engine"
+escolhido por configuração (REVISION_ENGINE), com a mesma entrada (itens da
+IR) e as mesmas estatísticas em todas as estratégias, para que possam ser
+comparadas no mesmo documento:
+
+- sequential: um item por vez (referência)
+- concurrent: todos os itens ao mesmo tempo, limitados pelo limitador do worker
+- batched: parágrafos pequenos agrupados em uma requisição JSON por lote
+  (LARGE_DOCUMENT_CONFIG: batch_size, small_paragraph_threshold)
+- batch_api: itens enviados à Azure OpenAI Batch API (arquivo JSONL);
+  os que não voltarem dentro do prazo são revisados diretamente
+
+Com longest_first (padrão), os itens são despachados do maior para o menor
+(ver scheduling): um parágrafo enorme não fica para o fim do documento.
+
+As chamadas ao modelo ficam no function_app: o engine recebe um "reviser"
+com os métodos abaixo e só decide como os itens são agrupados e despachados.
+
+    async prepare(items)                       consultas em lote antes do despacho (ex.: quase-duplicatas)
+    async revise_item(item) -> str             revisa um item (pode levantar DispatchBlockedError
+                                               ou RevisionFailedError)
+    async revise_packed(items) -> {seg: texto}  revisa um lote em uma requisição
+    mark_blocked(item, reason)                 registra item não revisado (não despachado ou com falha)
+    batch_request(item) -> dict                corpo da requisição para a Batch API
+    parse_batch_content(item, content) -> str  texto revisado a partir da resposta do batch
+    deadline                                   prazo do documento (DocumentDeadline ou None)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from batch_api import STATUS_COMPLETED, TERMINAL_STATUSES, build_batch_line
+from deadline import DispatchBlockedError, RevisionFailedError
+from optimized_processor import LARGE_DOCUMENT_CONFIG
+from scheduling import longest_first
+from table_revision import load_json_object
+from text_chunking import estimate_tokens
+
+ENGINE_SEQUENTIAL = "sequential"
+ENGINE_CONCURRENT = "concurrent"
+ENGINE_BATCHED = "batched"
+ENGINE_BATCH_API = "batch_api"
+DEFAULT_ENGINE = ENGINE_CONCURRENT
+
+# Configuração dos engines: LARGE_DOCUMENT_CONFIG com ajustes por variável de ambiente
+ENGINE_CONFIG = {
+    **LARGE_DOCUMENT_CONFIG,
+    "batch_size": int(os.environ.get("REVISION_BATCH_SIZE", LARGE_DOCUMENT_CONFIG["batch_size"])),
+    "small_paragraph_threshold": int(os.environ.get(
+        "REVISION_SMALL_PARAGRAPH_THRESHOLD", LARGE_DOCUMENT_CONFIG["small_paragraph_threshold"])),
+    "use_cache": os.environ.get(
+        "REVISION_USE_CACHE", str(LARGE_DOCUMENT_CONFIG["use_cache"])).lower() == "true",
+    "batch_token_limit": int(os.environ.get("REVISION_BATCH_TOKEN_LIMIT", "1500")),
+    "batch_api_poll_seconds": float(os.environ.get("BATCH_API_POLL_SECONDS", "30")),
+    "longest_first": os.environ.get("REVISION_LONGEST_FIRST", "true").lower() == "true",
+}
+
+PACKED_JSON_INSTRUCTIONS = """
+
+FORMATO DE ENTRADA E SAÍDA (LOTE):
+Você receberá VÁRIOS parágrafos independentes como um objeto JSON, cada um identificado por uma chave numérica.
+- Revise cada parágrafo individualmente, seguindo todas as regras acima.
+- NÃO junte, divida, remova ou reordene parágrafos.
+- Devolva SOMENTE um objeto JSON válido com EXATAMENTE as mesmas chaves e o texto revisado de cada parágrafo como valor."""
+
+
+class RevisionItem:
+    """Segmento de texto a revisar (ver DocumentIR)."""
+
+    __slots__ = ("segment", "locator", "text", "style")
+
+    def __init__(self, segment: int, locator, text: str, style: Optional[str] = None):
+        self.segment = segment
+        self.locator = locator
+        self.text = text
+        self.style = style
+
+
+def build_packed_payload(items: List[RevisionItem]) -> str:
+    """Serializa um lote de itens no JSON enviado ao modelo."""
+    return json.dumps({str(item.segment): item.text for item in items}, ensure_ascii=False)
+
+
+def parse_packed_response(content: str, items: List[RevisionItem]) -> Dict[int, str]:
+    """
+    Interpreta a resposta de um lote.
+
+    Returns:
+        Id do segmento -> texto revisado (itens ausentes ou inválidos ficam de fora)
+    """
+    data = load_json_object(content)
+    if not isinstance(data, dict):
+        return {}
+    revised = {}
+    for item in items:
+        value = data.get(str(item.segment))
+        if isinstance(value, str) and value.strip():
+            revised[item.segment] = value.strip()
+    return revised
+
+
+class EngineStats:
+    """Estatísticas padronizadas de uma execução de engine."""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.items = 0
+        self.unique_items = 0
+        self.requests = 0
+        self.changed = 0
+        self.blocked = 0
+        self.failed = 0
+        self.fallbacks = 0
+        self.started_at = time.perf_counter()
+        self.elapsed_seconds = 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            "engine": self.engine,
+            "items": self.items,
+            "unique_items": self.unique_items,
+            "requests": self.requests,
+            "items_per_request": round(self.unique_items / max(self.requests, 1), 2),
+            "changed": self.changed,
+            "blocked": self.blocked,
+            "failed": self.failed,
+            "fallbacks": self.fallbacks,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+class RevisionEngine:
+    """
+    Base dos engines.
+
+    `revise` deduplica textos idênticos (use_cache), delega o despacho a
+    `_revise_unique` e devolve apenas os segmentos alterados.
+    """
+
+    name = "base"
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {**ENGINE_CONFIG, **(config or {})}
+        self.stats = EngineStats(self.name)
+
+    async def revise(self, items: List[RevisionItem], reviser) -> Dict[int, str]:
+        """
+        Revisa os itens.
+
+        Returns:
+            Id do segmento -> texto revisado, apenas dos itens alterados
+        """
+        self.stats = EngineStats(self.name)
+        self.stats.items = len(items)
+
+        # Textos repetidos (cabeçalhos, rodapés, instruções) são revisados uma vez
+        groups: Dict[str, List[RevisionItem]] = {}
+        if self.config["use_cache"]:
+            for item in items:
+                groups.setdefault(item.text, []).append(item)
+            unique = [group[0] for group in groups.values()]
+        else:
+            unique = list(items)
+        if self.config["longest_first"]:
+            unique = longest_first(unique, lambda item: estimate_tokens(item.text))
+        self.stats.unique_items = len(unique)
+
+        # Sem esperas por item antes do limitador: os itens chegam a ele na ordem acima
+        await reviser.prepare(unique)
+        revised = await self._revise_unique(unique, reviser)
+
+        result: Dict[int, str] = {}
+        for representative in unique:
+            text = revised.get(representative.segment)
+            if text is None or text == representative.text:
+                continue
+            for item in groups.get(representative.text, [representative]):
+                result[item.segment] = text
+        self.stats.changed = len(result)
+        self.stats.elapsed_seconds = time.perf_counter() - self.stats.started_at
+        return result
+
+    async def _revise_unique(self, items: List[RevisionItem], reviser) -> Dict[int, str]:
+        raise NotImplementedError
+
+    async def _revise_one(self, item: RevisionItem, reviser) -> Optional[str]:
+        self.stats.requests += 1
+        try:
+            return await reviser.revise_item(item)
+        except DispatchBlockedError as e:
+            self.stats.blocked += 1
+            reviser.mark_blocked(item, e.reason)
+            return None
+        except RevisionFailedError as e:
+            self.stats.failed += 1
+            reviser.mark_blocked(item, e.reason)
+            return None
+
+
+class SequentialEngine(RevisionEngine):
+    """Um item por vez, na ordem do documento."""
+
+    name = ENGINE_SEQUENTIAL
+
+    async def _revise_unique(self, items, reviser):
+        revised = {}
+        for item in items:
+            text = await self._revise_one(item, reviser)
+            if text is not None:
+                revised[item.segment] = text
+        return revised
+
+
+class ConcurrentEngine(RevisionEngine):
+    """Todos os itens despachados ao mesmo tempo (o limitador do worker controla a concorrência)."""
+
+    name = ENGINE_CONCURRENT
+
+    async def _revise_unique(self, items, reviser):
+        texts = await asyncio.gather(*(self._revise_one(item, reviser) for item in items))
+        return {item.segment: text for item, text in zip(items, texts) if text is not None}
+
+
+class BatchedEngine(RevisionEngine):
+    """
+    Parágrafos pequenos agrupados em requisições JSON; os grandes vão sozinhos.
+
+    Lotes limitados por batch_size itens e batch_token_limit tokens. Itens que
+    não voltarem na resposta do lote são revisados individualmente.
+    """
+
+    name = ENGINE_BATCHED
+
+    def pack(self, items: List[RevisionItem]):
+        """Separa os itens em lotes de pequenos e itens individuais."""
+        threshold = self.config["small_paragraph_threshold"]
+        batch_size = max(1, self.config["batch_size"])
+        token_limit = self.config["batch_token_limit"]
+
+        batches: List[List[RevisionItem]] = []
+        singles: List[RevisionItem] = []
+        current: List[RevisionItem] = []
+        current_tokens = 0
+        for item in items:
+            if len(item.text) >= threshold:
+                singles.append(item)
+                continue
+            tokens = estimate_tokens(item.text)
+            if current and (len(current) >= batch_size or current_tokens + tokens > token_limit):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches, singles
+
+    async def _revise_batch(self, batch: List[RevisionItem], reviser) -> Dict[int, str]:
+        if len(batch) == 1:
+            text = await self._revise_one(batch[0], reviser)
+            return {} if text is None else {batch[0].segment: text}
+
+        self.stats.requests += 1
+        try:
+            revised = await reviser.revise_packed(batch)
+        except DispatchBlockedError as e:
+            self.stats.blocked += len(batch)
+            for item in batch:
+                reviser.mark_blocked(item, e.reason)
+            return {}
+
+        missing = [item for item in batch if item.segment not in revised]
+        if missing:
+            self.stats.fallbacks += len(missing)
+            logging.warning(f"Lote: {len(missing)} de {len(batch)} parágrafos sem resposta válida")
+            texts = await asyncio.gather(*(self._revise_one(item, reviser) for item in missing))
+            revised.update({item.segment: text for item, text in zip(missing, texts) if text is not None})
+        return revised
+
+    async def _revise_unique(self, items, reviser):
+        batches, singles = self.pack(items)
+        requests = batches + [[item] for item in singles]
+        if self.config["longest_first"]:
+            requests = longest_first(requests, lambda batch: sum(estimate_tokens(item.text) for item in batch))
+        results = await asyncio.gather(*(self._revise_batch(batch, reviser) for batch in requests))
+        revised = {}
+        for result in results:
+            revised.update(result)
+        return revised
+
+
+class BatchApiEngine(RevisionEngine):
+    """
+    Itens enviados à Azure OpenAI Batch API e aguardados por até `timeout` segundos.
+
+    Adequado a processamento sem urgência; o que não voltar a tempo (ou voltar
+    com erro) é revisado com chamadas diretas. A espera também termina quando
+    o prazo do documento só cobre mais essas chamadas diretas, e falhas do
+    backend (envio ou consulta) levam direto às chamadas diretas.
+    """
+
+    name = ENGINE_BATCH_API
+
+    def __init__(self, backend, config: Optional[Dict] = None, sleep=asyncio.sleep):
+        """
+        Args:
+            backend: Backend da Batch API (ver batch_api.AzureBatchBackend)
+            config: Ajustes sobre ENGINE_CONFIG
+            sleep: Função de espera entre consultas de status (injetável)
+        """
+        super().__init__(config)
+        self.backend = backend
+        self._sleep = sleep
+
+    async def _revise_unique(self, items, reviser):
+        if not items:
+            return {}
+        by_id = {str(item.segment): item for item in items}
+        lines = [build_batch_line(custom_id, reviser.batch_request(item)) for custom_id, item in by_id.items()]
+        self.stats.requests += 1
+
+        results: Dict[str, Dict] = {}
+        try:
+            batch_id = await self.backend.submit(lines)
+        except Exception as e:
+            logging.warning(f"Erro ao enviar o batch ({str(e)}), revisando com chamadas diretas")
+        else:
+            results = await self._wait_results(batch_id, getattr(reviser, "deadline", None))
+
+        revised = {}
+        missing = []
+        for custom_id, item in by_id.items():
+            result = results.get(custom_id)
+            if result and result.get("content"):
+                revised[item.segment] = reviser.parse_batch_content(item, result["content"])
+            else:
+                missing.append(item)
+
+        if missing:
+            self.stats.fallbacks += len(missing)
+            texts = await asyncio.gather(*(self._revise_one(item, reviser) for item in missing))
+            revised.update({item.segment: text for item, text in zip(missing, texts) if text is not None})
+        return revised
+
+    async def _wait_results(self, batch_id: str, deadline) -> Dict[str, Dict]:
+        """Resultados do batch, ou {} se ele não terminar a tempo ou o backend falhar (batch cancelado)."""
+        waited = 0.0
+        poll_seconds = self.config["batch_api_poll_seconds"]
+        try:
+            while True:
+                status = await self.backend.status(batch_id)
+                if status["status"] in TERMINAL_STATUSES:
+                    if status["status"] == STATUS_COMPLETED:
+                        return await self.backend.results(batch_id)
+                    logging.warning(f"Batch {batch_id} terminou com status {status['status']}")
+                    return {}
+                if waited >= self.config["timeout"]:
+                    logging.warning(f"Batch {batch_id} não terminou em {self.config['timeout']}s, cancelando")
+                    break
+                # Prazo do documento: depois da próxima espera ainda precisa caber uma chamada direta
+                if deadline is not None and deadline.remaining() - poll_seconds < deadline.estimated_call_seconds:
+                    logging.warning(f"Batch {batch_id} não terminou dentro do prazo do documento, cancelando")
+                    break
+                await self._sleep(poll_seconds)
+                waited += poll_seconds
+        except Exception as e:
+            logging.warning(f"Erro ao consultar o batch {batch_id} ({str(e)}), revisando com chamadas diretas")
+        try:
+            await self.backend.cancel(batch_id)
+        except Exception as e:
+            logging.warning(f"Não foi possível cancelar o batch {batch_id}: {str(e)}")
+        return {}
+
+
+ENGINES = {
+    ENGINE_SEQUENTIAL: SequentialEngine,
+    ENGINE_CONCURRENT: ConcurrentEngine,
+    ENGINE_BATCHED: BatchedEngine,
+    ENGINE_BATCH_API: BatchApiEngine,
+}
+
+
+def create_engine(name: Optional[str] = None, batch_backend=None, config: Optional[Dict] = None) -> RevisionEngine:
+    """
+    Cria o engine pelo nome.
+
+    Raises:
+        ValueError: Engine desconhecido, ou batch_api sem backend configurado
+    """
+    name = (name or DEFAULT_ENGINE).strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"Engine de revisão inválido: '{name}'. Use: {', '.join(ENGINES)}")
+    if name == ENGINE_BATCH_API:
+        if batch_backend is None:
+            raise ValueError("Engine batch_api requer AZURE_OPENAI_BATCH_DEPLOYMENT configurado")
+        return BatchApiEngine(batch_backend, config)
+    return ENGINES[name](config)
@@ -0,0 +1,153 @@
+"""
+Modos de revisão selecionáveis pelo usuário.
+
+Cada modo define o prompt, a temperatura, o limite de tokens e quais etapas
+do pipeline rodam (revisão de texto, descrição de imagens). O modo é
+informado no parâmetro `mode` de /api/correct-document ou na metadata
+`mode` do blob enviado para documentos/input/.
+
+Modos:
+- pedagogical: revisão pedagógica completa SENAC + descrição de imagens (padrão)
+- spelling: apenas correção ortográfica/gramatical com o prompt curto
+- text-only: revisão pedagógica do texto, sem descrição de imagens
+- images-only: apenas descrição de imagens, texto preservado
+"""
+
+from typing import Dict, Optional
+
+from optimized_processor import SPELLING_SYSTEM_PROMPT
+from text_chunking import estimate_tokens
+
+# Prompt de revisão pedagógica SENAC/SC
+PEDAGOGICAL_SYSTEM_PROMPT = """Você é revisor pedagógico do SENAC/SC.
+
+OBJETIVO:
+Entregar o texto revisado, didático e padronizado, pronto para publicação.
+O texto deve soar como uma AULA, em tom explicativo e próximo ao aluno, quase como uma conversa.
+Use linguagem dialógica e interações leves ("Você sabia…?", "Reflita…", "Agora pense…", "Vamos entender…") para engajar o aluno.
+Devolva exclusivamente o texto revisado, sem qualquer comentário, explicação, preâmbulo ou cabeçalho extra.
+
+REGRAS OBRIGATÓRIAS:
+0) PROIBIDO qualquer meta-texto/comentário fora do conteúdo (ex.: "Segue o texto...", "O texto foi revisado...").
+0a) PROIBIDO inserir placeholders como "..." ou "(continua...)". NUNCA encerre com frase incompleta.
+1) MODO CÓPIA MELHORADA: mantenha as frases próximas do original. Corrija ortografia, gramática, pontuação, concordância e coesão.
+   PORÉM, MELHORE a linguagem para ser mais dialógica e pedagógica, sem reescrita total.
+2) Simplifique linguagem técnica mantendo precisão. Explique termos complexos em linguagem acessível.
+3) Use TOM CONVERSACIONAL como em aula: 1ª pessoa do plural ("vamos", "veremos"), perguntas retóricas, interações.
+4) PARÁGRAFOS CURTOS: divida parágrafos longos em parágrafos menores (máximo 5-6 linhas cada).
+5) FRASES CLARAS: divida frases muito longas em frases mais curtas e diretas.
+6) INSIRA nomes fictícios para empresas, pessoas, instituições quando aplicável (ex: "Empresa TechSolutions", "João Silva").
+   Mantenha o MESMO nome fictício em todo o texto.
+7) Preserve estrutura, ordem, exemplos, tabelas, listas.
+8) Padronize títulos/subtítulos em CAIXA ALTA quando forem cabeçalhos principais.
+9) TERMOS TÉCNICOS: simplifique ou explique brevemente quando aparecerem pela primeira vez.
+10) PALAVRAS ESTRANGEIRAS: coloque em itálico (retorne com marcador *palavra* para indicar itálico).
+11) REMOVA linguagem excessivamente formal ou acadêmica.
+12) ADICIONE pequenos elementos pedagógicos quando natural: "Observe que...", "Note que...", "É importante destacar...".
+13) TOKENS DE MÍDIA ([[FIG1]], [[TAB1]], [[SA1]]): PRESERVE EXATAMENTE onde estão. NUNCA remova, renomeie ou mova.
+14) NÃO remova citações, autores, anos, referências bibliográficas.
+15) MANTENHA o comprimento similar ao original - não resuma nem encurte drasticamente.
+16) NÃO use markdown (##, **, __, ---).
+17) ALTERNATIVAS DE QUESTÕES: se detectar questões de múltipla escolha, identifique a alternativa correta e envolva
+    APENAS A LINHA DA ALTERNATIVA com <<ALT_CORRETA_INICIO>> texto da alternativa <<ALT_CORRETA_FIM>>.
+
+IMPORTANTE: Retorne SOMENTE o texto revisado. Sem comentários, sem explicações, sem preâmbulos."""
+
+
+MODE_PEDAGOGICAL = "pedagogical"
+MODE_SPELLING = "spelling"
+MODE_TEXT_ONLY = "text-only"
+MODE_IMAGES_ONLY = "images-only"
+
+DEFAULT_MODE = MODE_PEDAGOGICAL
+
+REVISION_MODES: Dict[str, Dict] = {
+    MODE_PEDAGOGICAL: {
+        "name": MODE_PEDAGOGICAL,
+        "system_prompt": PEDAGOGICAL_SYSTEM_PROMPT,
+        "user_template": "TEXTO ORIGINAL:\n{text}",
+        "temperature": 0.4,  # Permite mais criatividade pedagógica
+        "max_tokens": 6000,
+        "output_ratio": None,  # Reescrita pode alongar o texto: usa sempre max_tokens
+        "revise_text": True,
+        "describe_images": True,
+    },
+    MODE_SPELLING: {
+        "name": MODE_SPELLING,
+        "system_prompt": SPELLING_SYSTEM_PROMPT,
+        "user_template": "Corrija:\n\n{text}",
+        "temperature": 0.1,
+        "max_tokens": 4000,
+        "output_ratio": 1.3,  # Correção mantém o tamanho do original
+        "revise_text": True,
+        "describe_images": False,
+    },
+    MODE_TEXT_ONLY: {
+        "name": MODE_TEXT_ONLY,
+        "system_prompt": PEDAGOGICAL_SYSTEM_PROMPT,
+        "user_template": "TEXTO ORIGINAL:\n{text}",
+        "temperature": 0.4,
+        "max_tokens": 6000,
+        "output_ratio": None,
+        "revise_text": True,
+        "describe_images": False,
+    },
+    MODE_IMAGES_ONLY: {
+        "name": MODE_IMAGES_ONLY,
+        "system_prompt": PEDAGOGICAL_SYSTEM_PROMPT,
+        "user_template": "TEXTO ORIGINAL:\n{text}",
+        "temperature": 0.4,
+        "max_tokens": 6000,
+        "output_ratio": None,
+        "revise_text": False,
+        "describe_images": True,
+    },
+}
+
+# Nomes alternativos aceitos na API/metadata
+MODE_ALIASES = {
+    "pedagogico": MODE_PEDAGOGICAL,
+    "pedagógico": MODE_PEDAGOGICAL,
+    "ortografia": MODE_SPELLING,
+    "spelling-only": MODE_SPELLING,
+    "texto": MODE_TEXT_ONLY,
+    "text": MODE_TEXT_ONLY,
+    "imagens": MODE_IMAGES_ONLY,
+    "images": MODE_IMAGES_ONLY,
+}
+
+
+def resolve_mode(name: Optional[str]) -> Dict:
+    """
+    Resolve o nome de um modo para sua configuração.
+
+    Args:
+        name: Nome do modo (None/vazio = modo padrão)
+
+    Returns:
+        Dicionário de configuração do modo
+
+    Raises:
+        ValueError: Se o modo não existir
+    """
+    if not name or not name.strip():
+        return REVISION_MODES[DEFAULT_MODE]
+    key = name.strip().lower()
+    key = MODE_ALIASES.get(key, key)
+    if key not in REVISION_MODES:
+        raise ValueError(
+            f"Modo de revisão inválido: '{name}'. Use um de: {', '.join(REVISION_MODES)}"
+        )
+    return REVISION_MODES[key]
+
+
+def mode_max_tokens(mode: Dict, text: str, extra: int = 64) -> int:
+    """
+    Limite de tokens de saída para um texto no modo informado.
+
+    Modos de correção pura limitam a saída ao tamanho do original (com folga),
+    o que reduz latência quando o modelo se alonga desnecessariamente.
+    """
+    if mode["output_ratio"] is None:
+        return mode["max_tokens"]
+    return min(mode["max_tokens"], int(estimate_tokens(text) * mode["output_ratio"]) + extra)
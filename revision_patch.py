@@ -0,0 +1,116 @@
+"""
+Resposta compacta da revisão: um patch JSON em vez do .docx inteiro.
+
+Em documentos com muitas imagens o pacote revisado tem vários MB, embora só
+o texto tenha mudado; em conexões lentas o download demorava mais que a
+revisão. O patch leva apenas:
+
+- segments: localizador de cada segmento alterado (ver DocumentIR.locator),
+  texto original e texto revisado com os marcadores de formatação
+- images: id da imagem, parágrafo em que ela está e a descrição inserida
+
+O cliente reconstrói o .docx revisado aplicando o patch ao arquivo original
+que ele mesmo enviou (apply_patch), com a mesma aplicação usada no servidor
+(document_ir.apply_revisions).
+"""
+
+import io
+import json
+import logging
+from typing import Dict, Iterable, Tuple
+
+from docx import Document
+
+from document_cache import document_hash
+from document_ir import DocumentIR, apply_revisions, extract_document_ir
+
+PATCH_FORMAT = "docx-revision-patch"
+PATCH_VERSION = 1
+PATCH_MIMETYPE = "application/json"
+
+
+class PatchMismatchError(ValueError):
+    """O patch foi gerado para outro arquivo."""
+
+
+def build_patch(ir: DocumentIR, revised: Dict[int, str], image_descriptions: Iterable[Tuple[int, str]],
+                source_sha256: str) -> Dict:
+    """
+    Patch com os segmentos alterados e as descrições de imagem de uma revisão.
+
+    Args:
+        ir: IR extraída do documento original
+        revised: Id do segmento -> texto revisado (com marcadores)
+        image_descriptions: [(id da imagem, descrição)]
+        source_sha256: SHA-256 do arquivo original
+    """
+    return {
+        "format": PATCH_FORMAT,
+        "version": PATCH_VERSION,
+        "source_sha256": source_sha256,
+        "segments": [
+            {"locator": ir.locator(segment), "original": ir.texts[segment], "revised": text}
+            for segment, text in sorted(revised.items())
+            if text and text != ir.texts[segment]
+        ],
+        "images": [
+            {"image": image_id, "paragraph": ir.image_paragraphs[image_id], "description": description}
+            for image_id, description in sorted(image_descriptions)
+        ],
+    }
+
+
+def encode_patch(patch: Dict) -> bytes:
+    return json.dumps(patch, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def apply_patch(file_content: bytes, patch: Dict, verify_source: bool = True) -> Tuple[bytes, Dict]:
+    """
+    Reconstrói o .docx revisado a partir do original e do patch.
+
+    Segmentos e imagens cujo localizador não confere com o documento (texto
+    ou parágrafo diferente) são ignorados e contados em `skipped`.
+
+    Args:
+        file_content: Conteúdo binário do documento original
+        patch: Patch devolvido por /api/correct-document com format=patch
+        verify_source: Exigir que o SHA-256 do arquivo seja o do patch
+
+    Returns:
+        Tupla (conteúdo do documento revisado, {"applied", "images", "skipped"})
+
+    Raises:
+        PatchMismatchError: patch de outro formato ou de outro arquivo
+    """
+    if patch.get("format") != PATCH_FORMAT or patch.get("version") != PATCH_VERSION:
+        raise PatchMismatchError(f"Formato de patch não suportado: {patch.get('format')} v{patch.get('version')}")
+    if verify_source and patch.get("source_sha256") != document_hash(file_content):
+        raise PatchMismatchError("O patch foi gerado para outro arquivo (SHA-256 diferente)")
+
+    doc = Document(io.BytesIO(file_content))
+    ir = extract_document_ir(doc)
+    segments = {ir.locator(segment): segment for segment in range(len(ir))}
+    skipped = 0
+
+    revised: Dict[int, str] = {}
+    for entry in patch.get("segments", []):
+        segment = segments.get(entry["locator"])
+        if segment is None or ir.texts[segment] != entry["original"]:
+            logging.warning(f"Segmento {entry['locator']} do patch não confere com o documento, ignorado")
+            skipped += 1
+            continue
+        revised[segment] = entry["revised"]
+
+    image_descriptions = []
+    for entry in patch.get("images", []):
+        image_id = entry["image"]
+        if image_id >= len(ir.image_paragraphs) or ir.image_paragraphs[image_id] != entry["paragraph"]:
+            logging.warning(f"Imagem {image_id} do patch não confere com o documento, ignorada")
+            skipped += 1
+            continue
+        image_descriptions.append((image_id, entry["description"]))
+
+    applied = apply_revisions(doc, ir, revised, image_descriptions)
+    output_stream = io.BytesIO()
+    doc.save(output_stream)
+    return output_stream.getvalue(), {"applied": applied, "images": len(image_descriptions), "skipped": skipped}
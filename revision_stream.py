@@ -0,0 +1,94 @@
+"""
+Eventos NDJSON da revisão de um documento em andamento.
+
+O cliente não recebia nada até o documento inteiro ser salvo. Com o
+streaming (/api/correct-document-stream), cada parágrafo revisado e cada
+descrição de imagem sai assim que termina, uma linha JSON por evento:
+
+    {"event": "start", ...}
+    {"event": "segment", "locator": "p:12", "revised": "..."}
+    {"event": "image", "image": 0, "paragraph": 5, "description": "..."}
+    {"event": "progress", "done": 40, "total": 120, "elapsed_seconds": 5.0}
+    {"event": "result", "format": "docx" | "patch", "report": {...}, ...}
+
+ou {"event": "error", "status": ..., "error": "..."}.
+
+A revisão roda no loop compartilhado (async_runtime) e a resposta HTTP no
+loop do worker: RevisionProgress entrega os eventos ao loop de quem a criou
+com call_soon_threadsafe. O contador de itens concluídos também só é
+alterado nesse loop.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Optional
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+_DONE = object()
+
+
+def encode_event(event: Dict) -> bytes:
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class RevisionProgress:
+    """Eventos de uma revisão, produzidos em qualquer thread e consumidos no loop que criou o objeto."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.started_at = time.perf_counter()
+        self.total = 0
+        self.done = 0
+
+    def _emit(self, event: Optional[Dict]):
+        """Item concluído (com ou sem evento), entregue ao loop consumidor."""
+        self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Optional[Dict]):
+        self.done += 1
+        if event is not None:
+            self._queue.put_nowait(event)
+
+    def start(self, total: int):
+        """Itens de trabalho do documento (segmentos de texto e imagens)."""
+        self.total = total
+
+    def segment(self, locator: str, original: str, revised: str):
+        """Segmento concluído; só os alterados geram evento."""
+        changed = bool(revised) and revised != original
+        self._emit({"event": "segment", "locator": locator, "revised": revised} if changed else None)
+
+    def image(self, image_id: int, paragraph: int, description: str):
+        self._emit({"event": "image", "image": image_id, "paragraph": paragraph, "description": description})
+
+    def progress_event(self) -> Dict:
+        return {
+            "event": "progress",
+            "done": self.done,
+            "total": self.total,
+            "elapsed_seconds": round(time.perf_counter() - self.started_at, 1),
+        }
+
+    async def events(self, task: asyncio.Future, interval: float) -> AsyncIterator[Dict]:
+        """
+        Eventos até `task` (a revisão) terminar, com um evento de progresso a cada `interval` segundos.
+
+        O resultado (ou a exceção) da revisão fica em `task`.
+        """
+        task.add_done_callback(lambda _: self._queue.put_nowait(_DONE))
+        next_progress = time.perf_counter() + interval
+        while True:
+            timeout = max(0.0, next_progress - time.perf_counter())
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                next_progress = time.perf_counter() + interval
+                yield self.progress_event()
+                continue
+            if event is _DONE:
+                yield self.progress_event()
+                return
+            yield event
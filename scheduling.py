@@ -0,0 +1,88 @@
+"""
+Ordem de despacho dos itens de um documento (longest-processing-time-first).
+
+Com despacho concorrente, a ordem importa: um parágrafo enorme ou uma imagem
+enviada por último atrasa o documento em toda a sua duração depois que o
+resto terminou. Os itens são despachados do mais caro para o mais barato
+(LPT), com o custo estimado por tokens (texto) e tamanho (imagem).
+
+O makespan previsto (simulação LPT nas vagas do limitador) e o real de cada
+documento ficam registrados no MakespanTracker para calibrar o CostModel.
+"""
+
+import heapq
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class CostModel:
+    """Duração estimada de uma chamada ao modelo."""
+
+    def __init__(self, call_seconds: float = 1.0, seconds_per_token: float = 0.02,
+                 image_seconds: float = 4.0, seconds_per_image_mb: float = 2.0):
+        """
+        Args:
+            call_seconds: Custo fixo de uma chamada de texto
+            seconds_per_token: Segundos por token do texto (a saída tem tamanho parecido com a entrada)
+            image_seconds: Custo fixo de uma descrição de imagem
+            seconds_per_image_mb: Segundos adicionais por MB de imagem
+        """
+        self.call_seconds = call_seconds
+        self.seconds_per_token = seconds_per_token
+        self.image_seconds = image_seconds
+        self.seconds_per_image_mb = seconds_per_image_mb
+
+    def text_seconds(self, tokens: int) -> float:
+        return self.call_seconds + tokens * self.seconds_per_token
+
+    def image_seconds_for(self, size_bytes: int) -> float:
+        return self.image_seconds + size_bytes / (1024 * 1024) * self.seconds_per_image_mb
+
+
+def longest_first(items: Iterable[T], cost: Callable[[T], float]) -> List[T]:
+    """Itens do mais caro para o mais barato (empates mantêm a ordem original)."""
+    return sorted(items, key=cost, reverse=True)
+
+
+def lpt_makespan(durations: Iterable[float], slots: int) -> float:
+    """Makespan da distribuição LPT das durações em `slots` vagas."""
+    loads = [0.0] * max(1, slots)
+    for duration in sorted(durations, reverse=True):
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
+
+
+class MakespanTracker:
+    """Makespan previsto x real dos últimos documentos."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.documents = 0
+
+    def record(self, predicted: float, actual: float):
+        with self._lock:
+            self._samples.append((predicted, actual))
+            self.documents += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = list(self._samples)
+        ratios = sorted(actual / predicted for predicted, actual in samples if predicted > 0)
+        return {
+            "documents": self.documents,
+            "samples": len(samples),
+            # > 1: documentos demoram mais que o previsto (aumentar o CostModel)
+            "ratio_mean": round(sum(ratios) / len(ratios), 3) if ratios else None,
+            "ratio_median": round(ratios[len(ratios) // 2], 3) if ratios else None,
+            "mean_abs_error_seconds": round(
+                sum(abs(actual - predicted) for predicted, actual in samples) / len(samples), 2
+            ) if samples else None,
+            "last": [
+                {"predicted_seconds": round(predicted, 2), "actual_seconds": round(actual, 2)}
+                for predicted, actual in samples[-5:]
+            ],
+        }
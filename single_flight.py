@@ -0,0 +1,102 @@
+"""
+Coalescência de requisições idênticas em andamento (single-flight).
+
+Documentos do mesmo curso processados ao mesmo tempo têm parágrafos iguais
+(cabeçalhos, avisos, instruções de "Atividade") que iam ao modelo em paralelo
+antes de qualquer cache existir. Aqui a primeira requisição de uma chave faz
+a chamada (líder) e as demais com a mesma chave, enquanto ela estiver em
+andamento, aguardam o mesmo resultado.
+
+O resultado fica em um concurrent.futures.Future, então a espera funciona
+entre threads e event loops do mesmo processo. Se o líder falhar ou for
+cancelado, cada seguidor faz a própria chamada (a falha pode ser do prazo do
+documento do líder, não da requisição).
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderFailed(Exception):
+    """O líder não obteve resultado; o seguidor deve chamar por conta própria."""
+
+
+def request_key(*parts: Any) -> str:
+    """Chave de uma requisição a partir dos seus parâmetros (serializáveis em JSON)."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class SingleFlight:
+    """Uma chamada em andamento por chave; chamadas concorrentes compartilham o resultado."""
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: False para chamar sempre (sem coalescência)
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flights: Dict[str, concurrent.futures.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.fallbacks = 0
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executa `call()` ou aguarda a chamada em andamento com a mesma chave.
+
+        Args:
+            key: Chave da requisição (ver request_key)
+            call: Fábrica da corrotina que faz a chamada
+        """
+        if not self.enabled:
+            return await call()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = concurrent.futures.Future()
+                self._flights[key] = flight
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            try:
+                # shield: o cancelamento de um seguidor não cancela o resultado compartilhado
+                return await asyncio.shield(asyncio.wrap_future(flight))
+            except _LeaderFailed:
+                with self._lock:
+                    self.fallbacks += 1
+                return await call()
+
+        try:
+            result = await call()
+        except BaseException:
+            flight.set_exception(_LeaderFailed())
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._flights),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "fallbacks": self.fallbacks,
+            }
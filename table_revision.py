@@ -0,0 +1,140 @@
+"""
+Revisão de tabelas inteiras como grade estruturada.
+
+Em vez de enviar cada parágrafo de cada célula em uma chamada separada, a
+tabela é extraída como uma grade de células únicas (células mescladas aparecem
+uma única vez, identificadas pelo elemento `_tc`; ver
+document_ir.iter_unique_cells) e enviada em poucas requisições JSON, com
+chaves no formato "linha,coluna".
+
+Exemplo de payload enviado ao modelo:
+
+    {"0,0": ["Critério"], "0,1": ["Descrição"], "1,1": ["A precisão esta boa", "Segundo parágrafo"]}
+
+A resposta deve conter as mesmas chaves, com listas do mesmo tamanho.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional
+
+from text_chunking import estimate_tokens
+
+TABLE_JSON_INSTRUCTIONS = """
+
+FORMATO DE ENTRADA E SAÍDA (TABELA):
+Você receberá o conteúdo de uma TABELA como um objeto JSON.
+Cada chave identifica uma célula no formato "linha,coluna" e cada valor é a lista de parágrafos dessa célula.
+- Revise cada parágrafo individualmente, mantendo o texto CONCISO, próprio de uma célula de tabela.
+- NÃO acrescente perguntas retóricas, interações ou explicações longas dentro das células.
+- NÃO junte, divida, remova ou reordene parágrafos: cada lista deve manter o MESMO número de itens.
+- Devolva SOMENTE um objeto JSON válido com EXATAMENTE as mesmas chaves, sem comentários e sem blocos de código."""
+
+
+class TableCell:
+    """
+    Célula única de uma tabela (células mescladas aparecem uma vez).
+
+    `texts` tem os textos dos parágrafos com conteúdo e `segments` os ids
+    correspondentes na IR do documento (ver document_ir).
+    """
+
+    __slots__ = ("row", "col", "texts", "segments")
+
+    def __init__(self, row: int, col: int, texts: List[str], segments: Optional[List[int]] = None):
+        self.row = row
+        self.col = col
+        self.texts = texts
+        self.segments = segments
+
+    @property
+    def key(self) -> str:
+        return f"{self.row},{self.col}"
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(t) for t in self.texts)
+
+
+def pack_table_cells(cells: List[TableCell], max_tokens: int) -> List[List[TableCell]]:
+    """
+    Agrupa células em lotes cujo texto somado fica abaixo de `max_tokens`.
+
+    Células que sozinhas excedem o limite formam um lote próprio.
+
+    Args:
+        cells: Células de uma tabela (ver DocumentIR.table_cells)
+        max_tokens: Meta de tokens de entrada por requisição
+
+    Returns:
+        Lista de lotes de células, na ordem da tabela
+    """
+    batches: List[List[TableCell]] = []
+    current: List[TableCell] = []
+    current_tokens = 0
+    for cell in cells:
+        if current and current_tokens + cell.tokens > max_tokens:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(cell)
+        current_tokens += cell.tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_table_payload(cells: List[TableCell]) -> str:
+    """Serializa um lote de células no JSON enviado ao modelo."""
+    return json.dumps({cell.key: cell.texts for cell in cells}, ensure_ascii=False)
+
+
+def parse_table_response(content: str, cells: List[TableCell]) -> Dict[str, List[str]]:
+    """
+    Interpreta a resposta JSON do modelo.
+
+    Apenas células cuja chave existe e cuja lista tem o mesmo número de
+    parágrafos são aceitas; as demais ficam de fora e devem ser revisadas
+    individualmente pelo chamador.
+
+    Args:
+        content: Texto devolvido pelo modelo
+        cells: Lote de células enviado
+
+    Returns:
+        Dicionário chave -> lista de parágrafos revisados
+    """
+    data = load_json_object(content)
+    if not isinstance(data, dict):
+        return {}
+
+    revised: Dict[str, List[str]] = {}
+    for cell in cells:
+        value = data.get(cell.key)
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or len(value) != len(cell.texts):
+            continue
+        if not all(isinstance(v, str) for v in value):
+            continue
+        revised[cell.key] = [v.strip() for v in value]
+    return revised
+
+
+def load_json_object(content: str) -> Optional[dict]:
+    """Lê o objeto JSON de uma resposta do modelo (tolera blocos ``` e texto em volta)."""
+    content = content.strip()
+    # Alguns deployments ainda envolvem a resposta em ```json ... ```
+    fenced = re.match(r'^```(?:json)?\s*(.*?)\s*```$', content, re.DOTALL)
+    if fenced:
+        content = fenced.group(1)
+    try:
+        return json.loads(content)
+    except ValueError:
+        start, end = content.find("{"), content.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(content[start:end + 1])
+        except ValueError:
+            return None
@@ -0,0 +1,63 @@
+"""
+Testes do controle de admissão (admission).
+"""
+
+import math
+
+from admission import AdmissionController, WorkEstimate, estimate_document_work
+from document_ir import SEGMENT_PARAGRAPH, SEGMENT_TABLE_CELL, DocumentIR
+from text_chunking import estimate_tokens
+
+
+def make_ir():
+    ir = DocumentIR()
+    ir.add_segment(SEGMENT_PARAGRAPH, "Paragrafo curto.", 0)
+    ir.add_segment(SEGMENT_PARAGRAPH, "Paragrafo longo " * 50, 1)
+    ir.add_segment(SEGMENT_TABLE_CELL, "Nome", 0, 0, 0, 0)
+    ir.add_segment(SEGMENT_TABLE_CELL, "Valor", 0, 0, 1, 0)
+    return ir
+
+
+def test_estimativa_conta_blocos_tabelas_e_imagens():
+    ir = make_ir()
+    long_tokens = estimate_tokens("Paragrafo longo " * 50)
+    estimate = estimate_document_work(ir, True, images=2, chunk_tokens=40, table_tokens=1000)
+    assert estimate.paragraphs == 2
+    assert estimate.calls == 2 + 1 + math.ceil(long_tokens / 40) + 1
+    assert estimate_document_work(ir, False, images=2, chunk_tokens=40, table_tokens=1000).to_dict() == \
+        {"calls": 2, "tokens": 0, "paragraphs": 0, "images": 2}
+
+
+def test_admissao_rejeita_acima_da_capacidade_e_libera():
+    controller = AdmissionController(slots=2, horizon_seconds=10, default_call_seconds=1.0)
+    # Sem nada em andamento, mesmo um documento maior que a capacidade é admitido
+    first, retry_after = controller.try_admit(WorkEstimate(calls=30, tokens=0))
+    assert first is not None and retry_after == 0
+
+    second, retry_after = controller.try_admit(WorkEstimate(calls=4, tokens=0))
+    assert second is None
+    assert retry_after == math.ceil((30 + 4 - 20) / 2)
+    assert controller.check_load() == math.ceil((30 - 20 + 1) / 2)
+
+    controller.release(first)
+    assert controller.check_load() is None
+    ticket, _ = controller.try_admit(WorkEstimate(calls=4, tokens=0))
+    assert ticket is not None
+    snapshot = controller.snapshot()
+    assert snapshot["admitted"] == 2 and snapshot["rejected"] == 2
+    assert snapshot["outstanding_call_seconds"] == 4.0
+
+
+def test_admissao_desligada_apenas_contabiliza():
+    controller = AdmissionController(slots=1, horizon_seconds=1, enabled=False)
+    tickets = [controller.try_admit(WorkEstimate(calls=10, tokens=0))[0] for _ in range(3)]
+    assert all(tickets)
+    assert controller.check_load() is None
+    assert controller.snapshot()["in_flight"] == 3
+
+
+def test_latencia_observada_ajusta_o_custo():
+    controller = AdmissionController(slots=1, horizon_seconds=10, default_call_seconds=2.0)
+    controller.observe_call(12.0)
+    assert controller.call_seconds == 3.0
+    assert controller.cost(WorkEstimate(calls=2, tokens=0)) == 6.0
@@ -0,0 +1,159 @@
+"""
+Testes do loop compartilhado e do limitador (async_runtime).
+"""
+
+import asyncio
+
+import pytest
+
+from async_runtime import LANE_BULK, LANE_INTERACTIVE, AsyncLimiter, AsyncRuntime, in_lane
+
+
+def test_runtime_executa_no_loop_compartilhado():
+    runtime = AsyncRuntime("teste-loop")
+
+    async def inside():
+        return runtime.in_loop()
+
+    assert runtime.run(inside()) is True
+    assert runtime.in_loop() is False
+
+    async def nested():
+        with pytest.raises(RuntimeError):
+            runtime.run(asyncio.sleep(0))
+        # De dentro do loop, run_async apenas aguarda
+        return await runtime.run_async(inside())
+
+    assert runtime.run(nested()) is True
+
+    async def from_other_loop():
+        return await runtime.run_async(inside())
+
+    assert asyncio.run(from_other_loop()) is True
+
+
+def test_limitador_respeita_a_concorrencia():
+    limiter = AsyncLimiter(3)
+    running = []
+
+    async def call():
+        async with limiter:
+            running.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert max(running) == 3
+    assert limiter.snapshot()["acquired"] == 10
+    assert limiter.in_flight == 0
+
+
+def test_cancelamento_na_fila_nao_perde_vagas():
+    limiter = AsyncLimiter(1)
+
+    async def hold(event):
+        async with limiter:
+            await event.wait()
+
+    async def scenario():
+        event = asyncio.Event()
+        holder = asyncio.ensure_future(hold(event))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(hold(asyncio.Event()))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        event.set()
+        await holder
+        await asyncio.gather(waiting, return_exceptions=True)
+        # A vaga voltou: uma nova chamada entra sem esperar
+        async with limiter:
+            return limiter.in_flight
+
+    assert asyncio.run(scenario()) == 1
+    assert limiter.in_flight == 0
+
+
+async def acquire_in_order(limiter, order, name, release):
+    async with limiter:
+        order.append(name)
+        await release.wait()
+
+
+def test_faixa_interactive_passa_na_frente_da_bulk():
+    limiter = AsyncLimiter(4, reserved={LANE_BULK: 0})
+    order = []
+
+    async def scenario():
+        release = asyncio.Event()
+        holders = [asyncio.ensure_future(in_lane(LANE_BULK, acquire_in_order(limiter, [], "bulk", release)))
+                   for _ in range(3)]
+        holders.append(asyncio.ensure_future(acquire_in_order(limiter, [], "interactive", release)))
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 4
+        late = asyncio.Event()
+        queued = [asyncio.ensure_future(in_lane(LANE_BULK, acquire_in_order(limiter, order, "bulk", late))),
+                  asyncio.ensure_future(acquire_in_order(limiter, order, "interactive", late))]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*holders)
+        late.set()
+        await asyncio.gather(*queued)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "bulk"]
+
+
+def test_faixa_bulk_nao_ocupa_a_reserva_interativa():
+    limiter = AsyncLimiter(4)
+
+    async def call():
+        async with limiter:
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(in_lane(LANE_BULK, call(), key=str(i)) for i in range(10)))
+
+    asyncio.run(scenario())
+    lanes = limiter.snapshot()["lanes"]
+    assert lanes[LANE_BULK]["peak_in_flight"] == limiter.bulk_cap == 3
+    assert lanes[LANE_INTERACTIVE]["reserved"] == 1
+
+
+def test_rodizio_entre_documentos_da_faixa_bulk():
+    limiter = AsyncLimiter(1, reserved={LANE_INTERACTIVE: 0, LANE_BULK: 0})
+    order = []
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(in_lane(LANE_BULK, acquire_in_order(limiter, [], "x", release), key="x"))
+        await asyncio.sleep(0)
+        free = asyncio.Event()
+        free.set()
+        queued = [asyncio.ensure_future(in_lane(LANE_BULK, acquire_in_order(limiter, order, name, free), key=name[0]))
+                  for name in ("a1", "a2", "a3", "b1")]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *queued)
+
+    asyncio.run(scenario())
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_pressao_por_faixa():
+    limiter = AsyncLimiter(4)
+
+    async def scenario():
+        release = asyncio.Event()
+        holders = [asyncio.ensure_future(acquire_in_order(limiter, [], "interactive", release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        pressures = limiter.pressure(LANE_INTERACTIVE), limiter.pressure(LANE_BULK)
+        release.set()
+        await asyncio.gather(*holders)
+        return pressures
+
+    interactive, bulk = asyncio.run(scenario())
+    assert interactive == pytest.approx(2 / 3)
+    assert bulk == pytest.approx(0.5)
+    assert limiter.pressure(LANE_BULK) == 0
@@ -0,0 +1,73 @@
+"""
+Testes do cliente da Batch API (batch_api) com o backend local.
+"""
+
+import asyncio
+import json
+
+from batch_api import BATCH_ENDPOINT, LocalBatchBackend, build_batch_line, parse_batch_output
+
+
+def output_line(custom_id, content, finish_reason="stop", status_code=200):
+    return json.dumps({
+        "custom_id": custom_id,
+        "response": {"status_code": status_code, "body": {
+            "choices": [{"message": {"content": content}, "finish_reason": finish_reason}],
+            "usage": {"total_tokens": 10},
+        }},
+    })
+
+
+def test_linha_jsonl():
+    line = json.loads(build_batch_line("7", {"model": "gpt-4-batch", "messages": []}))
+    assert line == {"custom_id": "7", "method": "POST", "url": BATCH_ENDPOINT,
+                    "body": {"model": "gpt-4-batch", "messages": []}}
+
+
+def test_saida_com_erro_e_resposta_truncada():
+    content = "\n".join([
+        output_line("ok", "Texto revisado."),
+        output_line("cortado", "Texto cor", finish_reason="length"),
+        json.dumps({"custom_id": "falhou", "response": {"status_code": 500, "body": {"error": {"message": "boom"}}}}),
+        "linha inválida",
+    ])
+    results = parse_batch_output(content)
+    assert results["ok"] == {"content": "Texto revisado.", "error": None, "usage": {"total_tokens": 10}}
+    assert results["cortado"]["content"] is None
+    assert "truncated" in results["cortado"]["error"]
+    assert results["falhou"] == {"content": None, "error": "boom", "usage": {}}
+
+
+def test_backend_local_envio_consulta_e_resultados(tmp_path):
+    def responder(body):
+        text = body["messages"][0]["content"]
+        if text == "erro":
+            raise RuntimeError("falha simulada")
+        return text.upper()
+
+    backend = LocalBatchBackend(str(tmp_path), responder, polls_to_complete=2)
+    lines = [build_batch_line(str(index), {"messages": [{"role": "user", "content": text}]})
+             for index, text in enumerate(["um", "erro"])]
+
+    async def scenario():
+        batch_id = await backend.submit(lines, {"job_id": "teste"})
+        first = await backend.status(batch_id)
+        second = await backend.status(batch_id)
+        return first, second, await backend.results(batch_id)
+
+    first, second, results = asyncio.run(scenario())
+    assert first["status"] == "in_progress"
+    assert (second["status"], second["completed"], second["failed"]) == ("completed", 1, 1)
+    assert results["0"]["content"] == "UM"
+    assert results["1"] == {"content": None, "error": "falha simulada", "usage": {}}
+
+
+def test_backend_local_cancelamento(tmp_path):
+    backend = LocalBatchBackend(str(tmp_path), lambda body: "x", polls_to_complete=5)
+
+    async def scenario():
+        batch_id = await backend.submit([build_batch_line("0", {"messages": []})])
+        await backend.cancel(batch_id)
+        return await backend.status(batch_id)
+
+    assert asyncio.run(scenario())["status"] == "cancelled"
@@ -0,0 +1,129 @@
+"""
+Testes do modo em massa (bulk_batch) com o backend e o armazenamento locais.
+"""
+
+import asyncio
+import io
+import json
+
+from docx import Document
+
+from batch_api import LocalBatchBackend
+from bulk_batch import (
+    INPUT_PREFIX,
+    JOB_COMPLETED,
+    JOBS_PREFIX,
+    OUTPUT_PREFIX,
+    PENDING_PREFIX,
+    BulkBatchProcessor,
+    LocalBulkStore,
+)
+import docx_worker
+
+
+class FakeRequests:
+    """Requisições mínimas: o "modelo" devolve o texto em maiúsculas."""
+
+    def mode(self, name):
+        return {"name": name or "spelling", "revise_text": True, "describe_images": False}
+
+    def text_request(self, text, mode):
+        return {"model": "batch", "messages": [{"role": "user", "content": text}]}
+
+    def image_request(self, image_bytes, context):
+        return {"model": "batch", "messages": [{"role": "user", "content": context}]}
+
+    def parse_text(self, original, content):
+        return content.strip()
+
+
+def make_docx(*paragraphs) -> bytes:
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    stream = io.BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
+
+
+def read_paragraphs(content: bytes):
+    return [paragraph.text for paragraph in Document(io.BytesIO(content)).paragraphs]
+
+
+def make_processor(tmp_path, **kwargs):
+    store = LocalBulkStore(str(tmp_path / "store"))
+    backend = LocalBatchBackend(str(tmp_path / "batches"),
+                                lambda body: body["messages"][0]["content"].upper(), polls_to_complete=2)
+    return BulkBatchProcessor(store, backend, FakeRequests(), **kwargs), store
+
+
+def test_ciclo_completo_gera_a_saida_revisada(tmp_path):
+    processor, store = make_processor(tmp_path)
+    store.write(INPUT_PREFIX + "a.docx", make_docx("primeiro parágrafo", "repetido", "repetido"))
+
+    async def scenario():
+        await processor.enqueue("a.docx")
+        job_ids = await processor.submit_pending()
+        first = await processor.poll_jobs()
+        second = await processor.poll_jobs()
+        return job_ids, first, second
+
+    job_ids, first, second = asyncio.run(scenario())
+    assert len(job_ids) == 1
+    assert first[0]["status"] != JOB_COMPLETED
+    assert second[0]["status"] == JOB_COMPLETED
+    assert store.list(PENDING_PREFIX) == []
+    assert read_paragraphs(store.read(OUTPUT_PREFIX + "a.docx")) == ["PRIMEIRO PARÁGRAFO", "REPETIDO", "REPETIDO"]
+
+    # Textos repetidos vão uma vez ao batch; o manifesto guarda só localizadores e textos
+    job = json.loads(store.read(f"{JOBS_PREFIX}{job_ids[0]}.json"))
+    assert job["requests"] == 2
+    document = job["documents"][0]
+    assert "ir" not in document
+    assert [entry["locator"] for entry in document["segments"]] == ["p:0", "p:1", "p:2"]
+    assert document["segments"][1]["text"] == "repetido"
+    assert document["failed"] == []
+
+
+def test_documentos_divididos_em_jobs_sem_extrair_de_novo(tmp_path, monkeypatch):
+    processor, store = make_processor(tmp_path, max_requests=2)
+    for name in ("a.docx", "b.docx"):
+        store.write(INPUT_PREFIX + name, make_docx(f"texto de {name}", "comum"))
+
+    extractions = []
+    original = docx_worker.extract_work_items
+
+    def counting_extract(*args):
+        extractions.append(args)
+        return original(*args)
+
+    monkeypatch.setattr("bulk_batch.extract_work_items", counting_extract)
+
+    async def scenario():
+        for name in ("a.docx", "b.docx"):
+            await processor.enqueue(name)
+        job_ids = await processor.submit_pending()
+        for _ in range(2):
+            await processor.poll_jobs()
+        return job_ids
+
+    job_ids = asyncio.run(scenario())
+    assert len(job_ids) == 2
+    assert len(extractions) == 2
+    # "comum" foi reenviado no segundo job, que não compartilha requisições com o primeiro
+    assert read_paragraphs(store.read(OUTPUT_PREFIX + "b.docx")) == ["TEXTO DE B.DOCX", "COMUM"]
+
+
+def test_documento_alterado_depois_do_envio_mantem_o_texto(tmp_path):
+    processor, store = make_processor(tmp_path)
+    store.write(INPUT_PREFIX + "a.docx", make_docx("original", "fica"))
+
+    async def scenario():
+        await processor.enqueue("a.docx")
+        await processor.submit_pending()
+        store.write(INPUT_PREFIX + "a.docx", make_docx("editado", "fica"))
+        for _ in range(2):
+            await processor.poll_jobs()
+
+    asyncio.run(scenario())
+    assert read_paragraphs(store.read(OUTPUT_PREFIX + "a.docx")) == ["editado", "FICA"]
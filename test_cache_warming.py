@@ -0,0 +1,32 @@
+"""
+Testes da contagem de parágrafos padronizados (cache_warming).
+"""
+
+from cache_warming import BoilerplateScanner, iter_local_corpus
+
+HEADER = "Este material foi produzido pelo SENAC/SC para uso exclusivo no curso {}."
+
+
+def test_frequencia_por_documento_e_taxa_de_acerto():
+    scanner = BoilerplateScanner(min_chars=20)
+    scanner.add_document([HEADER.format(2024), HEADER.format(2024), "Texto próprio do primeiro documento."])
+    scanner.add_document([HEADER.format(2025), "curto", ""])
+    scanner.add_document(["Outro texto próprio, sem repetição alguma."])
+
+    frequent = scanner.frequent(min_documents=2)
+    # Datas não distinguem parágrafos; a variante mais comum representa o grupo
+    assert frequent == [(HEADER.format(2024), 2)]
+
+    report = scanner.report(min_documents=2)
+    assert report["documents"] == 3
+    assert report["paragraphs"] == 6
+    assert report["covered_occurrences"] == 3
+    assert report["expected_hit_rate"] == 0.5
+
+
+def test_acervo_local_ignora_temporarios(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.docx").write_bytes(b"a")
+    (tmp_path / "~$a.docx").write_bytes(b"lock")
+    (tmp_path / "notas.txt").write_bytes(b"x")
+    assert [content for _, content in iter_local_corpus(str(tmp_path))] == [b"a"]
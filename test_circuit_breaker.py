@@ -0,0 +1,163 @@
+"""
+Testes do circuit breaker do Azure OpenAI (circuit_breaker).
+"""
+
+import asyncio
+
+import pytest
+
+from circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    is_dependency_failure,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(**kwargs):
+    clock = FakeClock()
+    breaker = CircuitBreaker(consecutive_failures=3, open_seconds=30, clock=clock, **kwargs)
+    return breaker, clock
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.consecutive_failures):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_abre_apos_falhas_consecutivas():
+    breaker, clock = make_breaker()
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    open_breaker(breaker)
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 30
+    clock.now = 10
+    assert breaker.retry_after() == 20
+
+
+def test_abre_pela_taxa_de_falha_na_janela():
+    breaker, _ = make_breaker(failure_rate=0.5, window_size=4, min_calls=4)
+    for ok in (True, False, True, False):
+        breaker.before_call()
+        breaker.record_success() if ok else breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+
+
+def test_meio_aberto_libera_uma_chamada_de_teste():
+    breaker, clock = make_breaker()
+    open_breaker(breaker)
+    clock.now = 30
+    assert breaker.state == STATE_HALF_OPEN
+    assert not breaker.is_open()
+    breaker.before_call()
+    # Vaga de teste ocupada: chamadas concorrentes são rejeitadas
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_falha_no_meio_aberto_reabre_e_cancelamento_libera_a_vaga():
+    breaker, clock = make_breaker()
+    open_breaker(breaker)
+    clock.now = 30
+    breaker.before_call()
+    breaker.record_cancelled()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.snapshot()["opened"] == 2
+
+
+def run_concurrent_half_open(probe_succeeds: bool, calls: int = 5):
+    """`calls` chamadas concorrentes no meio-aberto; a de teste termina com sucesso ou falha."""
+    breaker, clock = make_breaker()
+    open_breaker(breaker)
+    clock.now = 30
+    outcomes = []
+
+    async def call(index):
+        try:
+            await breaker.acquire(timeout=5)
+        except CircuitOpenError:
+            outcomes.append("rejected")
+            return
+        if index == 0:
+            # Chamada de teste: as demais já estão aguardando
+            await asyncio.sleep(0.01)
+            breaker.record_success() if probe_succeeds else breaker.record_failure()
+        else:
+            breaker.record_success()
+        outcomes.append("called")
+
+    async def scenario():
+        await asyncio.gather(*(call(index) for index in range(calls)))
+
+    asyncio.run(scenario())
+    return breaker, outcomes
+
+
+def test_chamadas_concorrentes_no_meio_aberto_aguardam_o_teste():
+    breaker, outcomes = run_concurrent_half_open(probe_succeeds=True)
+    assert outcomes == ["called"] * 5
+    assert breaker.state == STATE_CLOSED
+    assert breaker.snapshot()["probe_waits"] == 4 and breaker.snapshot()["rejected"] == 0
+
+
+def test_teste_com_falha_rejeita_quem_aguardava():
+    breaker, outcomes = run_concurrent_half_open(probe_succeeds=False)
+    assert sorted(outcomes) == ["called"] + ["rejected"] * 4
+    assert breaker.state == STATE_OPEN
+
+
+def test_espera_pelo_teste_tem_limite_e_cancelamento_libera_quem_aguarda():
+    breaker, clock = make_breaker()
+    open_breaker(breaker)
+    clock.now = 30
+    breaker.before_call()
+
+    async def wait_probe(timeout):
+        await breaker.acquire(timeout=timeout)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(wait_probe(0.01))
+
+    async def scenario():
+        waiting = asyncio.ensure_future(wait_probe(5))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        # Chamada de teste abandonada: quem aguardava vira a nova chamada de teste
+        breaker.record_cancelled()
+        await waiting
+
+    asyncio.run(scenario())
+    assert breaker.state == STATE_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_erros_de_requisicao_nao_contam_como_falha():
+    class StatusError(Exception):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    assert not is_dependency_failure(StatusError(400))
+    assert is_dependency_failure(StatusError(429))
+    assert is_dependency_failure(StatusError(503))
+    assert is_dependency_failure(TimeoutError())
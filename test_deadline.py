@@ -0,0 +1,51 @@
+"""
+Testes do orçamento de tempo por documento (deadline).
+"""
+
+import json
+
+from deadline import DocumentDeadline, create_deadline, report_summary
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_despacho_encerra_quando_o_orcamento_nao_cobre_uma_chamada():
+    clock = FakeClock()
+    deadline = DocumentDeadline(30, reserve_seconds=10, initial_estimate=5, clock=clock)
+    assert deadline.can_dispatch()
+    assert deadline.call_timeout(60) == 20
+    clock.now = 16
+    assert not deadline.can_dispatch()
+    # Encerrado para o restante do documento, mesmo com estimativa menor
+    deadline.observe(0.1)
+    assert not deadline.can_dispatch()
+
+
+def test_prazo_ilimitado_mantem_o_relatorio():
+    deadline = create_deadline(None, 15)
+    assert deadline.can_dispatch(1000)
+    deadline.mark_unrevised("paragraph", 3, "circuit_open")
+    report = deadline.report()
+    assert report["status"] == "partial"
+    assert report["unrevised"] == {"paragraph": [3]}
+
+
+def test_resumo_do_relatorio_nao_cresce_com_o_documento():
+    deadline = create_deadline(None, 0)
+    for index in range(5000):
+        deadline.mark_unrevised("paragraph", index)
+    deadline.mark_unrevised("image", 0, "timeout")
+    report = dict(deadline.report(), degradation="normal", estimate={"calls": 5001})
+    summary = report_summary(report)
+    assert summary["status"] == "partial"
+    assert summary["unrevised_count"] == 5001
+    assert summary["unrevised_kinds"] == {"paragraph": 5000, "image": 1}
+    assert summary["unrevised_reasons"] == {"budget": 5000, "timeout": 1}
+    assert "unrevised" not in summary and "estimate" not in summary
+    assert len(json.dumps(summary)) < 512
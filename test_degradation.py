@@ -0,0 +1,65 @@
+"""
+Testes da escada de degradação (degradation).
+"""
+
+import pytest
+
+from degradation import (
+    LEVEL_ESSENTIAL,
+    LEVEL_NO_IMAGES,
+    LEVEL_NORMAL,
+    LEVEL_SPELLING,
+    DegradationLadder,
+    is_low_value,
+    parse_thresholds,
+)
+
+
+def test_limiares_validos_e_invalidos():
+    assert parse_thresholds("1.5, 3, 5") == [1.5, 3.0, 5.0]
+    with pytest.raises(ValueError):
+        parse_thresholds("3,1.5,5")
+    with pytest.raises(ValueError):
+        parse_thresholds("1,2")
+
+
+def test_texto_de_pouco_valor():
+    assert is_low_value("Tabela 3")
+    assert is_low_value("R$ 1.234,56 - 2024")
+    assert not is_low_value("O contrato foi assinado pelas partes ontem.")
+
+
+def test_sobe_um_degrau_por_vez_apos_pressao_sustentada():
+    ladder = DegradationLadder(sustain_seconds=10, recover_seconds=30)
+    assert ladder.observe(6.0, now=0) == LEVEL_NORMAL
+    assert ladder.observe(6.0, now=9) == LEVEL_NORMAL
+    assert ladder.observe(6.0, now=10) == LEVEL_NO_IMAGES
+    assert ladder.observe(6.0, now=20) == LEVEL_SPELLING
+    assert ladder.observe(6.0, now=30) == LEVEL_ESSENTIAL
+    assert ladder.observe(6.0, now=40) == LEVEL_ESSENTIAL
+    assert ladder.snapshot()["transitions"] == 3
+
+
+def test_desce_com_histerese_ou_apos_periodo_ocioso():
+    ladder = DegradationLadder(sustain_seconds=0, recover_seconds=30)
+    ladder.observe(3.5, now=0)
+    ladder.observe(3.5, now=1)
+    assert ladder.level == LEVEL_SPELLING
+
+    # Pressão baixa com amostras frequentes: desce um degrau a cada recover_seconds
+    for now in range(2, 32, 5):
+        ladder.observe(0.0, now=now)
+    assert ladder.level == LEVEL_SPELLING
+    ladder.observe(0.0, now=32)
+    assert ladder.level == LEVEL_NO_IMAGES
+
+    # Sem amostras por recover_seconds: volta direto ao degrau da pressão atual
+    ladder.observe(3.5, now=40)
+    assert ladder.level == LEVEL_SPELLING
+    assert ladder.observe(0.0, now=100) == LEVEL_NORMAL
+
+
+def test_desligada_fica_no_degrau_normal_e_conta_documentos():
+    ladder = DegradationLadder(enabled=False)
+    assert ladder.begin_document(10.0) == LEVEL_NORMAL
+    assert ladder.snapshot()["documents"]["normal"] == 1
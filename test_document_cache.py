@@ -0,0 +1,138 @@
+"""
+Testes do cache de resultados por documento (document_cache).
+"""
+
+import datetime
+import os
+import threading
+import time
+
+from azure.core.exceptions import ResourceNotFoundError
+
+import document_cache
+from document_cache import (
+    BlobDocumentCache,
+    LocalDocumentCache,
+    cache_key,
+    config_fingerprint,
+    document_hash,
+    is_document_hash,
+)
+
+
+def test_chave_muda_com_a_configuracao():
+    sha256 = document_hash(b"documento")
+    assert is_document_hash(sha256)
+    assert not is_document_hash("../etc/passwd")
+    first = cache_key(sha256, "spelling", config_fingerprint({"prompt": "a"}))
+    second = cache_key(sha256, "spelling", config_fingerprint({"prompt": "b"}))
+    assert first != second
+
+
+def test_cache_local_guarda_expira_e_despeja(tmp_path):
+    cache = LocalDocumentCache(str(tmp_path), max_bytes=10, max_age_seconds=60)
+    cache.put("a", b"12345678", {"status": "complete"})
+    content, report = cache.get("a")
+    assert content == b"12345678" and report["status"] == "complete"
+
+    # Passou do tamanho total: o menos usado sai
+    cache.put("b", b"12345678", {"status": "complete"})
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+    old = time.time() - 120
+    os.utime(tmp_path / "b.json", (old, old))
+    assert cache.get("b") is None
+
+
+def test_cache_local_tolera_despejo_concorrente_na_leitura(tmp_path, monkeypatch):
+    cache = LocalDocumentCache(str(tmp_path))
+    cache.put("a", b"conteudo", {"status": "complete"})
+
+    def evicted(path):
+        # put() concorrente removeu a entrada entre a leitura e o utime
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(document_cache.os, "utime", evicted)
+    content, report = cache.get("a")
+    assert content == b"conteudo" and report["status"] == "complete"
+    assert cache.get("a") is None
+    assert cache.snapshot()["hits"] == 1 and cache.snapshot()["misses"] == 1
+
+
+def test_contadores_do_cache_entre_threads(tmp_path):
+    cache = LocalDocumentCache(str(tmp_path))
+
+    def lookups():
+        for _ in range(2000):
+            cache.get("ausente")
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.snapshot()["misses"] == 8000
+
+
+def test_registros_do_cache_local(tmp_path):
+    cache = LocalDocumentCache(str(tmp_path))
+    assert cache.get_record("inexistente") is None
+    cache.put_record("r", {"paragraphs": ["x"]})
+    assert cache.get_record("r") == {"paragraphs": ["x"]}
+
+
+class FakeBlob:
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.last_modified = datetime.datetime.now(datetime.timezone.utc)
+        self.metadata = {}
+
+
+class FakeDownloader:
+    def __init__(self, blob):
+        self.properties = blob
+        self._data = blob.data
+
+    def readall(self):
+        return self._data
+
+
+class FakeContainer:
+    """ContainerClient em memória (upload/download/list/delete)."""
+
+    def __init__(self):
+        self.blobs = {}
+
+    def upload_blob(self, name, data, overwrite=False, metadata=None):
+        blob = FakeBlob(name, data)
+        blob.metadata = metadata or {}
+        self.blobs[name] = blob
+
+    def download_blob(self, name):
+        if name not in self.blobs:
+            raise ResourceNotFoundError(name)
+        return FakeDownloader(self.blobs[name])
+
+    def list_blobs(self, name_starts_with=""):
+        return [blob for name, blob in self.blobs.items() if name.startswith(name_starts_with)]
+
+    def delete_blob(self, name):
+        self.blobs.pop(name, None)
+
+
+def test_cache_blob_guarda_o_relatorio_fora_da_metadata():
+    container = FakeContainer()
+    cache = BlobDocumentCache(container)
+    report = {"status": "complete", "unrevised": {}, "nota": "ção " * 5000}
+    cache.put("k", b"docx", report)
+    assert all(not blob.metadata for blob in container.blobs.values())
+    assert sorted(container.blobs) == ["cache/k.docx", "cache/k.json"]
+    assert cache.get("k") == (b"docx", report)
+
+    # Documento sem relatório (gravação interrompida): tratado como ausente
+    del container.blobs["cache/k.json"]
+    assert cache.get("k") is None
+    assert cache.snapshot()["misses"] == 1
@@ -0,0 +1,58 @@
+"""
+Testes da representação intermediária do documento (document_ir).
+"""
+
+import io
+import json
+
+from docx import Document
+
+from document_ir import DocumentIR, apply_revisions, extract_document_ir
+
+
+def make_document():
+    doc = Document()
+    doc.add_paragraph("Titulo do relatorio", style="Heading 1")
+    doc.add_paragraph("")
+    doc.add_paragraph("Corpo do texto.")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Nome"
+    table.cell(0, 1).text = "Valor"
+    merged = table.cell(1, 0).merge(table.cell(1, 1))
+    merged.text = "Celula mesclada"
+    stream = io.BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
+
+
+def test_extracao_ignora_vazios_e_deduplica_celulas_mescladas():
+    ir = extract_document_ir(Document(io.BytesIO(make_document())))
+    assert ir.paragraph_count == 3
+    assert ir.texts == ["Titulo do relatorio", "Corpo do texto.", "Nome", "Valor", "Celula mesclada"]
+    assert [ir.locator(segment) for segment in range(len(ir))] == ["p:0", "p:2", "t:0:0,0:0", "t:0:0,1:0", "t:0:1,0:0"]
+    assert ir.style(0) == "Heading 1"
+    assert [(table, [cell.key for cell in cells]) for table, cells in ir.table_cells()] == [(0, ["0,0", "0,1", "1,0"])]
+
+
+def test_to_dict_e_from_dict_preservam_a_ir():
+    ir = extract_document_ir(Document(io.BytesIO(make_document())))
+    ir.add_image(2, "rId9")
+    restored = DocumentIR.from_dict(json.loads(json.dumps(ir.to_dict())))
+    assert restored.to_dict() == ir.to_dict()
+    assert [restored.locator(segment) for segment in range(len(restored))] == \
+        [ir.locator(segment) for segment in range(len(ir))]
+
+
+def test_aplica_revisoes_e_ignora_segmento_divergente():
+    content = make_document()
+    ir = extract_document_ir(Document(io.BytesIO(content)))
+    ir.texts[2] = "Texto que nao esta no documento"
+
+    doc = Document(io.BytesIO(content))
+    applied = apply_revisions(doc, ir, {1: "Corpo do texto revisado.", 2: "Nome revisado", 4: "Célula mesclada"})
+
+    assert applied == 2
+    assert doc.paragraphs[2].text == "Corpo do texto revisado."
+    table = doc.tables[0]
+    assert table.cell(0, 0).text == "Nome"
+    assert table.cell(1, 1).text == "Célula mesclada"
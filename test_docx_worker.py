@@ -0,0 +1,48 @@
+"""
+Testes das etapas de CPU do .docx (docx_worker) no modo em thread.
+"""
+
+import asyncio
+import io
+
+import pytest
+from docx import Document
+
+from docx_worker import DocxWorkerPool, assemble_document, extract_work_items
+
+
+def make_docx(*paragraphs) -> bytes:
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    stream = io.BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
+
+
+def test_extrai_e_monta_pelo_pool():
+    content = make_docx("Primeiro paragrafo.", "", "Segundo paragrafo.")
+    pool = DocxWorkerPool(0)
+
+    async def scenario():
+        ir, images = await pool.run(extract_work_items, content, True)
+        assert ir.texts == ["Primeiro paragrafo.", "Segundo paragrafo."]
+        assert images == []
+        return await pool.run(assemble_document, content, ir, {1: "Segundo parágrafo."}, [])
+
+    output = asyncio.run(scenario())
+    texts = [paragraph.text for paragraph in Document(io.BytesIO(output)).paragraphs]
+    assert texts == ["Primeiro paragrafo.", "", "Segundo parágrafo."]
+
+    stats = pool.snapshot()
+    assert stats["mode"] == "thread"
+    assert stats["tasks"] == 2 and stats["errors"] == 0
+
+
+def test_erro_da_etapa_e_contado_e_propagado():
+    pool = DocxWorkerPool(0)
+    with pytest.raises(Exception):
+        asyncio.run(pool.run(extract_work_items, b"nao e um docx"))
+    stats = pool.snapshot()
+    assert stats["tasks"] == 1 and stats["errors"] == 1
+    pool.shutdown()
@@ -0,0 +1,51 @@
+"""
+Testes do despacho das chamadas ao modelo no function_app, com um cliente falso.
+"""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://exemplo.openai.azure.com")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "teste")
+
+import function_app  # noqa: E402
+from deadline import DocumentDeadline  # noqa: E402
+from revision_engines import ConcurrentEngine, RevisionItem  # noqa: E402
+
+
+class RecordingCompletions:
+    """Registra a ordem em que as requisições chegam ao Azure OpenAI."""
+
+    def __init__(self):
+        self.order = []
+
+    async def create(self, **kwargs):
+        self.order.append(kwargs["messages"][-1]["content"])
+        message = SimpleNamespace(content="revisado")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+def test_consulta_de_quase_duplicatas_nao_altera_a_ordem_de_despacho(monkeypatch):
+    mode = function_app.resolve_mode("spelling")
+    index = function_app.near_duplicates[mode["name"]]
+    lookup = index.lookup
+
+    def slow_lookup(text):
+        # Comparar textos longos custa mais: em consultas paralelas, os curtos terminariam antes
+        time.sleep(len(text) / 100000)
+        return lookup(text)
+
+    completions = RecordingCompletions()
+    monkeypatch.setattr(index, "lookup", slow_lookup)
+    monkeypatch.setattr(function_app, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    texts = [f"parágrafo {i} " + "conteúdo " * (10 + 40 * i) for i in range(6)]
+    items = [RevisionItem(i, f"p:{i}", text) for i, text in enumerate(texts)]
+    reviser = function_app.DocumentReviser(mode, DocumentDeadline(None))
+    asyncio.run(ConcurrentEngine({"longest_first": True, "use_cache": True}).revise(items, reviser))
+
+    # Mais longo primeiro (longest_first), como o engine ordenou
+    dispatched = [next(i for i, text in enumerate(texts) if text in content) for content in completions.order]
+    assert dispatched == [5, 4, 3, 2, 1, 0]
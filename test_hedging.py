@@ -0,0 +1,67 @@
+"""
+Testes das chamadas com hedging (hedging).
+"""
+
+import asyncio
+
+from hedging import HedgeBudget, HedgedCaller, LatencyTracker
+
+
+def warmed_caller(latency: float = 0.01, **kwargs) -> HedgedCaller:
+    caller = HedgedCaller(True, percentile=0.5, max_ratio=1.0, min_samples=3, **kwargs)
+    for _ in range(3):
+        caller.tracker.record("gpt:full", latency)
+    return caller
+
+
+def test_percentil_e_orcamento_de_copias():
+    tracker = LatencyTracker()
+    for latency in (1, 2, 3, 4, 5):
+        tracker.record("k", latency)
+    assert tracker.percentile("k", 0.5) == 3
+    assert tracker.percentile("vazio", 0.5) is None
+
+    budget = HedgeBudget(max_ratio=0.0, burst=1)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_copia_vence_a_chamada_lenta():
+    caller = warmed_caller()
+
+    async def slow():
+        await asyncio.sleep(1)
+        return "primária"
+
+    async def fast():
+        return "cópia"
+
+    assert asyncio.run(caller.call("gpt:full", slow, fast)) == "cópia"
+    assert caller.stats["hedges_won"] == 1
+
+
+def test_cancelamento_durante_a_espera_cancela_a_primaria():
+    caller = warmed_caller(latency=10)
+    state = {}
+
+    async def primary():
+        state["started"] = True
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def scenario():
+        outer = asyncio.ensure_future(caller.call("gpt:full", primary))
+        await asyncio.sleep(0.05)
+        outer.cancel()
+        try:
+            await outer
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.01)
+        # Ainda dentro do loop: a primária não pode sobreviver ao chamador
+        return dict(state)
+
+    assert asyncio.run(scenario()) == {"started": True, "cancelled": True}
@@ -0,0 +1,43 @@
+"""
+Testes da descrição de imagens em lote (image_batching).
+"""
+
+import io
+import json
+
+from PIL import Image
+
+from image_batching import build_multi_image_content, image_tokens, pack_images, parse_multi_image_response
+
+
+def make_png(width, height) -> bytes:
+    stream = io.BytesIO()
+    Image.new("RGB", (width, height), (0, 128, 255)).save(stream, "PNG")
+    return stream.getvalue()
+
+
+def test_tokens_estimados_pelo_tamanho_da_imagem():
+    assert image_tokens(make_png(64, 64)) == 85 + 170
+    # Reduzida a 2048x512: quatro blocos de 512px
+    assert image_tokens(make_png(4000, 1000)) == 85 + 4 * 170
+    assert image_tokens(b"nao e imagem") == 85 + 4 * 170
+
+
+def test_lotes_por_tokens_e_quantidade():
+    costs = {0: 300, 1: 300, 2: 900, 3: 100, 4: 100, 5: 100}
+    assert pack_images(list(costs), costs.get, max_tokens=700, max_images=10) == [[0, 1], [2], [3, 4, 5]]
+    assert pack_images(list(costs), costs.get, max_tokens=10000, max_images=4) == [[0, 1, 2, 3], [4, 5]]
+    assert pack_images([], costs.get, max_tokens=700, max_images=10) == []
+
+
+def test_conteudo_do_lote_identifica_cada_imagem():
+    content = build_multi_image_content([(3, "data:image/png;base64,AAA", "Figura 1"), (7, "data:b", "")])
+    assert [part["type"] for part in content] == ["text", "text", "image_url", "text", "image_url"]
+    assert content[1]["text"] == "IMAGEM 3\nContexto do documento: Figura 1"
+    assert content[3]["text"] == "IMAGEM 7"
+
+
+def test_resposta_do_lote_ignora_ausentes_e_vazias():
+    content = json.dumps({"3": "Um gráfico de barras.", "7": " ", "9": "Fora do lote"})
+    assert parse_multi_image_response(content, [3, 7, 8]) == {3: "Descrição da imagem: Um gráfico de barras."}
+    assert parse_multi_image_response("sem json", [3]) == {}
@@ -0,0 +1,73 @@
+"""
+Testes do reaproveitamento de descrições por hash perceptual (image_hashing).
+"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw
+
+from image_hashing import PerceptualImageIndex, hamming, image_fingerprint
+
+
+def make_figure(size, fmt="PNG", flipped=False) -> bytes:
+    image = Image.new("RGB", (200, 150), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, 90, 130), fill=(200, 30, 30))
+    draw.ellipse((110, 30, 190, 110), fill=(30, 30, 200))
+    if flipped:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+    image = image.resize(size)
+    stream = io.BytesIO()
+    image.save(stream, fmt, quality=70)
+    return stream.getvalue()
+
+
+def test_mesma_figura_em_outra_resolucao_e_formato():
+    original = image_fingerprint(make_figure((200, 150)))
+    resized = image_fingerprint(make_figure((400, 300), "JPEG"))
+    other = image_fingerprint(make_figure((200, 150), flipped=True))
+    assert original is not None and resized is not None and other is not None
+    assert hamming(original[0], resized[0]) <= 6 and hamming(original[1], resized[1]) <= 6
+    assert hamming(original[0], other[0]) > 6 or hamming(original[1], other[1]) > 6
+
+
+def test_imagens_uniformes_ou_invalidas_nao_sao_indexadas():
+    stream = io.BytesIO()
+    Image.new("RGB", (50, 50), "white").save(stream, "PNG")
+    assert image_fingerprint(stream.getvalue()) is None
+    assert image_fingerprint(b"nao e imagem") is None
+
+
+def test_indice_reaproveita_a_descricao_e_despeja_a_mais_antiga():
+    index = PerceptualImageIndex(max_distance=6, capacity=1)
+    figure = image_fingerprint(make_figure((200, 150)))
+    index.add(figure, "Descrição da imagem: um retângulo e um círculo.")
+    assert index.lookup(image_fingerprint(make_figure((400, 300), "JPEG"))) == \
+        "Descrição da imagem: um retângulo e um círculo."
+    assert index.lookup(None) is None
+
+    index.add(image_fingerprint(make_figure((200, 150), flipped=True)), "Espelhada")
+    assert index.lookup(figure) is None
+    snapshot = index.snapshot()
+    assert snapshot["entries"] == 1 and snapshot["lookups"] == 2 and snapshot["hits"] == 1
+
+
+def test_baldes_por_faixa_encontram_o_mesmo_que_a_varredura_completa():
+    rng = random.Random(7)
+    index = PerceptualImageIndex(max_distance=6, capacity=300)
+    fingerprints = [(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(400)]
+    for position, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, f"figura {position}")
+
+    def flip(value, bits):
+        for bit in rng.sample(range(64), bits):
+            value ^= 1 << bit
+        return value
+
+    # As 100 primeiras foram despejadas (e saíram dos baldes); as outras são achadas com até 6 bits trocados
+    for position, (dhash, phash) in enumerate(fingerprints):
+        query = (flip(dhash, rng.randint(0, 6)), flip(phash, rng.randint(0, 6)))
+        expected = f"figura {position}" if position >= 100 else None
+        assert index.lookup(query) == expected
+    assert sum(len(bucket) for bucket in index._buckets.values()) == 300 * 8
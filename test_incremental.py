@@ -0,0 +1,46 @@
+"""
+Testes da revisão incremental entre versões (incremental).
+"""
+
+import json
+
+from incremental import IncrementalRevision, RevisionRecord, image_key
+
+
+def make_record():
+    return RevisionRecord(
+        ["Introducao", "Paragrafo com erro.", "Conclusao"],
+        {1: "Parágrafo com erro corrigido."},
+        {image_key(b"imagem"): "Uma imagem."},
+    )
+
+
+def test_alinhamento_reaproveita_blocos_iguais():
+    record = make_record()
+    reused = record.align(["Introducao", "Paragrafo novo.", "Paragrafo com erro.", "Conclusao"])
+    assert reused == {
+        0: "Introducao",
+        2: "Parágrafo com erro corrigido.",
+        3: "Conclusao",
+    }
+
+
+def test_segmento_alterado_volta_ao_modelo():
+    record = make_record()
+    assert record.align(["Introducao", "Paragrafo com erro e mudanca.", "Conclusao"]) == \
+        {0: "Introducao", 2: "Conclusao"}
+    assert record.align([]) == {}
+
+
+def test_registro_sobrevive_ao_json():
+    record = make_record()
+    restored = RevisionRecord.from_dict(json.loads(json.dumps(record.to_dict())))
+    assert restored.texts == record.texts
+    assert restored.revised == {1: "Parágrafo com erro corrigido."}
+    assert restored.images == record.images
+
+
+def test_relatorio_indica_versao_base():
+    assert IncrementalRevision().report()["base_version"] is False
+    report = IncrementalRevision(make_record()).report()
+    assert report == {"segments_reused": 0, "segments_revised": 0, "images_reused": 0, "base_version": True}
@@ -0,0 +1,46 @@
+"""
+Testes do roteamento fast/full (model_routing).
+"""
+
+from types import SimpleNamespace
+
+from model_routing import TIER_FAST, TIER_FULL, ModelRouter, TierMetrics, has_question_alternatives
+
+QUESTION = "Qual a capital do Brasil?\na) Rio\nb) Brasília\nc) Salvador"
+
+
+def test_sem_deployment_fast_tudo_vai_para_o_completo():
+    router = ModelRouter("gpt-4")
+    assert router.classify("Curto.") == (TIER_FULL, "routing_disabled")
+    assert router.deployment_for(TIER_FAST) == "gpt-4"
+
+
+def test_classificacao_por_estilo_tamanho_e_questoes():
+    router = ModelRouter("gpt-4", "gpt-4o-mini")
+    assert router.deployment_for(TIER_FAST) == "gpt-4o-mini"
+    assert router.classify("Introdução ao curso", "Heading 1") == (TIER_FAST, "heading")
+    assert router.classify("Item da lista de materiais", "List Bullet") == (TIER_FAST, "list_item")
+    assert router.classify("Frase curta.") == (TIER_FAST, "short_text")
+    assert router.classify("Frase longa de conteúdo. " * 20) == (TIER_FULL, "long_text")
+    assert has_question_alternatives(QUESTION)
+    assert router.classify(QUESTION, "Heading 1") == (TIER_FULL, "question_alternatives")
+    assert router.classify_many(["Nome", "Assinale a alternativa correta"]) == (TIER_FULL, "question_alternatives")
+    assert router.classify_many(["Nome", "Idade"]) == (TIER_FAST, "table_cells")
+    # Um item longo no lote leva o lote inteiro ao modelo completo
+    assert router.classify_many(["Frase curta.", "Frase longa de conteúdo. " * 20],
+                                reason="packed_paragraphs") == (TIER_FULL, "long_text")
+    assert router.classify_many(["Frase curta.", "Outra frase."], reason="packed_paragraphs") == \
+        (TIER_FAST, "packed_paragraphs")
+
+
+def test_metricas_por_tier():
+    metrics = TierMetrics()
+    metrics.record_decision(TIER_FAST, "heading")
+    metrics.record(TIER_FAST, 0.2, SimpleNamespace(prompt_tokens=1000, completion_tokens=1000))
+    metrics.record(TIER_FAST, 0.4, error=True)
+    snapshot = metrics.snapshot()
+    fast = snapshot["tiers"][TIER_FAST]
+    assert (fast["calls"], fast["errors"], fast["prompt_tokens"]) == (2, 1, 1000)
+    assert fast["cost_usd"] > 0
+    assert fast["latency_avg"] == 0.3
+    assert snapshot["decisions"] == {"fast:heading": 1}
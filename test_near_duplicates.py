@@ -0,0 +1,87 @@
+"""
+Testes do índice de parágrafos quase duplicados (near_duplicates).
+"""
+
+import threading
+
+from near_duplicates import (
+    MATCH_EXACT,
+    MATCH_SIMILAR,
+    MATCH_TRIVIAL,
+    NearDuplicateIndex,
+    jaccard,
+    normalize_text,
+    shingles,
+    transfer_revision,
+)
+
+ORIGINAL = "Entregue a atividade 3 ate o dia 10/05 no ambiente virtual de aprendizagem do curso."
+REVISED = "Entregue a atividade 3 até o dia 10/05 no ambiente virtual de aprendizagem do curso."
+
+
+def test_normalizacao_ignora_digitos_e_pontuacao():
+    assert normalize_text("Prazo: 10/05!") == normalize_text("prazo 22 07")
+    assert jaccard(shingles(ORIGINAL), shingles(ORIGINAL.replace("3", "4"))) == 1.0
+
+
+def test_transferencia_de_revisao_com_diferencas_triviais():
+    text = ORIGINAL.replace("3", "4").replace("10/05", "22/07")
+    assert transfer_revision(ORIGINAL, REVISED, text) == REVISED.replace("3", "4").replace("10/05", "22/07")
+    # Palavra diferente: não é segura
+    assert transfer_revision(ORIGINAL, REVISED, ORIGINAL.replace("curso", "módulo")) is None
+    # Diferença encostada no trecho revisado ("ate" -> "ate,"): conflito
+    assert transfer_revision(ORIGINAL, REVISED, ORIGINAL.replace("ate o", "ate, o")) is None
+
+
+def test_indice_exato_trivial_e_similar():
+    index = NearDuplicateIndex(threshold=0.7, capacity=10, min_chars=20)
+    index.add(ORIGINAL, REVISED)
+
+    assert index.lookup(ORIGINAL).kind == MATCH_EXACT
+    trivial = index.lookup(ORIGINAL.replace("10/05", "22/07"))
+    assert trivial.kind == MATCH_TRIVIAL
+    assert trivial.reusable == REVISED.replace("10/05", "22/07")
+    similar = index.lookup(ORIGINAL.replace("do curso", "da disciplina do curso"))
+    assert similar is not None and similar.kind == MATCH_SIMILAR and similar.reusable is None
+    assert index.lookup("Texto completamente diferente sobre outro assunto qualquer.") is None
+    assert index.lookup("curto") is None
+
+    snapshot = index.snapshot()
+    assert (snapshot["exact"], snapshot["trivial"], snapshot["similar"]) == (1, 1, 1)
+    assert snapshot["calls_saved"] == 2
+
+
+def test_assinatura_deterministica_e_despejo():
+    first = NearDuplicateIndex(seed=7)
+    second = NearDuplicateIndex(seed=7)
+    assert first._bands(shingles(ORIGINAL)) == second._bands(shingles(ORIGINAL))
+
+    index = NearDuplicateIndex(capacity=2, min_chars=10)
+    texts = [f"Parágrafo padronizado número {word} do catálogo" for word in ("um", "dois", "três")]
+    for text in texts:
+        index.add(text, text.upper())
+    assert index.revision_for(texts[0]) is None
+    assert index.revision_for(texts[2]) == texts[2].upper()
+    assert index.snapshot()["entries"] == 2
+
+
+def test_consultas_e_insercoes_concorrentes():
+    index = NearDuplicateIndex(capacity=50, min_chars=10)
+    errors = []
+
+    def worker(offset):
+        try:
+            for number in range(100):
+                text = f"Orientação da atividade {offset}-{number}: leia o material complementar da unidade."
+                index.add(text, text.upper())
+                index.lookup(text.replace("leia", "releia"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert index.snapshot()["entries"] == 50
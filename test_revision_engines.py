@@ -0,0 +1,137 @@
+"""
+Testes dos engines de revisão (revision_engines) com um reviser falso.
+"""
+
+import asyncio
+import json
+
+from batch_api import LocalBatchBackend
+from deadline import DispatchBlockedError, DocumentDeadline, RevisionFailedError
+from revision_engines import (
+    ENGINE_BATCH_API,
+    ENGINES,
+    BatchApiEngine,
+    RevisionItem,
+    create_engine,
+    parse_packed_response,
+)
+
+
+class FakeReviser:
+    """
+    Revisa deixando o texto em maiúsculas; itens "bloqueado" levantam
+    DispatchBlockedError e itens "falhou" levantam RevisionFailedError.
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.calls = []
+        self.blocked = []
+        self.prepared = []
+
+    async def prepare(self, items):
+        self.prepared.extend(item.segment for item in items)
+
+    async def revise_item(self, item):
+        self.calls.append(item.segment)
+        if item.text == "bloqueado":
+            raise DispatchBlockedError("budget")
+        if item.text == "falhou":
+            raise RevisionFailedError("timeout")
+        return item.text.upper()
+
+    async def revise_packed(self, items):
+        self.calls.append(tuple(item.segment for item in items))
+        # Itens bloqueados ficam fora da resposta do lote (e são tentados individualmente)
+        return {item.segment: item.text.upper() for item in items if item.text not in ("bloqueado", "falhou")}
+
+    def mark_blocked(self, item, reason):
+        self.blocked.append((item.locator, reason))
+
+    def batch_request(self, item):
+        return {"messages": [{"role": "user", "content": item.text}]}
+
+    def parse_batch_content(self, item, content):
+        return content
+
+
+def make_items(*texts):
+    return [RevisionItem(index, f"p:{index}", text) for index, text in enumerate(texts)]
+
+
+def test_todos_os_engines_devolvem_apenas_os_alterados_e_deduplicam():
+    items = make_items("um", "dois", "um", "JÁ", "bloqueado", "falhou")
+    for name in ENGINES:
+        if name == ENGINE_BATCH_API:
+            continue
+        reviser = FakeReviser()
+        engine = create_engine(name)
+        revised = asyncio.run(engine.revise(items, reviser))
+        assert revised == {0: "UM", 1: "DOIS", 2: "UM"}, name
+        assert sorted(reviser.blocked) == [("p:4", "budget"), ("p:5", "timeout")], name
+        assert engine.stats.unique_items == 5, name
+        # Falhas do modelo não são contadas como bloqueios
+        assert (engine.stats.blocked, engine.stats.failed) == (1, 1), name
+
+
+def test_lote_com_resposta_json():
+    items = make_items("a", "b")
+    content = '```json\n{"0": " A ", "1": 3, "9": "x"}\n```'
+    assert parse_packed_response(content, items) == {0: "A"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_batch_api_respeita_o_prazo_do_documento(tmp_path):
+    clock = FakeClock()
+    deadline = DocumentDeadline(100, reserve_seconds=0, initial_estimate=5, clock=clock)
+    backend = LocalBatchBackend(str(tmp_path), lambda body: "NUNCA", polls_to_complete=1000)
+
+    async def sleep(seconds):
+        clock.now += seconds
+
+    engine = BatchApiEngine(backend, {"timeout": 600, "batch_api_poll_seconds": 30}, sleep=sleep)
+    reviser = FakeReviser(deadline)
+    revised = asyncio.run(engine.revise(make_items("texto"), reviser))
+    # Parou de esperar com tempo para a chamada direta, bem antes do timeout de 600s
+    assert clock.now <= 100 - 5
+    assert revised == {0: "TEXTO"}
+    assert engine.stats.fallbacks == 1
+
+
+def test_batch_api_recorre_a_chamadas_diretas_quando_o_backend_falha(tmp_path):
+    class BrokenBackend(LocalBatchBackend):
+        async def status(self, batch_id):
+            raise ConnectionError("indisponível")
+
+    backend = BrokenBackend(str(tmp_path), lambda body: "BATCH")
+    engine = BatchApiEngine(backend, {"timeout": 600})
+    revised = asyncio.run(engine.revise(make_items("a", "b"), FakeReviser()))
+    assert revised == {0: "A", 1: "B"}
+    assert engine.stats.fallbacks == 2
+
+    class NoSubmitBackend(LocalBatchBackend):
+        async def submit(self, lines, metadata=None):
+            raise ConnectionError("indisponível")
+
+    engine = BatchApiEngine(NoSubmitBackend(str(tmp_path), lambda body: "BATCH"), {"timeout": 600})
+    assert asyncio.run(engine.revise(make_items("c"), FakeReviser())) == {0: "C"}
+
+
+def test_batch_api_usa_os_resultados_do_batch(tmp_path):
+    backend = LocalBatchBackend(str(tmp_path), lambda body: body["messages"][0]["content"] + "!")
+
+    async def sleep(seconds):
+        pass
+
+    engine = BatchApiEngine(backend, {"timeout": 600}, sleep=sleep)
+    reviser = FakeReviser()
+    assert asyncio.run(engine.revise(make_items("a", "b"), reviser)) == {0: "a!", 1: "b!"}
+    assert reviser.calls == []
+    assert json.loads(json.dumps(engine.stats.snapshot()))["requests"] == 1
@@ -0,0 +1,35 @@
+"""
+Testes dos modos de revisão (revision_modes).
+"""
+
+import pytest
+
+from revision_modes import (
+    DEFAULT_MODE,
+    MODE_IMAGES_ONLY,
+    MODE_PEDAGOGICAL,
+    MODE_SPELLING,
+    mode_max_tokens,
+    resolve_mode,
+)
+
+
+def test_resolve_mode_padrao_e_aliases():
+    assert resolve_mode(None)["name"] == DEFAULT_MODE
+    assert resolve_mode("  ")["name"] == DEFAULT_MODE
+    assert resolve_mode("Ortografia")["name"] == MODE_SPELLING
+    assert resolve_mode("imagens")["name"] == MODE_IMAGES_ONLY
+
+
+def test_resolve_mode_invalido():
+    with pytest.raises(ValueError):
+        resolve_mode("resumo")
+
+
+def test_mode_max_tokens_proporcional_apenas_na_correcao():
+    text = "Texto curto para correção."
+    spelling = resolve_mode(MODE_SPELLING)
+    assert mode_max_tokens(spelling, text) < spelling["max_tokens"]
+    assert mode_max_tokens(spelling, "x" * 100000) == spelling["max_tokens"]
+    pedagogical = resolve_mode(MODE_PEDAGOGICAL)
+    assert mode_max_tokens(pedagogical, text) == pedagogical["max_tokens"]
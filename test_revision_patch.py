@@ -0,0 +1,61 @@
+"""
+Testes do patch de revisão (revision_patch).
+"""
+
+import io
+import json
+
+import pytest
+from docx import Document
+
+from document_cache import document_hash
+from document_ir import extract_document_ir
+from revision_patch import PatchMismatchError, apply_patch, build_patch, encode_patch
+
+
+def make_docx(*paragraphs) -> bytes:
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    stream = io.BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
+
+
+def read_paragraphs(content: bytes):
+    return [paragraph.text for paragraph in Document(io.BytesIO(content)).paragraphs]
+
+
+def test_patch_reconstroi_o_documento_revisado():
+    content = make_docx("Primeiro paragrafo.", "Segundo paragrafo.", "Terceiro.")
+    ir = extract_document_ir(Document(io.BytesIO(content)))
+    ir.add_image(0, "rId99")
+    patch = build_patch(ir, {0: "Primeiro parágrafo.", 2: "Terceiro."}, [(0, "Descrição da imagem: x")],
+                        document_hash(content))
+
+    # Apenas os segmentos alterados vão no patch
+    assert [entry["locator"] for entry in patch["segments"]] == ["p:0"]
+    assert patch["images"] == [{"image": 0, "paragraph": 0, "description": "Descrição da imagem: x"}]
+    # A imagem da IR é fictícia: aplicar só o texto
+    patch = json.loads(encode_patch(dict(patch, images=[])))
+
+    output, stats = apply_patch(content, patch)
+    assert read_paragraphs(output) == ["Primeiro parágrafo.", "Segundo paragrafo.", "Terceiro."]
+    assert stats == {"applied": 1, "images": 0, "skipped": 0}
+
+
+def test_patch_de_outro_arquivo_ou_formato_e_rejeitado():
+    content = make_docx("Texto.")
+    ir = extract_document_ir(Document(io.BytesIO(content)))
+    patch = build_patch(ir, {0: "Texto revisado."}, [], document_hash(b"outro arquivo"))
+    with pytest.raises(PatchMismatchError):
+        apply_patch(content, patch)
+    with pytest.raises(PatchMismatchError):
+        apply_patch(content, dict(patch, version=99), verify_source=False)
+
+    # Sem verificar a origem, segmentos e imagens que não conferem são ignorados
+    other = make_docx("Outro texto.")
+    patch["images"] = [{"image": 0, "paragraph": 0, "description": "Descrição da imagem: x"}]
+    output, stats = apply_patch(other, patch, verify_source=False)
+    assert read_paragraphs(output) == ["Outro texto."]
+    assert stats == {"applied": 0, "images": 0, "skipped": 2}
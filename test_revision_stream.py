@@ -0,0 +1,60 @@
+"""
+Testes dos eventos NDJSON da revisão (revision_stream).
+"""
+
+import asyncio
+import json
+import threading
+
+from revision_stream import RevisionProgress, encode_event
+
+
+def test_evento_ndjson():
+    line = encode_event({"event": "segment", "revised": "Revisão"})
+    assert line.endswith(b"\n") and b"\n" not in line[:-1]
+    assert json.loads(line) == {"event": "segment", "revised": "Revisão"}
+
+
+def test_eventos_de_outra_thread_chegam_em_ordem_e_contam_no_loop_consumidor():
+    async def scenario():
+        progress = RevisionProgress()
+        progress.start(total=4)
+        loop_thread = threading.current_thread()
+        counted_in = []
+        deliver = progress._deliver
+
+        def tracking_deliver(event):
+            counted_in.append(threading.current_thread())
+            deliver(event)
+
+        progress._deliver = tracking_deliver
+
+        def revise():
+            # Produtor em outra thread, como o loop compartilhado da revisão
+            progress.segment("p:0", "a", "A")
+            progress.segment("p:1", "b", "b")
+            progress.segment("p:2", "c", "")
+            progress.image(0, 3, "Descrição da imagem: gráfico")
+
+        task = asyncio.ensure_future(asyncio.to_thread(revise))
+        events = [event async for event in progress.events(task, interval=60)]
+        return events, progress, counted_in, loop_thread
+
+    events, progress, counted_in, loop_thread = asyncio.run(scenario())
+    assert [event["event"] for event in events] == ["segment", "image", "progress"]
+    assert events[0] == {"event": "segment", "locator": "p:0", "revised": "A"}
+    assert events[-1]["done"] == events[-1]["total"] == 4
+    assert progress.done == 4
+    assert all(thread is loop_thread for thread in counted_in)
+
+
+def test_progresso_periodico_enquanto_a_revisao_roda():
+    async def scenario():
+        progress = RevisionProgress()
+        progress.start(total=1)
+        task = asyncio.ensure_future(asyncio.sleep(0.12))
+        return [event async for event in progress.events(task, interval=0.05)]
+
+    events = asyncio.run(scenario())
+    assert [event["event"] for event in events].count("progress") >= 2
+    assert events[-1]["done"] == 0
@@ -0,0 +1,37 @@
+"""
+Testes da ordem de despacho e do makespan previsto (scheduling).
+"""
+
+import pytest
+
+from scheduling import CostModel, MakespanTracker, longest_first, lpt_makespan
+
+
+def test_mais_caro_primeiro_com_empates_estaveis():
+    items = [("a", 1), ("b", 5), ("c", 1), ("d", 3)]
+    assert [name for name, _ in longest_first(items, lambda item: item[1])] == ["b", "d", "a", "c"]
+
+
+def test_makespan_lpt():
+    assert lpt_makespan([5, 4, 3, 3, 3], slots=2) == 10
+    assert lpt_makespan([5, 4, 3, 3, 3], slots=10) == 5
+    assert lpt_makespan([2, 2], slots=0) == 4
+    assert lpt_makespan([], slots=3) == 0
+
+
+def test_modelo_de_custo():
+    model = CostModel(call_seconds=1.0, seconds_per_token=0.5, image_seconds=4.0, seconds_per_image_mb=2.0)
+    assert model.text_seconds(10) == 6.0
+    assert model.image_seconds_for(512 * 1024) == 5.0
+
+
+def test_registro_de_previsto_x_real():
+    tracker = MakespanTracker(window=2)
+    assert tracker.snapshot()["ratio_mean"] is None
+    tracker.record(10.0, 30.0)
+    tracker.record(10.0, 12.0)
+    tracker.record(0.0, 5.0)
+    snapshot = tracker.snapshot()
+    assert snapshot["documents"] == 3 and snapshot["samples"] == 2
+    assert snapshot["ratio_mean"] == pytest.approx(1.2)
+    assert snapshot["mean_abs_error_seconds"] == 3.5
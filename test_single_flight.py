@@ -0,0 +1,65 @@
+"""
+Testes da coalescência de requisições em andamento (single_flight).
+"""
+
+import asyncio
+
+from single_flight import SingleFlight, request_key
+
+
+def test_chave_independe_da_ordem_dos_campos():
+    assert request_key({"a": 1, "b": 2}, "texto") == request_key({"b": 2, "a": 1}, "texto")
+    assert request_key("texto", 1) != request_key("texto", 2)
+
+
+def test_chamadas_concorrentes_compartilham_o_resultado():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "revisado"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("k", call) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["revisado"] * 5
+    assert len(calls) == 1
+    stats = flight.snapshot()
+    assert stats["leaders"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+
+
+def test_falha_do_lider_faz_cada_seguidor_chamar():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("prazo do líder")
+        return "revisado"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("k", call) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == ["revisado", "revisado"]
+    assert flight.snapshot()["fallbacks"] == 2
+
+
+def test_desligado_sempre_chama():
+    flight = SingleFlight(enabled=False)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        return await asyncio.gather(flight.run("k", call), flight.run("k", call))
+
+    assert sorted(asyncio.run(scenario())) == [1, 2]
+    assert flight.snapshot()["leaders"] == 0
@@ -0,0 +1,42 @@
+"""
+Testes da revisão de tabelas como grade (table_revision).
+"""
+
+import json
+
+from table_revision import TableCell, build_table_payload, load_json_object, pack_table_cells, parse_table_response
+
+
+def make_cells():
+    return [
+        TableCell(0, 0, ["Nome"]),
+        TableCell(0, 1, ["Descrição longa " * 20]),
+        TableCell(1, 0, ["Item", "com dois parágrafos"]),
+    ]
+
+
+def test_lotes_respeitam_o_limite_e_a_ordem():
+    cells = make_cells()
+    batches = pack_table_cells(cells, max_tokens=20)
+    assert [[cell.key for cell in batch] for batch in batches] == [["0,0"], ["0,1"], ["1,0"]]
+    assert pack_table_cells(cells, max_tokens=10000) == [cells]
+
+
+def test_payload_e_resposta_validada_por_celula():
+    cells = make_cells()
+    assert json.loads(build_table_payload(cells[:1])) == {"0,0": ["Nome"]}
+    content = json.dumps({
+        "0,0": " NOME ",
+        "0,1": ["a", "b"],
+        "1,0": ["ITEM", "COM DOIS PARÁGRAFOS"],
+        "9,9": ["intrusa"],
+    })
+    revised = parse_table_response(f"```json\n{content}\n```", cells)
+    # Célula com número de parágrafos diferente fica de fora (revisão individual)
+    assert revised == {"0,0": ["NOME"], "1,0": ["ITEM", "COM DOIS PARÁGRAFOS"]}
+
+
+def test_json_com_texto_em_volta():
+    assert load_json_object('Aqui está: {"a": 1} espero ter ajudado') == {"a": 1}
+    assert load_json_object("sem json") is None
+    assert parse_table_response("[1, 2]", make_cells()) == {}
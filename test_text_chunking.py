@@ -0,0 +1,47 @@
+"""
+Testes da divisão de parágrafos longos (text_chunking).
+"""
+
+from text_chunking import (
+    ALT_END,
+    ALT_START,
+    balance_formatting_markers,
+    estimate_tokens,
+    join_revised_chunks,
+    split_sentences,
+    split_text_into_chunks,
+)
+
+
+def test_frases_respeitam_abreviacoes():
+    text = "O Sr. Silva chegou. Conforme o art. 5 da lei, todos são iguais! Fim."
+    assert split_sentences(text) == ["O Sr. Silva chegou. ", "Conforme o art. 5 da lei, todos são iguais! ", "Fim."]
+
+
+def test_blocos_preservam_o_texto_e_o_limite():
+    text = " ".join(f"Frase número {i} do parágrafo longo de legislação." for i in range(60))
+    chunks = split_text_into_chunks(text, max_tokens=50)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+    assert split_text_into_chunks("Curto.", max_tokens=50) == ["Curto."]
+
+
+def test_frase_gigante_cortada_sem_quebrar_marcadores():
+    clause = "inciso com redação longa e repetitiva sobre o tema [[FIG1]] tratado"
+    text = "; ".join([clause] * 12) + "."
+    chunks = split_text_into_chunks(text, max_tokens=30)
+    assert "".join(chunks) == text
+    assert sum(chunk.count("[[FIG1]]") for chunk in chunks) == 12
+
+
+def test_marcadores_abertos_sao_fechados():
+    assert balance_formatting_markers(f"a {ALT_START}b") == f"a {ALT_START}b{ALT_END}"
+    assert balance_formatting_markers(f"a {ALT_END}b") == "a b"
+    assert balance_formatting_markers("um *itálico* e *solto") == "um *itálico* e solto"
+
+
+def test_juncao_reaproveita_os_espacos_originais():
+    original = ["Primeira frase.  ", "Segunda frase.\n", "Terceira."]
+    revised = [" PRIMEIRA FRASE.", "SEGUNDA FRASE. ", "TERCEIRA."]
+    assert join_revised_chunks(original, revised) == "PRIMEIRA FRASE.  SEGUNDA FRASE.\nTERCEIRA."
@@ -0,0 +1,235 @@
+"""
+Divisão de parágrafos longos em blocos por limite de frase.
+
+Parágrafos muito extensos (transcrições coladas, trechos de legislação) viram
+a chamada mais lenta do documento e às vezes são truncados pelo limite de
+saída do modelo. Este módulo divide esses parágrafos em blocos menores,
+sempre em fim de frase, para que sejam revisados em paralelo e depois
+reunidos no mesmo parágrafo.
+
+Garantias:
+- "".join(chunks) == texto original (os espaços entre frases ficam no fim de cada bloco)
+- Nenhum corte acontece dentro de tokens de mídia ([[FIG1]]), de trechos em
+  itálico (*palavra*) ou de alternativas marcadas (<<ALT_CORRETA_INICIO>>...)
+"""
+
+import re
+from typing import List, Tuple
+
+ALT_START = "<<ALT_CORRETA_INICIO>>"
+ALT_END = "<<ALT_CORRETA_FIM>>"
+
+# Aproximação usada em todo o projeto: ~4 caracteres por token em português
+CHARS_PER_TOKEN = 4
+
+# Abreviações comuns que terminam em ponto e não encerram a frase
+_ABBREVIATIONS = {
+    "sr", "sra", "srs", "sras", "dr", "dra", "drs", "prof", "profa", "art", "arts",
+    "inc", "incs", "par", "cap", "caps", "fl", "fls", "p", "pp", "n", "nº", "no",
+    "núm", "vol", "ed", "etc", "ex", "obs", "av", "r", "tel", "cf", "op", "cit",
+    "ltda", "cia", "séc", "jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago",
+    "set", "out", "nov", "dez",
+}
+
+# Fim de frase: pontuação final, fechamentos opcionais e espaço em branco
+_SENTENCE_END = re.compile(r'[.!?…]+["”’\')\]]*\s+')
+# Cortes secundários para frases gigantes (comuns em legislação)
+_CLAUSE_END = re.compile(r'[;:]\s+')
+
+_PROTECTED_PATTERNS = [
+    re.compile(r'\[\[[A-Z]+\d+\]\]'),
+    re.compile(re.escape(ALT_START) + r'.*?' + re.escape(ALT_END), re.DOTALL),
+    re.compile(r'(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)'),
+]
+_SINGLE_ASTERISK = re.compile(r'(?<!\*)\*(?!\*)')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa rápida de tokens, sem depender de tokenizador."""
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def _protected_spans(text: str) -> List[Tuple[int, int]]:
+    spans = []
+    for pattern in _PROTECTED_PATTERNS:
+        spans.extend(m.span() for m in pattern.finditer(text))
+    return spans
+
+
+def _inside_span(pos: int, spans: List[Tuple[int, int]]) -> bool:
+    return any(start < pos < end for start, end in spans)
+
+
+def _is_sentence_boundary(text: str, match: re.Match) -> bool:
+    """Descarta falsos fins de frase (abreviações, continuação em minúscula)."""
+    end = match.end()
+    if end >= len(text):
+        return False
+    if text[end].islower():
+        return False
+    if text[match.start()] == ".":
+        word = re.search(r'(\S+)$', text[:match.start()])
+        if word:
+            token = word.group(1).lower().lstrip('("“')
+            if token in _ABBREVIATIONS or (len(token) == 1 and token.isalpha()):
+                return False
+    return True
+
+
+def _split_points(text: str, pattern: re.Pattern, spans: List[Tuple[int, int]],
+                  check_sentence: bool) -> List[int]:
+    points = []
+    for match in pattern.finditer(text):
+        if check_sentence and not _is_sentence_boundary(text, match):
+            continue
+        if _inside_span(match.end(), spans):
+            continue
+        points.append(match.end())
+    return points
+
+
+def _cut(text: str, points: List[int]) -> List[str]:
+    pieces = []
+    start = 0
+    for point in points:
+        pieces.append(text[start:point])
+        start = point
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def _hard_split(piece: str, max_chars: int, spans: List[Tuple[int, int]], offset: int) -> List[str]:
+    """Último recurso: corta no último espaço em branco antes do limite de caracteres."""
+    points = [m.end() for m in re.finditer(r'\s+', piece) if not _inside_span(offset + m.end(), spans)]
+    cuts = []
+    start = 0
+    previous = None
+    for point in points:
+        if point - start > max_chars and previous is not None and previous > start:
+            cuts.append(previous)
+            start = previous
+        previous = point
+    return _cut(piece, cuts)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Divide o texto em frases, preservando os espaços no fim de cada uma.
+
+    Args:
+        text: Texto do parágrafo
+
+    Returns:
+        Lista de frases cuja concatenação é exatamente o texto original
+    """
+    spans = _protected_spans(text)
+    return _cut(text, _split_points(text, _SENTENCE_END, spans, check_sentence=True))
+
+
+def split_text_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Agrupa frases em blocos com no máximo `max_tokens` (estimados).
+
+    Frases maiores que o limite são cortadas em ";"/":" e, em último caso,
+    em espaço em branco.
+
+    Args:
+        text: Texto do parágrafo
+        max_tokens: Meta de tokens por bloco
+
+    Returns:
+        Lista de blocos cuja concatenação é exatamente o texto original
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    spans = _protected_spans(text)
+
+    pieces: List[str] = []
+    offset = 0
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+        else:
+            sentence_spans = [(s - offset, e - offset) for s, e in spans]
+            clauses = _cut(sentence, _split_points(sentence, _CLAUSE_END, sentence_spans, check_sentence=False))
+            clause_offset = offset
+            for clause in clauses:
+                if len(clause) <= max_chars:
+                    pieces.append(clause)
+                else:
+                    pieces.extend(_hard_split(clause, max_chars, spans, clause_offset))
+                clause_offset += len(clause)
+        offset += len(sentence)
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def balance_formatting_markers(text: str) -> str:
+    """
+    Garante que um bloco revisado não deixe marcadores abertos.
+
+    Cada bloco é revisado isoladamente; se o modelo devolver um
+    <<ALT_CORRETA_INICIO>> sem fim ou um asterisco solto, ao juntar os blocos
+    a formatação "vazaria" para o bloco seguinte em `apply_text_formatting`.
+
+    Args:
+        text: Texto revisado de um bloco
+
+    Returns:
+        Texto com marcadores de alternativa e itálico balanceados
+    """
+    if ALT_START in text or ALT_END in text:
+        parts = re.split(f'({re.escape(ALT_START)}|{re.escape(ALT_END)})', text)
+        balanced = []
+        is_open = False
+        for part in parts:
+            if part == ALT_START:
+                if is_open:
+                    continue
+                is_open = True
+            elif part == ALT_END:
+                if not is_open:
+                    continue
+                is_open = False
+            balanced.append(part)
+        if is_open:
+            balanced.append(ALT_END)
+        text = "".join(balanced)
+
+    asterisks = list(_SINGLE_ASTERISK.finditer(text))
+    if len(asterisks) % 2 == 1:
+        last = asterisks[-1].start()
+        text = text[:last] + text[last + 1:]
+    return text
+
+
+def join_revised_chunks(original_chunks: List[str], revised_chunks: List[str]) -> str:
+    """
+    Junta blocos revisados reaproveitando o espaço original entre eles.
+
+    Args:
+        original_chunks: Blocos devolvidos por split_text_into_chunks
+        revised_chunks: Texto revisado de cada bloco (mesma ordem)
+
+    Returns:
+        Parágrafo revisado completo
+    """
+    joined = []
+    for original, revised in zip(original_chunks, revised_chunks):
+        trailing = original[len(original.rstrip()):]
+        joined.append(revised.strip() + trailing)
+    return "".join(joined).strip()